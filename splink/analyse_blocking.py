@@ -52,6 +52,9 @@ def cumulative_comparisons_generated_by_blocking_rules(
         brs_as_objs = settings_obj._brs_as_objs(blocking_rules)
         linker._settings_obj_._blocking_rules_to_generate_predictions = brs_as_objs
 
+    # Blocking analysis runs against __splink__df_concat, which is not encoded
+    settings_obj._dictionary_encode_columns = False
+
     # Turn tf off.  No need to apply term frequencies to perform these calcs
     settings_obj._retain_matching_columns = False
     settings_obj._retain_intermediate_calculation_columns = False
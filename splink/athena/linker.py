@@ -26,8 +26,7 @@ logger = logging.getLogger(__name__)
 class AthenaDataFrame(SplinkDataFrame):
     linker: AthenaLinker
 
-    @property
-    def columns(self):
+    def _get_columns(self) -> list[InputColumn]:
         db, tb = self.linker.get_schema_info(self.physical_name)
         d = wr.catalog.get_table_types(
             database=db,
@@ -350,8 +349,15 @@ class AthenaLinker(Linker):
         if proportion == 1.0:
             return ""
         percent = proportion * 100
+        if seed:
+            uniform = self._hashed_uniform_expression(seed, unique_id)
+            return f" WHERE {uniform} < {proportion}"
         return f" TABLESAMPLE BERNOULLI ({percent})"
 
+    def _seeded_hash_sql(self, expression, seed):
+        hash_sql = f"xxhash64(to_utf8(cast({expression} as varchar) || '-{seed}'))"
+        return f"bitwise_and(from_big_endian_64({hash_sql}), {2**52 - 1})"
+
     @property
     def _infinity_expression(self):
         return "infinity()"
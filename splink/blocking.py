@@ -6,6 +6,7 @@ from sqlglot.optimizer.eliminate_joins import join_condition
 from typing import TYPE_CHECKING, Union
 import logging
 
+from .dictionary_encoding import dictionary_encode_sql_condition
 from .misc import ensure_is_list
 from .unique_id_concat import _composite_unique_id_from_nodes_sql
 
@@ -53,8 +54,16 @@ class BlockingRule:
 
     @property
     def match_key(self):
+        # An explicit match key is used where rules are not deduped against
+        # one another, so that each rule generates all of its record pairs
+        if hasattr(self, "_match_key"):
+            return self._match_key
         return len(self.preceding_rules)
 
+    @match_key.setter
+    def match_key(self, match_key: int):
+        self._match_key = match_key
+
     def add_preceding_rules(self, rules):
         rules = ensure_is_list(rules)
         self.preceding_rules = rules
@@ -179,6 +188,26 @@ def _sql_gen_where_condition(link_type, unique_id_cols):
     return where_condition
 
 
+def _dictionary_encode_blocking_rules(blocking_rules, encoded_columns, sql_dialect):
+    """Rewrite equi-join conditions on dictionary encoded columns to join on the
+    integer codes, preserving salting and the preceding rules used to dedupe
+    comparisons"""
+
+    def encode(br: BlockingRule):
+        sql = dictionary_encode_sql_condition(
+            br.blocking_rule, encoded_columns, sql_dialect
+        )
+        return BlockingRule(sql, br.salting_partitions, br.sqlglot_dialect)
+
+    encoded_rules = []
+    for br in blocking_rules:
+        encoded_br = encode(br)
+        encoded_br.add_preceding_rules([encode(r) for r in br.preceding_rules])
+        encoded_br.match_key = br.match_key
+        encoded_rules.append(encoded_br)
+    return encoded_rules
+
+
 # flake8: noqa: C901
 def block_using_rules_sql(linker: Linker):
     """Use the blocking rules specified in the linker's settings object to
@@ -220,6 +249,12 @@ def block_using_rules_sql(linker: Linker):
     else:
         blocking_rules = settings_obj._blocking_rules_to_generate_predictions
 
+    encoded_columns = settings_obj._columns_to_dictionary_encode
+    if encoded_columns:
+        blocking_rules = _dictionary_encode_blocking_rules(
+            blocking_rules, encoded_columns, linker._sql_dialect
+        )
+
     if settings_obj.salting_required and apply_salt == False:
         logger.warning(
             "WARNING: Salting is not currently supported by this linker backend and"
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+# The compact predictions format stores each pairwise comparison as its
+# unique ids, a single precision match weight and a single integer into which
+# the comparison vector (gamma) values of every comparison are bit-packed.
+# For comparison i, the value (gamma_i + 1) occupies `bits_i` bits, so that
+# the null level (-1) is stored as 0.
+from typing import TYPE_CHECKING
+
+from .exceptions import SplinkException
+from .retained_columns import columns_to_rejoin_by_id, join_on_unique_ids_sql
+
+# https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
+if TYPE_CHECKING:
+    from .comparison import Comparison
+    from .settings import Settings
+
+# Packed values are decoded using floating point division in some backends,
+# so restrict ourselves to integers exactly representable as a double
+MAX_PACKED_GAMMA_BITS = 53
+
+
+def packed_gamma_layout(settings_obj: Settings) -> list[tuple[Comparison, int, int]]:
+    """For each comparison, the multiplier (2^offset) and base (2^bits) used to
+    pack its gamma value into the packed integer
+
+    Returns:
+        list of tuples like [(comparison, multiplier, base)]
+    """
+    layout = []
+    offset = 0
+    for cc in settings_obj.comparisons:
+        # gamma + 1 takes values in 0, 1, ..., num_levels
+        bits = cc._num_levels.bit_length()
+        layout.append((cc, 2**offset, 2**bits))
+        offset += bits
+
+    if offset > MAX_PACKED_GAMMA_BITS:
+        raise SplinkException(
+            f"The comparison vector requires {offset} bits to store, which exceeds "
+            f"the maximum of {MAX_PACKED_GAMMA_BITS} supported by compact output. "
+            "Use the default (non-compact) output format for this model."
+        )
+    return layout
+
+
+def packed_gamma_sql(settings_obj: Settings) -> str:
+    # e.g. (cast(gamma_first_name as bigint) + 1) * 1
+    #      + (cast(gamma_surname as bigint) + 1) * 4
+    terms = [
+        f"(cast({cc._gamma_column_name} as bigint) + 1) * {multiplier}"
+        for cc, multiplier, _ in packed_gamma_layout(settings_obj)
+    ]
+    return " + ".join(terms)
+
+
+def unpacked_gamma_sqls(settings_obj: Settings, packed_column="gamma_packed"):
+    # e.g. cast(floor(gamma_packed / 4) as bigint) % 4 - 1 as gamma_surname
+    return [
+        f"cast(floor({packed_column} / {multiplier}) as bigint) % {base} - 1 "
+        f"as {cc._gamma_column_name}"
+        for cc, multiplier, base in packed_gamma_layout(settings_obj)
+    ]
+
+
+def unpack_gamma(packed_value: int, settings_obj: Settings) -> dict:
+    """Decode a packed gamma integer into a dict of gamma column names to values
+
+    Examples:
+        ```py
+        unpack_gamma(37, linker._settings_obj)
+        {"gamma_first_name": 0, "gamma_surname": 1, ...}
+        ```
+    """
+    return {
+        cc._gamma_column_name: (int(packed_value) // multiplier) % base - 1
+        for cc, multiplier, base in packed_gamma_layout(settings_obj)
+    }
+
+
+def columns_to_select_for_compact_predict(
+    settings_obj: Settings, match_weight_expr: str
+) -> list[str]:
+    cols = []
+
+    for uid_col in settings_obj._unique_id_input_columns:
+        cols.append(uid_col.name_l())
+        cols.append(uid_col.name_r())
+
+    cols.append(f"cast({match_weight_expr} as real) as match_weight")
+    cols.append(f"{packed_gamma_sql(settings_obj)} as gamma_packed")
+
+    if settings_obj._needs_matchkey_column:
+        cols.append("cast(match_key as int) as match_key")
+
+    return cols
+
+
+def comparison_vectors_from_compact_predictions_sql(
+    settings_obj: Settings, compact_table_name: str
+) -> str:
+    """Unpack the gamma values from compact predictions, re-joining the input
+    columns by unique id, to recreate __splink__df_comparison_vectors"""
+    cols = []
+    for uid_col in settings_obj._unique_id_input_columns:
+        cols.append(f"p.{uid_col.name_l()}")
+        cols.append(f"p.{uid_col.name_r()}")
+
+    cols.extend(unpacked_gamma_sqls(settings_obj, packed_column="p.gamma_packed"))
+    cols.extend(columns_to_rejoin_by_id(settings_obj))
+
+    if settings_obj._needs_matchkey_column:
+        cols.append("p.match_key")
+
+    select_expr = ", ".join(cols)
+
+    sql = f"""
+    select {select_expr}
+    from {compact_table_name} as p
+    left join __splink__df_concat_with_tf as l
+    on {join_on_unique_ids_sql(settings_obj, "p", "l")}
+    left join __splink__df_concat_with_tf as r
+    on {join_on_unique_ids_sql(settings_obj, "p", "r")}
+    """
+
+    return sql
@@ -135,7 +135,12 @@ class Comparison:
 
     @property
     def _has_tf_adjustments(self):
-        return any([cl._has_tf_adjustments for cl in self.comparison_levels])
+        return any(
+            [
+                cl._has_tf_adjustments or cl._has_token_tf_adjustments
+                for cl in self.comparison_levels
+            ]
+        )
 
     @property
     def _case_statement(self):
@@ -209,15 +214,17 @@ class Comparison:
 
         output_cols = []
         for col in input_cols:
-            if self._settings_obj._retain_matching_columns:
+            if self._settings_obj._carry_matching_columns:
                 output_cols.extend(col.names_l_r())
 
         output_cols.append(self._case_statement)
 
         for cl in self.comparison_levels:
-            if cl._has_tf_adjustments:
+            if cl._has_tf_adjustments and self._settings_obj._carry_tf_columns:
                 col = cl._tf_adjustment_input_column
                 output_cols.extend(col.tf_name_l_r())
+            if cl._has_token_tf_adjustments:
+                output_cols.extend(cl._token_tf_adjustment_input_column.names_l_r())
 
         return dedupe_preserving_order(output_cols)
 
@@ -229,7 +236,7 @@ class Comparison:
 
         output_cols = []
         for col in input_cols:
-            if self._settings_obj._retain_matching_columns:
+            if self._settings_obj._carry_matching_columns:
                 output_cols.extend(col.names_l_r())
 
         output_cols.append(self._gamma_column_name)
@@ -241,6 +248,11 @@ class Comparison:
             ):
                 col = cl._tf_adjustment_input_column
                 output_cols.extend(col.tf_name_l_r())
+            if (
+                cl._has_token_tf_adjustments
+                and self._settings_obj._retain_intermediate_calculation_columns
+            ):
+                output_cols.append(cl._token_tf_adjustment_input_column.token_tf_name())
 
         # Bayes factor case when statement
         sqls = [cl._bayes_factor_sql for cl in self.comparison_levels]
@@ -267,7 +279,7 @@ class Comparison:
 
         output_cols = []
         for col in input_cols:
-            if self._settings_obj._retain_matching_columns:
+            if self._settings_obj._carry_matching_columns:
                 output_cols.extend(col.names_l_r())
 
         if (
@@ -283,6 +295,11 @@ class Comparison:
             ):
                 col = cl._tf_adjustment_input_column
                 output_cols.extend(col.tf_name_l_r())
+            if (
+                cl._has_token_tf_adjustments
+                and self._settings_obj._retain_intermediate_calculation_columns
+            ):
+                output_cols.append(cl._token_tf_adjustment_input_column.token_tf_name())
 
         for _col in input_cols:
             if self._settings_obj._retain_intermediate_calculation_columns:
@@ -13,6 +13,7 @@ from sqlglot.optimizer.normalize import normalize
 
 from .constants import LEVEL_NOT_OBSERVED_TEXT
 from .default_from_jsonschema import default_value_from_schema
+from .dictionary_encoding import dictionary_encode_sql_condition
 from .input_column import InputColumn, sqlglot_tree_signature
 from .misc import (
     dedupe_preserving_order,
@@ -203,6 +204,14 @@ class ComparisonLevel:
         if input_column:
             return input_column.unquote().name()
 
+    @property
+    def _token_tf_adjustment_input_column(self):
+        val = self._level_dict.get("token_tf_adjustment_column")
+        if val:
+            return InputColumn(val, sql_dialect=self.sql_dialect)
+        else:
+            return None
+
     @property
     def _has_comparison(self):
         from .comparison import Comparison
@@ -282,10 +291,21 @@ class ComparisonLevel:
                 f"{self.label_for_charts.lower()} comparison level"
             )
 
-    def _add_trained_u_probability(self, val, desc="no description given"):
-        self._trained_u_probabilities.append(
-            {"probability": val, "description": desc, "m_or_u": "u"}
-        )
+    def _add_trained_u_probability(
+        self,
+        val,
+        desc="no description given",
+        confidence_interval=None,
+        relative_ci_width=None,
+        sampled_pairs=None,
+    ):
+        record = {"probability": val, "description": desc, "m_or_u": "u"}
+        # The precision of u probabilities estimated by adaptive random sampling
+        if confidence_interval is not None:
+            record["confidence_interval"] = confidence_interval
+            record["relative_ci_width"] = relative_ci_width
+            record["sampled_pairs"] = sampled_pairs
+        self._trained_u_probabilities.append(record)
 
     def _add_trained_m_probability(self, val, desc="no description given"):
         self._trained_m_probabilities.append(
@@ -417,6 +437,16 @@ class ComparisonLevel:
         col = self._level_dict.get("tf_adjustment_column")
         return col is not None
 
+    @property
+    def _has_token_tf_adjustments(self):
+        # The frequencies of the shared tokens are only joined on to the comparison
+        # vectors when scoring predictions.  See join_token_tf_to_comparison_vectors_sql
+        col = self._level_dict.get("token_tf_adjustment_column")
+        if col is None or not self._has_comparison:
+            return False
+        settings_obj = self.comparison._settings_obj
+        return settings_obj is not None and settings_obj._apply_token_tf_adjustments
+
     def _validate_sql(self):
         sql = self.sql_condition
         if self._is_else_level:
@@ -440,7 +470,10 @@ class ComparisonLevel:
         if self._is_else_level:
             return []
 
-        cols = get_columns_used_from_sql(self.sql_condition, dialect=self.sql_dialect)
+        return self._input_columns_used_by_sql(self.sql_condition)
+
+    def _input_columns_used_by_sql(self, sql) -> list[InputColumn]:
+        cols = get_columns_used_from_sql(sql, dialect=self.sql_dialect)
         # Parsed order seems to be roughly in reverse order of apearance
         cols = cols[::-1]
 
@@ -457,15 +490,52 @@ class ComparisonLevel:
 
         return input_cols
 
+    @property
+    def _dictionary_encoded_columns(self) -> list[InputColumn]:
+        if not self._has_comparison or self.comparison._settings_obj is None:
+            return []
+        return self.comparison._settings_obj._columns_to_dictionary_encode
+
+    @property
+    def _sql_condition_for_comparison_vector(self):
+        # Where columns are dictionary encoded, exact matches are evaluated
+        # on the integer codes rather than the raw values
+        encoded_cols = self._dictionary_encoded_columns
+        if self._is_else_level or not encoded_cols:
+            return self.sql_condition
+        return dictionary_encode_sql_condition(
+            self.sql_condition, encoded_cols, self.sql_dialect
+        )
+
     @property
     def _columns_to_select_for_blocking(self):
         # e.g. l.first_name as first_name_l, r.first_name as first_name_r
         output_cols = []
         cols = self._input_columns_used_by_sql_condition
 
+        if self._dictionary_encoded_columns and not self._is_else_level:
+            # Raw values are only needed if they're retained in the output
+            encoded_cols = self._input_columns_used_by_sql(
+                self._sql_condition_for_comparison_vector
+            )
+            if self.comparison._settings_obj._carry_matching_columns:
+                cols = cols + encoded_cols
+            else:
+                cols = encoded_cols
+
+        carry_tf_columns = (
+            not self._has_comparison
+            or self.comparison._settings_obj is None
+            or self.comparison._settings_obj._carry_tf_columns
+        )
+
+        if self._has_token_tf_adjustments:
+            # The tokens shared by each pair are found from the compared values
+            cols = cols + [self._token_tf_adjustment_input_column]
+
         for c in cols:
             output_cols.extend(c.l_r_names_as_l_r())
-            if self._tf_adjustment_input_column:
+            if self._tf_adjustment_input_column and carry_tf_columns:
                 output_cols.extend(
                     self._tf_adjustment_input_column.l_r_tf_names_as_l_r()
                 )
@@ -482,10 +552,11 @@ class ComparisonLevel:
                 "The comparison_vector_value is only defined in the "
                 "context of a list of ComparisonLevels within a Comparison."
             )
+        sql_condition = self._sql_condition_for_comparison_vector
         if self._is_else_level:
-            return f"{self.sql_condition} {self._comparison_vector_value}"
+            return f"{sql_condition} {self._comparison_vector_value}"
         else:
-            return f"WHEN {self.sql_condition} THEN {self._comparison_vector_value}"
+            return f"WHEN {sql_condition} THEN {self._comparison_vector_value}"
 
     @property
     def _is_exact_match(self):
@@ -567,6 +638,8 @@ class ComparisonLevel:
         # A tf adjustment of 1D is a multiplier of 1.0, i.e. no adjustment
         if self._comparison_vector_value == -1:
             sql = f"WHEN  {gamma_colname_value_is_this_level} then cast(1 as float8)"
+        elif self._has_token_tf_adjustments and self._tf_adjustment_weight != 0:
+            sql = self._token_tf_adjustment_sql
         elif not self._has_tf_adjustments:
             sql = f"WHEN  {gamma_colname_value_is_this_level} then cast(1 as float8)"
         elif self._tf_adjustment_weight == 0:
@@ -628,6 +701,31 @@ class ComparisonLevel:
             """
         return dedent(sql).strip()
 
+    @property
+    def _token_tf_adjustment_sql(self):
+        # The token term frequency is the product of the frequencies of the tokens
+        # the two records share, i.e. the probability that a random record contains
+        # all of them, so plays the role of the u probability of this level for
+        # the pair
+        gamma_column_name = self.comparison._gamma_column_name
+        token_tf = self._token_tf_adjustment_input_column.token_tf_name()
+        minimum_u = f"cast({self._tf_minimum_u_value} as float8)"
+
+        sql = f"""
+        WHEN  {gamma_column_name} = {self._comparison_vector_value} then
+            (CASE WHEN {token_tf} is not null
+            THEN
+            POW(
+                cast({self.u_probability} as float8) /
+                (CASE WHEN {token_tf} > {minimum_u} THEN {token_tf}
+                ELSE {minimum_u} END),
+                cast({self._tf_adjustment_weight} as float8)
+            )
+            ELSE cast(1 as float8)
+            END)
+        """
+        return dedent(sql).strip()
+
     def as_dict(self):
         "The minimal representation of this level to use as an input to Splink"
         output = {}
@@ -648,6 +746,12 @@ class ComparisonLevel:
             if self._tf_adjustment_weight != 0:
                 output["tf_adjustment_weight"] = self._tf_adjustment_weight
 
+        token_tf_col = self._token_tf_adjustment_input_column
+        if token_tf_col:
+            output["token_tf_adjustment_column"] = token_tf_col.input_name
+            if self._tf_adjustment_weight != 0:
+                output["tf_adjustment_weight"] = self._tf_adjustment_weight
+
         if self.is_null_level:
             output["is_null_level"] = True
 
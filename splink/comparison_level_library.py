@@ -1135,6 +1135,7 @@ class ArrayIntersectLevelBase(ComparisonLevel):
         term_frequency_adjustments=False,
         min_intersection=1,
         include_colname_in_charts_label=False,
+        token_frequency_adjustments=False,
     ) -> ComparisonLevel:
         """Represents a comparison level based around the size of an intersection of
         arrays
@@ -1149,6 +1150,9 @@ class ArrayIntersectLevelBase(ComparisonLevel):
                 intersection of arrays for this comparison level. Defaults to 1
             include_colname_in_charts_label (bool, optional): Should the charts label
                 contain the column name? Defaults to False
+            token_frequency_adjustments (bool, optional): If True, adjust the match
+                weight according to how rare the elements the two arrays share are,
+                using the token term frequencies of the column. Defaults to False.
 
         Examples:
             === ":simple-duckdb: DuckDB"
@@ -1196,6 +1200,8 @@ class ArrayIntersectLevelBase(ComparisonLevel):
             level_dict["m_probability"] = m_probability
         if term_frequency_adjustments:
             level_dict["tf_adjustment_column"] = col_name
+        if token_frequency_adjustments:
+            level_dict["token_tf_adjustment_column"] = col_name
 
         super().__init__(level_dict, sql_dialect=self._sql_dialect)
 
@@ -887,6 +887,7 @@ class ArrayIntersectAtSizesBase(Comparison):
         size_or_sizes: int | list = [1],
         m_probability_or_probabilities_sizes: float | list = None,
         m_probability_else=None,
+        token_frequency_adjustments=False,
     ) -> Comparison:
         """A comparison of the data in array column `col_name` with various
         intersection sizes to assess similarity levels.
@@ -908,6 +909,9 @@ class ArrayIntersectAtSizesBase(Comparison):
                 for the sizes specified. Defaults to None.
             m_probability_else (float, optional): If provided, overrides the
                 default m probability for the 'anything else' level. Defaults to None.
+            token_frequency_adjustments (bool, optional): If True, adjust the match
+                weights of the intersection levels according to how rare the
+                elements the two arrays share are. Defaults to False.
 
         Examples:
             === ":simple-duckdb: DuckDB"
@@ -954,7 +958,10 @@ class ArrayIntersectAtSizesBase(Comparison):
 
         for size_intersect, m_prob in zip(sizes, m_probabilities):
             level = self._array_intersect_level(
-                col_name, m_probability=m_prob, min_intersection=size_intersect
+                col_name,
+                m_probability=m_prob,
+                min_intersection=size_intersect,
+                token_frequency_adjustments=token_frequency_adjustments,
             )
             comparison_levels.append(level)
 
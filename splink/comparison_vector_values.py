@@ -1,9 +1,19 @@
+from __future__ import annotations
+
+import hashlib
 import logging
+from typing import TYPE_CHECKING
 
+from .blocking import block_using_rules_sql
 from .settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
+if TYPE_CHECKING:
+    from .linker import Linker
+    from .splink_dataframe import SplinkDataFrame
+
 
 def compute_comparison_vector_values_sql(
     settings_obj: Settings, include_clerical_match_score=False
@@ -30,3 +40,55 @@ def compute_comparison_vector_values_sql(
     """
 
     return sql
+
+
+def comparison_vector_store_key(
+    blocking_sql: str,
+    comparison_vectors_sql: str,
+    input_dataframes: list[SplinkDataFrame],
+):
+    """The key under which comparison vectors are held in the intermediate table
+    cache.
+
+    Given the input tables, the blocking and comparison vector sql fully determine
+    the comparison vectors, so the key captures the blocking rules and comparison
+    definitions (and the columns carried through), but not the m and u
+    probabilities, which only enter at the scoring stage.
+    """
+    input_names = ",".join(df.physical_name for df in input_dataframes)
+    to_hash = (blocking_sql + comparison_vectors_sql + input_names).encode("utf-8")
+    hash = hashlib.sha256(to_hash).hexdigest()[:9]
+    return f"__splink__df_comparison_vectors_store_{hash}"
+
+
+def comparison_vectors_from_store(
+    linker: Linker, input_dataframes: list[SplinkDataFrame]
+) -> SplinkDataFrame:
+    """Retrieve the comparison vectors for the linker's blocking rules and
+    comparisons from the intermediate table cache, computing and storing them if
+    they do not yet exist.
+    """
+    blocking_sql = block_using_rules_sql(linker)
+    comparison_vectors_sql = compute_comparison_vector_values_sql(linker._settings_obj)
+    key = comparison_vector_store_key(
+        blocking_sql, comparison_vectors_sql, input_dataframes
+    )
+
+    cache = linker._intermediate_table_cache
+    if key in cache:
+        return cache.get_with_logging(key)
+
+    linker._enqueue_sql(blocking_sql, "__splink__df_blocked")
+
+    # repartition after blocking only exists on the SparkLinker
+    repartition_after_blocking = getattr(linker, "repartition_after_blocking", False)
+
+    if repartition_after_blocking:
+        df_blocked = linker._execute_sql_pipeline(input_dataframes)
+        input_dataframes = input_dataframes + [df_blocked]
+
+    linker._enqueue_sql(comparison_vectors_sql, "__splink__df_comparison_vectors")
+    df_comparison_vectors = linker._execute_sql_pipeline(input_dataframes)
+    cache[key] = df_comparison_vectors
+
+    return df_comparison_vectors
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+# Dictionary encoding replaces the values of a column with dense integer codes,
+# so that blocking joins and exact match comparisons operate on small integers
+# rather than (potentially long) strings.
+# The dictionary is built from all of the distinct non-null values of the input
+# data, so each value has exactly one code and each code exactly one value.  Null
+# values map to null codes, meaning that `l.col = r.col` and
+# `l.code_col = r.code_col` are always equivalent
+import logging
+from typing import TYPE_CHECKING
+
+import sqlglot
+import sqlglot.expressions as exp
+
+from .input_column import InputColumn, remove_quotes_from_identifiers
+
+# https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
+if TYPE_CHECKING:
+    from .linker import Linker
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_CODE_PREFIX = "__splink_code_"
+
+
+def colname_to_dictionary_tablename(input_column: InputColumn):
+    input_col_no_quotes = remove_quotes_from_identifiers(
+        input_column.input_name_as_tree
+    )
+
+    input_column = input_col_no_quotes.sql().replace(" ", "_")
+    return f"__splink__df_dict_{input_column}"
+
+
+def dictionary_code_column(input_column: InputColumn) -> InputColumn:
+    """The InputColumn holding the integer codes for `input_column`
+    e.g. first_name -> __splink_code_first_name"""
+    name = input_column.unquote().name()
+    return InputColumn(
+        f"{DICTIONARY_CODE_PREFIX}{name}",
+        settings_obj=input_column._settings_obj,
+        sql_dialect=input_column._sql_dialect,
+    )
+
+
+def _encodable_equality_colname(expr: exp.Expression):
+    """If expr is an equality between the left and right hand versions of the
+    same column, return the name of that column, else None.
+
+    Two forms are recognised:
+        l.first_name = r.first_name     (blocking rules)
+        first_name_l = first_name_r     (comparison levels)
+    """
+    if not isinstance(expr, exp.EQ):
+        return None
+
+    left, right = expr.left, expr.right
+    if not (isinstance(left, exp.Column) and isinstance(right, exp.Column)):
+        return None
+    if not (
+        isinstance(left.this, exp.Identifier) and isinstance(right.this, exp.Identifier)
+    ):
+        return None
+
+    l_name, r_name = left.name, right.name
+
+    if left.table or right.table:
+        if {left.table.lower(), right.table.lower()} != {"l", "r"}:
+            return None
+        if l_name.lower() != r_name.lower():
+            return None
+        return l_name
+
+    if {l_name[-2:].lower(), r_name[-2:].lower()} != {"_l", "_r"}:
+        return None
+    if l_name[:-2].lower() != r_name[:-2].lower():
+        return None
+    return l_name[:-2]
+
+
+def columns_used_in_exact_match_equalities(sql: str, sql_dialect=None) -> list[str]:
+    """Return the names of columns which are compared for equality between the
+    left and right hand records anywhere in the sql expression"""
+    tree = sqlglot.parse_one(sql, read=sql_dialect)
+    colnames = []
+    for eq in tree.find_all(exp.EQ):
+        colname = _encodable_equality_colname(eq)
+        if colname is not None:
+            colnames.append(colname)
+    return colnames
+
+
+def dictionary_encode_sql_condition(
+    sql: str, encoded_columns: list[InputColumn], sql_dialect=None
+) -> str:
+    """Rewrite equalities on dictionary encoded columns to use the integer codes
+    e.g. l.first_name = r.first_name -> l.__splink_code_first_name =
+    r.__splink_code_first_name
+
+    If no equalities are rewritten, the sql is returned unchanged
+    """
+    encoded_names = {c.unquote().name().lower() for c in encoded_columns}
+    if not encoded_names:
+        return sql
+
+    tree = sqlglot.parse_one(sql, read=sql_dialect)
+
+    rewritten = False
+    for eq in list(tree.find_all(exp.EQ)):
+        colname = _encodable_equality_colname(eq)
+        if colname is None or colname.lower() not in encoded_names:
+            continue
+        for col in (eq.left, eq.right):
+            identifier = col.this
+            identifier.set("this", f"{DICTIONARY_CODE_PREFIX}{identifier.this}")
+        rewritten = True
+
+    if not rewritten:
+        return sql
+    return tree.sql(dialect=sql_dialect)
+
+
+def dictionary_for_single_column_sql(
+    input_column: InputColumn, table_name="__splink__df_concat"
+):
+    col_name = input_column.name()
+    code_name = dictionary_code_column(input_column).name()
+
+    sql = f"""
+    select
+    {col_name},
+    row_number() over (order by {col_name}) as {code_name}
+    from {table_name}
+    where {col_name} is not null
+    group by {col_name}
+    """
+
+    return sql
+
+
+def _join_dictionaries_to_input_df_sql(linker: Linker, input_table_name: str):
+    encoded_cols = linker._settings_obj._columns_to_dictionary_encode
+
+    select_cols = [f"{input_table_name}.*"]
+    left_joins = []
+
+    templ = "left join {tbl} on {input_tbl}.{col} = {tbl}.{col}"
+
+    for col in encoded_cols:
+        tbl = colname_to_dictionary_tablename(col)
+        if tbl in linker._intermediate_table_cache:
+            tbl = linker._intermediate_table_cache[tbl].physical_name
+        select_cols.append(f"{tbl}.{dictionary_code_column(col).name()}")
+        left_joins.append(
+            templ.format(tbl=tbl, input_tbl=input_table_name, col=col.name())
+        )
+
+    select_cols = ", ".join(select_cols)
+    left_joins = " ".join(left_joins)
+
+    sql = f"""
+    select {select_cols}
+    from {input_table_name}
+    {left_joins}
+    """
+
+    return sql
+
+
+def compute_all_dictionary_encoding_sqls(
+    linker: Linker, input_table_name: str
+) -> list[dict]:
+    """Compute a dictionary for each column to be encoded, and join the
+    resultant integer codes onto `input_table_name` to create
+    __splink__df_concat_with_tf
+
+    Dictionaries are always built from __splink__df_concat.  A cached term
+    frequency table may not contain every value of the column (e.g. if it was
+    registered by the user or loaded from disk), and any value missing from the
+    dictionary would be given a null code
+    """
+    encoded_cols = linker._settings_obj._columns_to_dictionary_encode
+    cache = linker._intermediate_table_cache
+
+    sqls = []
+    for col in encoded_cols:
+        dict_table_name = colname_to_dictionary_tablename(col)
+        if dict_table_name in cache:
+            continue
+
+        sql = dictionary_for_single_column_sql(col)
+        sqls.append({"sql": sql, "output_table_name": dict_table_name})
+
+    sql = _join_dictionaries_to_input_df_sql(linker, input_table_name)
+    sqls.append({"sql": sql, "output_table_name": "__splink__df_concat_with_tf"})
+
+    return sqls
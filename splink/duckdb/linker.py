@@ -12,6 +12,7 @@ from ..input_column import InputColumn
 from ..linker import Linker
 from ..misc import (
     ensure_is_list,
+    records_to_arrow_table,
 )
 from ..splink_dataframe import SplinkDataFrame
 from .duckdb_helpers.duckdb_helpers import (
@@ -26,11 +27,11 @@ logger = logging.getLogger(__name__)
 class DuckDBDataFrame(SplinkDataFrame):
     linker: DuckDBLinker
 
-    @property
-    def columns(self) -> list[InputColumn]:
-        d = self.as_record_dict(1)[0]
+    def _get_columns(self) -> list[InputColumn]:
+        sql = f"DESCRIBE SELECT * FROM {self.physical_name}"
+        describe_result = self.linker._con.execute(sql).fetchall()
 
-        col_strings = list(d.keys())
+        col_strings = [r[0] for r in describe_result]
         return [InputColumn(c, sql_dialect="duckdb") for c in col_strings]
 
     def validate(self):
@@ -41,12 +42,43 @@ class DuckDBDataFrame(SplinkDataFrame):
 
         self.linker._delete_table_from_database(self.physical_name)
 
+    def _select_expr_with_decimals_as_double(self):
+        sql = f"DESCRIBE SELECT * FROM {self.physical_name}"
+        describe_result = self.linker._con.execute(sql).fetchall()
+
+        select_cols = []
+        for r in describe_result:
+            col = InputColumn(r[0], sql_dialect="duckdb").name()
+            if r[1].upper().startswith("DECIMAL"):
+                select_cols.append(f"cast({col} as double) as {col}")
+            else:
+                select_cols.append(col)
+        return ", ".join(select_cols)
+
     def as_record_dict(self, limit=None):
+        # DECIMAL values would be fetched as decimal.Decimal, which is not json
+        # serialisable, so they are fetched as floats, as they are via pandas
+        select_expr = self._select_expr_with_decimals_as_double()
+        sql = f"select {select_expr} from {self.physical_name}"
+        if limit:
+            sql += f" limit {limit}"
+
+        # Build the records directly from the result rows, rather than via pandas
+        res = self.linker._con.query(sql)
+        colnames = res.columns
+        return [dict(zip(colnames, row)) for row in res.fetchall()]
+
+    def as_arrow(self, limit=None):
         sql = f"select * from {self.physical_name}"
         if limit:
             sql += f" limit {limit}"
 
-        return self.linker._con.query(sql).to_df().to_dict(orient="records")
+        return self.linker._con.query(sql).arrow()
+
+    def iter_batches(self, batch_size=100_000):
+        # The result is streamed from the linker's connection
+        sql = f"select * from {self.physical_name}"
+        yield from self.linker._con.execute(sql).fetch_record_batch(batch_size)
 
     def as_pandas_dataframe(self, limit=None):
         sql = f"select * from {self.physical_name}"
@@ -117,7 +149,10 @@ class DuckDBLinker(Linker):
             input_table_or_tables (Union[str, list]): Input data into the linkage model.
                 Either a single string (the name of a table in a database) for
                 deduplication jobs, or a list of strings  (the name of tables in a
-                database) for link_only or link_and_dedupe
+                database) for link_only or link_and_dedupe.  Paths to .parquet or
+                .csv files are also accepted, and are scanned lazily rather than
+                loaded into the database.  Set `project_input_columns` in the
+                settings to only read the columns used by the model.
             settings_dict (dict | Path, optional): A Splink settings dictionary, or a
                  path toa json defining a settingss dictionary or pre-trained model.
                   If not provided when the object is created, can later be added using
@@ -244,10 +279,15 @@ class DuckDBLinker(Linker):
         return self._table_to_splink_dataframe(table_name, table_name)
 
     def _table_registration(self, input, table_name):
-        if isinstance(input, dict):
-            input = pd.DataFrame(input)
-        elif isinstance(input, list):
-            input = pd.DataFrame.from_records(input)
+        if isinstance(input, (dict, list)):
+            # Arrow tables are registered by duckdb without copying the data
+            arrow_table = records_to_arrow_table(input)
+            if arrow_table is not None:
+                input = arrow_table
+            elif isinstance(input, dict):
+                input = pd.DataFrame(input)
+            else:
+                input = pd.DataFrame.from_records(input)
 
         # Registration errors will automatically
         # occur if an invalid data type is passed as an argument
@@ -264,6 +304,9 @@ class DuckDBLinker(Linker):
         else:
             return f"USING SAMPLE {percent}% (bernoulli)"
 
+    def _seeded_hash_sql(self, expression, seed):
+        return f"hash({expression}, {seed}) % {2**52}"
+
     @property
     def _infinity_expression(self):
         return "cast('infinity' as float8)"
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import logging
-from copy import deepcopy
+from copy import copy, deepcopy
 from typing import TYPE_CHECKING
 
-from .blocking import BlockingRule, block_using_rules_sql
+from .blocking import BlockingRule
 from .charts import (
     m_u_parameters_interactive_history_chart,
     match_weights_interactive_history_chart,
@@ -12,10 +12,13 @@ from .charts import (
 )
 from .comparison import Comparison
 from .comparison_level import ComparisonLevel
-from .comparison_vector_values import compute_comparison_vector_values_sql
+from .comparison_vector_values import comparison_vectors_from_store
 from .constants import LEVEL_NOT_OBSERVED_TEXT
 from .exceptions import EMTrainingException
-from .expectation_maximisation import expectation_maximisation
+from .expectation_maximisation import (
+    expectation_maximisation,
+    sample_comparison_vectors,
+)
 from .misc import bayes_factor_to_prob, prob_to_bayes_factor
 from .parse_sql import get_columns_used_from_sql
 
@@ -24,6 +27,7 @@ logger = logging.getLogger(__name__)
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 if TYPE_CHECKING:
     from .linker import Linker
+    from .splink_dataframe import SplinkDataFrame
 
 
 class EMTrainingSession:
@@ -41,6 +45,10 @@ class EMTrainingSession:
         comparisons_to_deactivate: list[Comparison] = None,
         comparison_levels_to_reverse_blocking_rule: list[ComparisonLevel] = None,
         estimate_without_term_frequencies: bool = False,
+        sample_pairs: int = None,
+        comparisons_to_train: list[Comparison] = None,
+        prior_sufficient_statistics: dict = None,
+        seed: int = None,
     ):
         logger.info("\n----- Starting EM training session -----\n")
 
@@ -61,6 +69,15 @@ class EMTrainingSession:
         self._settings_obj._estimate_without_term_frequencies = (
             estimate_without_term_frequencies
         )
+        self._sample_pairs = sample_pairs
+        self._seed = seed
+
+        # Sufficient statistics (expected m and u counts) from previous training
+        # data, which are added to those from the pairs in this session, and the
+        # combined statistics from the final iteration.  See
+        # sufficient_statistics_from_m_u_counts in expectation_maximisation.py
+        self._prior_sufficient_statistics = prior_sufficient_statistics
+        self._sufficient_statistics = None
 
         if comparison_levels_to_reverse_blocking_rule:
             self._comparison_levels_to_reverse_blocking_rule = (
@@ -107,10 +124,28 @@ class EMTrainingSession:
             if cc._output_column_name not in cc_names_to_deactivate
         ]
 
+        # If the user has asked to train only some comparisons, the others are
+        # left out of the training model altogether, so the sql which computes
+        # the comparison vectors and runs the EM iterations does not include them
+        self._comparisons_not_selected_for_training: list[Comparison] = []
+        if comparisons_to_train is not None:
+            cc_names_to_train = [cc._output_column_name for cc in comparisons_to_train]
+            self._comparisons_not_selected_for_training = [
+                cc
+                for cc in filtered_ccs
+                if cc._output_column_name not in cc_names_to_train
+            ]
+            filtered_ccs = [
+                cc for cc in filtered_ccs if cc._output_column_name in cc_names_to_train
+            ]
+
         self._settings_obj.comparisons = filtered_ccs
         self._comparisons_that_can_be_estimated = filtered_ccs
 
         self._settings_obj_history = []
+        # The log likelihood of the parameters at the start of each accepted
+        # iteration.  Only computed when the EM algorithm is accelerated
+        self._log_likelihood_history_records = []
 
         # Add iteration 0 i.e. the starting parameters
         self._add_iteration()
@@ -137,6 +172,19 @@ class EMTrainingSession:
 
         blocking_rule = self._blocking_rule_for_training.blocking_rule
 
+        not_selected = ""
+        if self._comparisons_not_selected_for_training:
+            not_selected = [
+                cc._output_column_name
+                for cc in self._comparisons_not_selected_for_training
+            ]
+            not_selected = "".join([f"\n    - {cc}" for cc in not_selected])
+            not_selected = (
+                "\n\nParameter estimates will not be made for the following "
+                f"comparison(s) since they were not selected for training: "
+                f"{not_selected}"
+            )
+
         logger.info(
             f"Estimating the {mu} of the model by blocking on:\n"
             f"{blocking_rule}\n\n"
@@ -144,6 +192,7 @@ class EMTrainingSession:
             f"{estimated}\n"
             "\nParameter estimates cannot be made for the following comparison(s)"
             f" since they are used in the blocking rules: {not_estimated}"
+            f"{not_selected}"
         )
 
     def _comparison_vectors(self):
@@ -151,26 +200,17 @@ class EMTrainingSession:
 
         nodes_with_tf = self._original_linker._initialise_df_concat_with_tf()
 
-        sql = block_using_rules_sql(self._training_linker)
-        self._training_linker._enqueue_sql(sql, "__splink__df_blocked")
+        # Sessions with the same blocking rule and comparisons share comparison
+        # vectors, since these do not depend on the parameter estimates
+        return comparison_vectors_from_store(self._training_linker, [nodes_with_tf])
 
-        # repartition after blocking only exists on the SparkLinker
-        repartition_after_blocking = getattr(
-            self._original_linker, "repartition_after_blocking", False
-        )
-
-        if repartition_after_blocking:
-            df_blocked = self._training_linker._execute_sql_pipeline([nodes_with_tf])
-            input_dataframes = [nodes_with_tf, df_blocked]
+    def _train(self, cvv: SplinkDataFrame = None):
+        # Comparison vectors may be supplied where they have been computed in a
+        # single pass shared with other training sessions
+        if cvv is None:
+            cvv = self._comparison_vectors()
         else:
-            input_dataframes = [nodes_with_tf]
-
-        sql = compute_comparison_vector_values_sql(self._settings_obj)
-        self._training_linker._enqueue_sql(sql, "__splink__df_comparison_vectors")
-        return self._training_linker._execute_sql_pipeline(input_dataframes)
-
-    def _train(self):
-        cvv = self._comparison_vectors()
+            self._training_log_message()
 
         # check that the blocking rule actually generates _some_ record pairs,
         # if not give the user a helpful message
@@ -189,6 +229,17 @@ class EMTrainingSession:
                 "the number of comparisons that will be generated by a blocking rule."
             )
 
+        # Without term frequencies, expectation maximisation only depends on the
+        # agreement pattern counts, which are computed exactly, so there is nothing
+        # to gain from sampling
+        estimate_without_term_frequencies = (
+            self._settings_obj._estimate_without_term_frequencies
+        )
+        if self._sample_pairs is not None and not estimate_without_term_frequencies:
+            cvv = sample_comparison_vectors(
+                self, cvv, self._sample_pairs, seed=self._seed
+            )
+
         # Compute the new params, populating the paramters in the copied settings object
         # At this stage, we do not overwrite any of the parameters
         # in the original (main) setting object
@@ -197,6 +248,12 @@ class EMTrainingSession:
         rule = self._blocking_rule_for_training.blocking_rule
         training_desc = f"EM, blocked on: {rule}"
 
+        # Store the statistics so later training on new data can add to them
+        if self._sufficient_statistics is not None:
+            self._original_settings_obj._set_em_sufficient_statistics(
+                rule, self._sufficient_statistics
+            )
+
         # Add m and u values to original settings
         for cc in self._settings_obj.comparisons:
             orig_cc = self._original_settings_obj._get_comparison_by_output_column_name(
@@ -415,3 +472,55 @@ class EMTrainingSession:
             f"<EMTrainingSession, blocking on {blocking_rule}, "
             f"deactivating comparisons {deactivated_cols}>"
         )
+
+
+def shared_comparison_vectors_for_training(
+    linker: Linker, blocking_rules: list[str]
+) -> SplinkDataFrame:
+    """Compute the comparison vectors for several training blocking rules in a
+    single pass, for use by multiple EM training sessions.
+
+    Unlike blocking rules used for predictions, each rule generates all of its
+    record pairs, irrespective of whether they are also generated by another rule,
+    so a pair may appear more than once.  The `match_key` column records the index
+    of the rule which generated each pair.
+    """
+    # Materialise on the main linker before its blocking rules are swapped out on
+    # the copy, so the copy uses the main linker's __splink__df_concat_with_tf
+    nodes_with_tf = linker._initialise_df_concat_with_tf()
+
+    training_linker = deepcopy(linker)
+    settings_obj = training_linker._settings_obj
+    settings_obj._retain_matching_columns = False
+    settings_obj._retain_intermediate_calculation_columns = False
+    settings_obj._training_mode = True
+    settings_obj._blocking_rule_for_training = None
+
+    brs = []
+    for i, br in enumerate(blocking_rules):
+        br = BlockingRule(br)
+        br.match_key = i
+        brs.append(br)
+    settings_obj._blocking_rules_to_generate_predictions = brs
+
+    return comparison_vectors_from_store(training_linker, [nodes_with_tf])
+
+
+def comparison_vectors_for_match_key(
+    linker: Linker, shared_comparison_vectors: SplinkDataFrame, match_key: int
+) -> SplinkDataFrame:
+    """Materialise the comparison vectors generated by a single training blocking
+    rule from the output of `shared_comparison_vectors_for_training`"""
+
+    sql = f"""
+    select *
+    from __splink__df_comparison_vectors
+    where match_key = '{match_key}'
+    """
+    linker._enqueue_sql(sql, "__splink__df_comparison_vectors_for_match_key")
+    cvv = copy(linker._execute_sql_pipeline([shared_comparison_vectors]))
+
+    # Expectation maximisation expects to find the comparison vectors under
+    # their usual templated name
+    cvv.templated_name = "__splink__df_comparison_vectors"
+    return cvv
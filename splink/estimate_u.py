@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import logging
 from copy import deepcopy
+from math import inf, sqrt
 from typing import TYPE_CHECKING
 
-from .blocking import block_using_rules_sql
+from .blocking import BlockingRule, block_using_rules_sql
 from .comparison_vector_values import compute_comparison_vector_values_sql
 from .expectation_maximisation import (
     compute_new_parameters_sql,
@@ -17,10 +18,20 @@ from .m_u_records_to_parameters import (
 
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 if TYPE_CHECKING:
+    from .comparison import Comparison
+    from .comparison_level import ComparisonLevel
     from .linker import Linker
+    from .splink_dataframe import SplinkDataFrame
 
 logger = logging.getLogger(__name__)
 
+# The z score of the (95%) confidence intervals of u probabilities
+U_CONFIDENCE_INTERVAL_Z = 1.96
+# The number of pairs sampled in the first round of adaptive sampling for u, and
+# the maximum factor by which the number of pairs grows in each later round
+ADAPTIVE_U_INITIAL_PAIRS = 1e6
+ADAPTIVE_U_MAX_GROWTH = 10
+
 
 def _rows_needed_for_n_pairs(n_pairs):
     # Number of pairs generated by cartesian product is
@@ -31,24 +42,260 @@ def _rows_needed_for_n_pairs(n_pairs):
     return sample_rows
 
 
-def estimate_u_values(linker: Linker, max_pairs, seed=None):
-    logger.info("----- Estimating u probabilities using random sampling -----")
+def _exact_match_level_with_closed_form_u(cc: Comparison) -> ComparisonLevel:
+    """The exact match level of a comparison, if its u probability can be
+    computed exactly from the frequencies of the values in the column, or None.
 
-    nodes_with_tf = linker._initialise_df_concat_with_tf()
+    This is the case if the first level after the null level is an exact match
+    on a single column, and the null level checks for nulls in the same column.
+    The u probability is then the probability that two records with non-null
+    values, chosen at random, have the same value.
+    """
+    levels = cc._comparison_levels_excluding_null
+    if not levels or not levels[0]._is_exact_match:
+        return None
+    exact_cl = levels[0]
 
-    original_settings_obj = linker._settings_obj
+    cols = exact_cl._input_columns_used_by_sql_condition
+    null_levels = [cl for cl in cc.comparison_levels if cl._is_null_level]
+    if len(cols) != 1 or len(null_levels) != 1:
+        return None
 
-    training_linker = deepcopy(linker)
+    null_cols = null_levels[0]._input_columns_used_by_sql_condition
+    col_names = {c.unquote().name().lower() for c in cols + null_cols}
+    if len(col_names) != 1:
+        return None
 
-    training_linker._train_u_using_random_sample_mode = True
+    return exact_cl
+
+
+def _exact_match_pair_counts_sql(exact_match_levels: list[ComparisonLevel]) -> str:
+    """For the column of each exact match level, count the pairs of records with
+    the same non-null value, and the records with non-null values.
+
+    These are computed from the value counts (term frequencies) of the column
+    in a single scan, without generating any record pairs.
+    """
+    sqls = []
+    for cl in exact_match_levels:
+        col = cl._input_columns_used_by_sql_condition[0].name()
+        sql = f"""
+        select
+        '{cl.comparison._output_column_name}' as output_column_name,
+        sum(value_count * (value_count - 1) / 2) as agreeing_pairs,
+        sum(value_count) as non_null_count
+        from (
+            select count(*) as value_count
+            from __splink__df_concat_with_tf
+            where {col} is not null
+            group by {col}
+        ) as value_counts
+        """
+        sqls.append(sql)
+    return " union all ".join(sqls)
+
+
+def _apply_closed_form_u_for_exact_match_levels(
+    m_u_records_lookup: dict, exact_match_levels: list[ComparisonLevel], pair_counts
+):
+    """Replace the sampled u probability of each exact match level with the exact
+    value, and rescale the u probabilities of the other (sampled) levels of the
+    comparison so they continue to sum to one"""
+    for cl in exact_match_levels:
+        cc_name = cl.comparison._output_column_name
+        non_null_count = int(pair_counts[cc_name]["non_null_count"] or 0)
+        agreeing_pairs = int(pair_counts[cc_name]["agreeing_pairs"] or 0)
+        total_pairs = non_null_count * (non_null_count - 1) // 2
+
+        # If no two records share a value, leave the level as not observed rather
+        # than setting a u probability of zero
+        if agreeing_pairs == 0:
+            continue
+        u_exact = agreeing_pairs / total_pairs
+
+        levels_lookup = m_u_records_lookup.setdefault(cc_name, {})
+        exact_lookup = levels_lookup.setdefault(cl._comparison_vector_value, {})
+        sampled_u_exact = exact_lookup.get("u_probability", 0.0)
+
+        if sampled_u_exact < 1.0:
+            for value, level_lookup in levels_lookup.items():
+                if value == cl._comparison_vector_value:
+                    continue
+                scale = (1.0 - u_exact) / (1.0 - sampled_u_exact)
+                if "u_probability" in level_lookup:
+                    level_lookup["u_probability"] *= scale
+                if "u_probability_confidence_interval" in level_lookup:
+                    lower, upper = level_lookup["u_probability_confidence_interval"]
+                    level_lookup["u_probability_confidence_interval"] = (
+                        lower * scale,
+                        upper * scale,
+                    )
+
+        exact_lookup["u_probability"] = u_exact
+        # The exact value has no sampling error
+        for key in [
+            "u_probability_confidence_interval",
+            "u_probability_relative_ci_width",
+            "u_probability_sampled_pairs",
+        ]:
+            exact_lookup.pop(key, None)
+
+
+def _value_pair_u_counts_sqls(
+    cc: Comparison, sample_sql: str, proportion: float = 1.0
+) -> list[dict]:
+    """Count the pairs of records falling into each level of a comparison which
+    uses a single column, by evaluating the comparison on pairs of distinct
+    values, weighted by the number of pairs of records having those values.
+
+    Ordered pairs of records are counted, so the counts do not depend on whether
+    the comparison is symmetric.
+
+    If the distinct values are sampled with probability `proportion`, a pair of
+    a value with itself is in the sample with probability `proportion`, but a
+    pair of two different values only with probability `proportion` squared.
+    The counts are weighted by the inverse of these probabilities, so that they
+    are unbiased estimates of the counts amongst all pairs of values.
+    """
+    col = cc._input_columns_used_by_case_statement[0]
+    col_name = col.name()
+
+    sqls = []
+
+    sql = f"""
+    select *
+    from __splink__df_value_counts
+    {sample_sql}
+    """
+    sqls.append({"sql": sql, "output_table_name": "__splink__df_value_counts_sample"})
+
+    # The pairs of a value with itself exclude the pairs of a record with itself
+    sql = f"""
+    select
+    {col.l_name_as_l()},
+    {col.r_name_as_r()},
+    case
+        when l.{col_name} = r.{col_name}
+        then (cast(l.value_count as float8) * r.value_count - l.value_count)
+            * {1 / proportion}
+        else cast(l.value_count as float8) * r.value_count * {1 / proportion**2}
+    end as pair_count
+    from __splink__df_value_counts_sample as l
+    cross join __splink__df_value_counts_sample as r
+    """
+    sqls.append({"sql": sql, "output_table_name": "__splink__df_value_pairs"})
+
+    # The raw sql conditions are used, since the values are not dictionary encoded
+    whens = []
+    for cl in cc.comparison_levels:
+        if cl._is_else_level:
+            whens.append(f"{cl.sql_condition} {cl._comparison_vector_value}")
+        else:
+            whens.append(f"WHEN {cl.sql_condition} THEN {cl._comparison_vector_value}")
+    case_statement = f"CASE {' '.join(whens)} END"
+
+    sql = f"""
+    select {case_statement} as comparison_vector_value, pair_count
+    from __splink__df_value_pairs
+    """
+    sqls.append(
+        {"sql": sql, "output_table_name": "__splink__df_value_pair_comparisons"}
+    )
+
+    sql = f"""
+    select
+    comparison_vector_value,
+    sum(pair_count) as u_count,
+    '{cc._output_column_name}' as output_column_name
+    from __splink__df_value_pair_comparisons
+    group by comparison_vector_value
+    """
+    sqls.append({"sql": sql, "output_table_name": "__splink__value_pair_u_counts"})
+
+    return sqls
+
+
+def _u_records_from_value_pair_frequencies(
+    training_linker: Linker,
+    nodes_with_tf: SplinkDataFrame,
+    cc: Comparison,
+    max_pairs,
+    seed=None,
+):
+    """Estimate the u probabilities of a comparison which uses a single column
+    from the frequencies of pairs of distinct values in the column.
+
+    Distinct values are usually far fewer than records.  If there are more than
+    `max_pairs` pairs of distinct values, a random sample of the distinct values
+    is used.
+
+    Returns:
+        tuple: The u records, and the proportion of distinct values sampled
+    """
+    col = cc._input_columns_used_by_case_statement[0]
+    col_name = col.name()
 
+    sql = f"""
+    select {col_name}, count(*) as value_count
+    from __splink__df_concat_with_tf
+    where {col_name} is not null
+    group by {col_name}
+    """
+    training_linker._enqueue_sql(sql, "__splink__df_value_counts")
+    df_value_counts = training_linker._execute_sql_pipeline([nodes_with_tf])
+
+    sql = """
+    select count(*) as count
+    from __splink__df_value_counts
+    """
+    training_linker._enqueue_sql(sql, "__splink__df_value_counts_count")
+    dataframe = training_linker._execute_sql_pipeline([df_value_counts])
+    distinct_values = dataframe.as_record_dict()[0]["count"]
+    dataframe.drop_table_from_database_and_remove_from_cache()
+
+    # The number of pairs of values scales with the square of the proportion
+    proportion = min(max_pairs**0.5 / max(distinct_values, 1), 1.0)
+    sample_size = proportion * distinct_values
+    sample_sql = training_linker._random_sample_sql(
+        proportion,
+        sample_size,
+        seed,
+        table="__splink__df_value_counts",
+        unique_id=col_name,
+    )
+
+    for sql in _value_pair_u_counts_sqls(cc, sample_sql, proportion):
+        training_linker._enqueue_sql(sql["sql"], sql["output_table_name"])
+    df_u_counts = training_linker._execute_sql_pipeline([df_value_counts])
+    u_counts = df_u_counts.as_record_dict()
+    df_u_counts.drop_table_from_database_and_remove_from_cache()
+    df_value_counts.drop_table_from_database_and_remove_from_cache()
+
+    # As for sampled record pairs, u probabilities are proportions of the pairs
+    # which don't fall into the null level
+    u_counts = [r for r in u_counts if r["comparison_vector_value"] != -1]
+    total = sum(r["u_count"] for r in u_counts)
+    if total == 0:
+        return [], proportion
+
+    u_records = [
+        {
+            "output_column_name": r["output_column_name"],
+            "comparison_vector_value": r["comparison_vector_value"],
+            "m_probability": None,
+            "u_probability": r["u_count"] / total,
+        }
+        for r in u_counts
+        if r["u_count"] > 0
+    ]
+
+    return u_records, proportion
+
+
+def _record_and_pair_counts(training_linker: Linker, nodes_with_tf: SplinkDataFrame):
+    """The number of input records, and the total number of pairwise record
+    comparisons amongst them, taking into account the link type"""
     settings_obj = training_linker._settings_obj
-    settings_obj._retain_matching_columns = False
-    settings_obj._retain_intermediate_calculation_columns = False
-    settings_obj._training_mode = True
-    for cc in settings_obj.comparisons:
-        for cl in cc.comparison_levels:
-            cl._level_dict["tf_adjustment_column"] = None
 
     if settings_obj._link_type in ["dedupe_only", "link_and_dedupe"]:
         sql = """
@@ -62,8 +309,7 @@ def estimate_u_values(linker: Linker, max_pairs, seed=None):
         result = dataframe.as_record_dict()
         dataframe.drop_table_from_database_and_remove_from_cache()
         total_nodes = result[0]["count"]
-        sample_size = _rows_needed_for_n_pairs(max_pairs)
-        proportion = sample_size / total_nodes
+        total_pairs = total_nodes * (total_nodes - 1) / 2
 
     if settings_obj._link_type == "link_only":
         sql = """
@@ -79,14 +325,25 @@ def estimate_u_values(linker: Linker, max_pairs, seed=None):
         # total valid links is sum of pairwise product of individual row counts
         # i.e. if frame_counts are [a, b, c, d, ...],
         # total_links = a*b + a*c + a*d + ... + b*c + b*d + ... + c*d + ...
-        total_links = (
+        total_pairs = (
             sum(frame_counts) ** 2 - sum([count**2 for count in frame_counts])
         ) / 2
         total_nodes = sum(frame_counts)
 
+    return total_nodes, total_pairs
+
+
+def _sample_proportion_for_n_pairs(link_type, n_pairs, total_nodes, total_pairs):
+    """The proportion of records, and number of records, to sample so that the
+    cartesian product of the sample contains approximately `n_pairs` pairs"""
+    if link_type in ["dedupe_only", "link_and_dedupe"]:
+        sample_size = _rows_needed_for_n_pairs(n_pairs)
+        proportion = sample_size / total_nodes
+
+    if link_type == "link_only":
         # if we scale each frame by a proportion total_links scales with the square
-        # i.e. (our target) max_pairs == proportion^2 * total_links
-        proportion = (max_pairs / total_links) ** 0.5
+        # i.e. (our target) n_pairs == proportion^2 * total_links
+        proportion = (n_pairs / total_pairs) ** 0.5
         # sample size is for df_concat_with_tf, i.e. proportion of the total nodes
         sample_size = proportion * total_nodes
 
@@ -96,14 +353,18 @@ def estimate_u_values(linker: Linker, max_pairs, seed=None):
     if sample_size > total_nodes:
         sample_size = total_nodes
 
-    sql = f"""
-    select *
-    from __splink__df_concat_with_tf
-    {training_linker._random_sample_sql(proportion, sample_size, seed)}
-    """
-    training_linker._enqueue_sql(sql, "__splink__df_concat_with_tf_sample")
-    df_sample = training_linker._execute_sql_pipeline([nodes_with_tf])
+    return proportion, sample_size
 
+
+def _u_counts_from_sample(training_linker: Linker, df_sample: SplinkDataFrame):
+    """Count the pairwise comparisons amongst the sampled records falling into
+    each comparison level
+
+    Returns:
+        pd.DataFrame: The m and u counts, with all comparisons treated as
+            non-matches
+    """
+    settings_obj = training_linker._settings_obj
     settings_obj._blocking_rules_to_generate_predictions = []
 
     sql = block_using_rules_sql(training_linker)
@@ -131,12 +392,41 @@ def estimate_u_values(linker: Linker, max_pairs, seed=None):
     training_linker._enqueue_sql(sql, "__splink__df_predict")
 
     sql = compute_new_parameters_sql(settings_obj)
-    linker._enqueue_sql(sql, "__splink__m_u_counts")
+    training_linker._enqueue_sql(sql, "__splink__m_u_counts")
     df_params = training_linker._execute_sql_pipeline(sample_dataframe)
 
-    param_records = df_params.as_pandas_dataframe()
-    param_records = compute_proportions_for_new_parameters(param_records)
+    param_counts = df_params.as_pandas_dataframe()
     df_params.drop_table_from_database_and_remove_from_cache()
+
+    return param_counts
+
+
+def _u_records_from_random_sample(
+    training_linker: Linker, nodes_with_tf: SplinkDataFrame, max_pairs, seed=None
+):
+    """Estimate u probabilities from the cartesian product of a random sample of
+    records
+
+    Returns:
+        tuple: The m and u records, and the proportion of records sampled
+    """
+    settings_obj = training_linker._settings_obj
+
+    total_nodes, total_pairs = _record_and_pair_counts(training_linker, nodes_with_tf)
+    proportion, sample_size = _sample_proportion_for_n_pairs(
+        settings_obj._link_type, max_pairs, total_nodes, total_pairs
+    )
+
+    sql = f"""
+    select *
+    from __splink__df_concat_with_tf
+    {training_linker._random_sample_sql(proportion, sample_size, seed)}
+    """
+    training_linker._enqueue_sql(sql, "__splink__df_concat_with_tf_sample")
+    df_sample = training_linker._execute_sql_pipeline([nodes_with_tf])
+
+    param_records = _u_counts_from_sample(training_linker, df_sample)
+    param_records = compute_proportions_for_new_parameters(param_records)
     df_sample.drop_table_from_database_and_remove_from_cache()
 
     m_u_records = [
@@ -145,11 +435,373 @@ def estimate_u_values(linker: Linker, max_pairs, seed=None):
         if r["output_column_name"] != "_probability_two_random_records_match"
     ]
 
+    return m_u_records, proportion
+
+
+def _binomial_confidence_interval(count, n, z=U_CONFIDENCE_INTERVAL_Z):
+    """The Wilson score interval for a proportion `count / n`"""
+    p = count / n
+    denominator = 1 + z**2 / n
+    centre = (p + z**2 / (2 * n)) / denominator
+    half_width = z * sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denominator
+    return max(centre - half_width, 0.0), min(centre + half_width, 1.0)
+
+
+def _u_probability_precision(u_counts: dict) -> dict:
+    """For each level, the u probability and its binomial confidence interval,
+    computed from the counts of sampled pairs in each level.
+
+    Args:
+        u_counts (dict): The number of sampled pairs falling into each level,
+            like {(output_column_name, comparison_vector_value): count}
+
+    Returns:
+        dict: Like {(output_column_name, comparison_vector_value): {
+            "u_probability": 0.01, "confidence_interval": (0.009, 0.011),
+            "relative_ci_width": 0.2, "sampled_pairs": 1000}}, for the levels
+            observed in the sample
+    """
+    # As for the point estimates, the pairs falling into the null level are
+    # excluded
+    non_null_counts = {}
+    for (cc_name, value), count in u_counts.items():
+        if value != -1:
+            non_null_counts[cc_name] = non_null_counts.get(cc_name, 0) + count
+
+    precision = {}
+    for (cc_name, value), count in u_counts.items():
+        if value == -1 or count == 0:
+            continue
+        n = non_null_counts[cc_name]
+        lower, upper = _binomial_confidence_interval(count, n)
+        precision[(cc_name, value)] = {
+            "u_probability": count / n,
+            "confidence_interval": (lower, upper),
+            "relative_ci_width": (upper - lower) / (count / n),
+            "sampled_pairs": n,
+        }
+    return precision
+
+
+def _pairs_needed_for_relative_ci_width(
+    u_counts: dict, levels: list[tuple], target_relative_ci_width
+):
+    """Estimate the total number of sampled pairs needed for every one of
+    `levels` to reach the target relative confidence interval width, using the
+    normal approximation to the binomial.  Returns inf if a level is unobserved.
+    """
+    total_pairs = {}
+    non_null_counts = {}
+    for (cc_name, value), count in u_counts.items():
+        total_pairs[cc_name] = total_pairs.get(cc_name, 0) + count
+        if value != -1:
+            non_null_counts[cc_name] = non_null_counts.get(cc_name, 0) + count
+
+    z = U_CONFIDENCE_INTERVAL_Z
+    pairs_needed = 0
+    for cc_name, value in levels:
+        count = u_counts.get((cc_name, value), 0)
+        if count == 0:
+            return inf
+        u = count / non_null_counts[cc_name]
+        # The relative width is approximately 2z * sqrt((1 - u) / (u * n))
+        n = 4 * z**2 * (1 - u) / (u * target_relative_ci_width**2)
+        # Scale up by the proportion of sampled pairs which are not null
+        pairs_needed = max(
+            pairs_needed, n * total_pairs[cc_name] / non_null_counts[cc_name]
+        )
+    return pairs_needed
+
+
+def _u_records_from_adaptive_random_sample(
+    training_linker: Linker,
+    nodes_with_tf: SplinkDataFrame,
+    max_pairs,
+    target_relative_ci_width,
+    levels_to_skip: list[tuple] = None,
+    seed=None,
+):
+    """Estimate u probabilities from the cartesian product of a random sample of
+    records, sampling in rounds of increasing size until the relative width of
+    the 95% confidence interval of every u probability is below
+    `target_relative_ci_width`, or `max_pairs` pairs have been sampled.
+
+    Each record is assigned a random number once, and the sample in each round is
+    the records whose random number is below the proportion being sampled.  The
+    samples are therefore nested, so each round only compares the pairs of
+    records not compared in previous rounds, and adds to the counts of pairs in
+    each level from previous rounds.
+
+    The confidence intervals treat the sampled pairs as independent, which they
+    are not quite, since each sampled record appears in many pairs.
+
+    Args:
+        levels_to_skip (list[tuple]): Levels, like (output_column_name,
+            comparison_vector_value), whose confidence intervals are not used to
+            decide when to stop sampling, e.g. because their u probabilities are
+            computed exactly elsewhere
+
+    Returns:
+        tuple: The u records, the proportion of records sampled, and the
+            precision of the u probabilities (see _u_probability_precision)
+    """
+    settings_obj = training_linker._settings_obj
+    link_type = settings_obj._link_type
+
+    total_nodes, total_pairs = _record_and_pair_counts(training_linker, nodes_with_tf)
+
+    if seed is not None:
+        uniform_expression = training_linker._hashed_uniform_expression(seed)
+    else:
+        uniform_expression = training_linker._random_uniform_expression
+
+    sql = f"""
+    select *, {uniform_expression} as __splink__sample_random
+    from __splink__df_concat_with_tf
+    """
+    training_linker._enqueue_sql(sql, "__splink__df_concat_with_tf_sample_random")
+    df_random = training_linker._execute_sql_pipeline([nodes_with_tf])
+
+    levels_to_skip = levels_to_skip or []
+    levels_to_check = [
+        (cc._output_column_name, cl._comparison_vector_value)
+        for cc in settings_obj.comparisons
+        for cl in cc._comparison_levels_excluding_null
+        if (cc._output_column_name, cl._comparison_vector_value) not in levels_to_skip
+    ]
+
+    u_counts = {}
+    previous_proportion = 0.0
+    round_pairs = min(max_pairs, ADAPTIVE_U_INITIAL_PAIRS)
+    round_number = 0
+
+    while True:
+        round_number += 1
+        proportion, _ = _sample_proportion_for_n_pairs(
+            link_type, round_pairs, total_nodes, total_pairs
+        )
+
+        where_sql = ""
+        if proportion < 1.0:
+            where_sql = f"where __splink__sample_random < {proportion}"
+        sql = f"""
+        select *,
+        case when __splink__sample_random >= {previous_proportion} then 1 else 0 end
+            as __splink__sample_new
+        from __splink__df_concat_with_tf_sample_random
+        {where_sql}
+        """
+        training_linker._enqueue_sql(sql, "__splink__df_concat_with_tf_sample")
+        df_sample = training_linker._execute_sql_pipeline([df_random])
+
+        # Only compare the pairs of records which were not both in the sample for
+        # a previous round
+        if previous_proportion > 0:
+            settings_obj._blocking_rule_for_training = BlockingRule(
+                "l.__splink__sample_new = 1 or r.__splink__sample_new = 1"
+            )
+
+        param_counts = _u_counts_from_sample(training_linker, df_sample)
+        df_sample.drop_table_from_database_and_remove_from_cache()
+
+        for r in param_counts.to_dict("records"):
+            if r["output_column_name"] == "_probability_two_random_records_match":
+                continue
+            key = (r["output_column_name"], r["comparison_vector_value"])
+            u_counts[key] = u_counts.get(key, 0) + r["u_count"]
+
+        precision = _u_probability_precision(u_counts)
+        widths = [
+            precision[level]["relative_ci_width"] if level in precision else inf
+            for level in levels_to_check
+        ]
+        max_width = max(widths, default=0.0)
+        logger.info(
+            f"Round {round_number} of sampling for u: sampled up to "
+            f"{round_pairs:,.0f} pairs, largest relative width of the confidence "
+            f"interval of a u probability is {max_width:,.3f}"
+        )
+
+        if (
+            max_width <= target_relative_ci_width
+            or proportion >= 1.0
+            or round_pairs >= max_pairs
+        ):
+            break
+
+        pairs_needed = _pairs_needed_for_relative_ci_width(
+            u_counts, levels_to_check, target_relative_ci_width
+        )
+        previous_proportion = proportion
+        round_pairs = min(
+            max_pairs,
+            max(
+                2 * round_pairs, min(ADAPTIVE_U_MAX_GROWTH * round_pairs, pairs_needed)
+            ),
+        )
+
+    settings_obj._blocking_rule_for_training = None
+    df_random.drop_table_from_database_and_remove_from_cache()
+
+    u_records = [
+        {
+            "output_column_name": cc_name,
+            "comparison_vector_value": value,
+            "m_probability": None,
+            "u_probability": p["u_probability"],
+        }
+        for (cc_name, value), p in precision.items()
+    ]
+
+    return u_records, proportion, precision
+
+
+def estimate_u_values(
+    linker: Linker,
+    max_pairs,
+    seed=None,
+    use_value_pair_frequencies=False,
+    target_relative_ci_width=None,
+    comparisons: list[Comparison] = None,
+):
+    logger.info("----- Estimating u probabilities using random sampling -----")
+
+    nodes_with_tf = linker._initialise_df_concat_with_tf()
+
+    original_settings_obj = linker._settings_obj
+
+    training_linker = deepcopy(linker)
+
+    training_linker._train_u_using_random_sample_mode = True
+
+    settings_obj = training_linker._settings_obj
+    settings_obj._retain_matching_columns = False
+    settings_obj._retain_intermediate_calculation_columns = False
+    settings_obj._training_mode = True
+    for cc in settings_obj.comparisons:
+        for cl in cc.comparison_levels:
+            cl._level_dict["tf_adjustment_column"] = None
+
+    # Only the requested comparisons are computed
+    if comparisons is not None:
+        cc_names = [cc._output_column_name for cc in comparisons]
+        settings_obj.comparisons = [
+            cc for cc in settings_obj.comparisons if cc._output_column_name in cc_names
+        ]
+    trained_comparison_names = [
+        cc._output_column_name for cc in settings_obj.comparisons
+    ]
+
+    # Comparisons using a single column are estimated from the frequencies of
+    # pairs of distinct values.  This is not possible for link_only jobs, since
+    # only pairs of records from different input datasets are compared
+    value_pair_comparisons = []
+    if use_value_pair_frequencies and settings_obj._link_type != "link_only":
+        value_pair_comparisons = [
+            cc
+            for cc in settings_obj.comparisons
+            if len(cc._input_columns_used_by_case_statement) == 1
+        ]
+
+    m_u_records = []
+    # The comparisons whose u probabilities are estimated from a sample
+    sampled_comparison_names = []
+    value_pair_comparison_names = []
+
+    for cc in value_pair_comparisons:
+        u_records, proportion = _u_records_from_value_pair_frequencies(
+            training_linker, nodes_with_tf, cc, max_pairs, seed
+        )
+        m_u_records.extend(u_records)
+        value_pair_comparison_names.append(cc._output_column_name)
+        if proportion < 1.0:
+            sampled_comparison_names.append(cc._output_column_name)
+
+    settings_obj.comparisons = [
+        cc
+        for cc in settings_obj.comparisons
+        if cc._output_column_name not in value_pair_comparison_names
+    ]
+    precision = {}
+    if settings_obj.comparisons and target_relative_ci_width is not None:
+        # The exact match levels whose u probabilities are computed from the
+        # value counts do not need to be estimated precisely from the sample
+        levels_to_skip = []
+        if settings_obj._link_type != "link_only":
+            for cc in settings_obj.comparisons:
+                cl = _exact_match_level_with_closed_form_u(cc)
+                if cl is not None:
+                    levels_to_skip.append(
+                        (cc._output_column_name, cl._comparison_vector_value)
+                    )
+        (
+            sample_records,
+            proportion,
+            precision,
+        ) = _u_records_from_adaptive_random_sample(
+            training_linker,
+            nodes_with_tf,
+            max_pairs,
+            target_relative_ci_width,
+            levels_to_skip,
+            seed,
+        )
+    elif settings_obj.comparisons:
+        sample_records, proportion = _u_records_from_random_sample(
+            training_linker, nodes_with_tf, max_pairs, seed
+        )
+    if settings_obj.comparisons:
+        m_u_records.extend(sample_records)
+        if proportion < 1.0:
+            sampled_comparison_names.extend(
+                cc._output_column_name for cc in settings_obj.comparisons
+            )
+
     m_u_records_lookup = m_u_records_to_lookup_dict(m_u_records)
+    for (cc_name, value), p in precision.items():
+        level_lookup = m_u_records_lookup[cc_name][value]
+        level_lookup["u_probability_confidence_interval"] = p["confidence_interval"]
+        level_lookup["u_probability_relative_ci_width"] = p["relative_ci_width"]
+        level_lookup["u_probability_sampled_pairs"] = p["sampled_pairs"]
+
+    # Where the pairs are a sample, the u probabilities of exact match levels are
+    # instead computed exactly from the value counts of the column.  This is not
+    # possible for link_only jobs, since only pairs of records from different
+    # input datasets are compared
+    exact_match_levels = []
+    if settings_obj._link_type != "link_only":
+        for cc in original_settings_obj.comparisons:
+            if cc._output_column_name not in sampled_comparison_names:
+                continue
+            cl = _exact_match_level_with_closed_form_u(cc)
+            if cl is not None:
+                exact_match_levels.append(cl)
+
+    if exact_match_levels:
+        sql = _exact_match_pair_counts_sql(exact_match_levels)
+        training_linker._enqueue_sql(sql, "__splink__exact_match_pair_counts")
+        df_pair_counts = training_linker._execute_sql_pipeline([nodes_with_tf])
+        pair_counts = {
+            r["output_column_name"]: r for r in df_pair_counts.as_record_dict()
+        }
+        df_pair_counts.drop_table_from_database_and_remove_from_cache()
+
+        _apply_closed_form_u_for_exact_match_levels(
+            m_u_records_lookup, exact_match_levels, pair_counts
+        )
+
     for c in original_settings_obj.comparisons:
+        if c._output_column_name not in trained_comparison_names:
+            continue
         for cl in c._comparison_levels_excluding_null:
+            if cl in exact_match_levels:
+                training_description = "estimate u from term frequencies"
+            elif c._output_column_name in value_pair_comparison_names:
+                training_description = "estimate u from value pair frequencies"
+            else:
+                training_description = "estimate u by random sampling"
             append_u_probability_to_comparison_level_trained_probabilities(
-                cl, m_u_records_lookup, "estimate u by random sampling"
+                cl, m_u_records_lookup, training_description
             )
 
     logger.info("\nEstimated u probabilities using random sampling")
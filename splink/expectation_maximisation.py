@@ -1,20 +1,22 @@
 from __future__ import annotations
 
 import logging
+import math
 import time
+from copy import copy
 from typing import TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 
 from .comparison_level import ComparisonLevel
 from .constants import LEVEL_NOT_OBSERVED_TEXT
 from .m_u_records_to_parameters import m_u_records_to_lookup_dict
-from .predict import (
-    predict_from_agreement_pattern_counts_sqls,
-    predict_from_comparison_vectors_sqls,
-)
+from .misc import prob_to_bayes_factor
+from .predict import predict_from_comparison_vectors_sqls
 from .settings import Settings
 from .splink_dataframe import SplinkDataFrame
+from .unique_id_concat import CONCAT_SEPARATOR, _composite_unique_id_from_edges_sql
 
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 if TYPE_CHECKING:
@@ -41,10 +43,226 @@ def count_agreement_patterns_sql(settings_obj: Settings):
     return sql
 
 
-def compute_new_parameters_sql(settings_obj: Settings):
+# Agreement patterns with fewer pairs than this are sampled at a higher rate,
+# so that rare patterns are represented in a sample of the comparison vectors
+MIN_SAMPLED_PAIRS_PER_AGREEMENT_PATTERN = 100
+
+
+def sample_comparison_vectors_sqls(
+    settings_obj: Settings,
+    comparison_vector_columns: list[str],
+    sampling_rate: float,
+    random_expression: str,
+) -> list[dict]:
+    """Take a sample of the comparison vectors, stratified by agreement pattern.
+
+    Pairs are sampled at `sampling_rate`, except in agreement patterns with
+    fewer than MIN_SAMPLED_PAIRS_PER_AGREEMENT_PATTERN / sampling_rate pairs,
+    which are sampled at the rate needed to retain that many pairs (or all pairs,
+    where there are fewer).  Each sampled pair is weighted by the number of pairs
+    in its agreement pattern divided by the number sampled, so that the weighted
+    count of each agreement pattern matches the full set of comparison vectors.
+
+    The sample must be materialised before the weights are computed, since some
+    backends evaluate window functions before a random filter is applied.
+    """
+    gamma_cols_expr = ", ".join(
+        cc._gamma_column_name for cc in settings_obj.comparisons
+    )
+    select_expr = ", ".join(comparison_vector_columns)
+    min_pairs = MIN_SAMPLED_PAIRS_PER_AGREEMENT_PATTERN
+
+    # The agreement pattern counts are computed using a window function rather
+    # than joined on, so the random filter can't be pushed down to the counts
+    sql = f"""
+    select *,
+    count(*) over (partition by {gamma_cols_expr}) as agreement_pattern_count,
+    {random_expression} as sample_random_number
+    from __splink__df_comparison_vectors
+    """
+    counts_sql = {
+        "sql": sql,
+        "output_table_name": "__splink__df_comparison_vectors_with_pattern_counts",
+    }
+
+    sql = f"""
+    select {select_expr}, agreement_pattern_count
+    from __splink__df_comparison_vectors_with_pattern_counts
+    where sample_random_number < case
+        when agreement_pattern_count * {sampling_rate} >= {min_pairs}
+        then {sampling_rate}
+        else {min_pairs} * 1.0 / agreement_pattern_count
+    end
+    """
+    sample_sql = {
+        "sql": sql,
+        "output_table_name": "__splink__df_comparison_vectors_sample_unweighted",
+    }
+
+    sql = f"""
+    select *,
+    agreement_pattern_count * 1.0 / count(*) over (partition by {gamma_cols_expr})
+        as sample_weight
+    from __splink__df_comparison_vectors_sample_unweighted
+    """
+    weights_sql = {
+        "sql": sql,
+        "output_table_name": "__splink__df_comparison_vectors_sample",
+    }
+
+    return [counts_sql, sample_sql, weights_sql]
+
+
+def sample_comparison_vectors(
+    em_training_session: EMTrainingSession,
+    df_comparison_vector_values: SplinkDataFrame,
+    sample_pairs: int,
+    seed: int = None,
+) -> SplinkDataFrame:
+    """If there are more than `sample_pairs` comparison vectors, return a weighted
+    sample of approximately `sample_pairs` of them, stratified by agreement
+    pattern, on which to run expectation maximisation.  Otherwise return the
+    comparison vectors unchanged.
+
+    Since the weighted count of each agreement pattern in the sample is exact,
+    only the variation in term frequency adjustments within each agreement
+    pattern is subject to sampling error.
+
+    The agreement patterns of all of the comparison vectors are counted before
+    sampling, so the full table of comparison vectors is still computed and
+    scanned once.  Sampling reduces the cost of each EM iteration, not the cost
+    of generating the pairs.
+
+    If `seed` is provided, pairs are sampled using a hash of their unique ids and
+    the seed, so the same pairs are sampled on every run.
+    """
+    settings_obj = em_training_session._settings_obj
+    linker = em_training_session._original_linker
+
+    sql = """
+    select count(*) as count
+    from __splink__df_comparison_vectors
+    """
+    linker._enqueue_sql(sql, "__splink__df_comparison_vectors_count")
+    df_count = linker._execute_sql_pipeline([df_comparison_vector_values])
+    total_pairs = int(df_count.as_record_dict()[0]["count"])
+    df_count.drop_table_from_database_and_remove_from_cache()
+
+    if total_pairs <= sample_pairs:
+        return df_comparison_vector_values
+
+    sampling_rate = sample_pairs / total_pairs
+    logger.info(
+        f"Estimating parameters from a sample of approximately {sample_pairs:,.0f} "
+        f"of the {total_pairs:,.0f} record pairs generated by the blocking rule"
+    )
+
+    if seed is not None:
+        uid_cols = settings_obj._unique_id_input_columns
+        pair_id = f" || '{CONCAT_SEPARATOR}' || ".join(
+            _composite_unique_id_from_edges_sql(uid_cols, l_or_r)
+            for l_or_r in ["l", "r"]
+        )
+        random_expression = linker._hashed_uniform_expression(seed, pair_id)
+    else:
+        random_expression = linker._random_uniform_expression
+
+    counts_sql, sample_sql, weights_sql = sample_comparison_vectors_sqls(
+        settings_obj,
+        df_comparison_vector_values.columns_escaped,
+        sampling_rate,
+        random_expression,
+    )
+    linker._enqueue_sql(counts_sql["sql"], counts_sql["output_table_name"])
+    linker._enqueue_sql(sample_sql["sql"], sample_sql["output_table_name"])
+    df_sample_unweighted = linker._execute_sql_pipeline(
+        [df_comparison_vector_values], use_cache=False
+    )
+    linker._enqueue_sql(weights_sql["sql"], weights_sql["output_table_name"])
+    df_sample = linker._execute_sql_pipeline([df_sample_unweighted], use_cache=False)
+
+    df_sample_unweighted.drop_table_from_database_and_remove_from_cache()
+
+    # Expectation maximisation expects to find the comparison vectors under
+    # their usual templated name
+    df_sample = copy(df_sample)
+    df_sample.templated_name = "__splink__df_comparison_vectors"
+    settings_obj._use_sample_weights = True
+
+    return df_sample
+
+
+def log2_likelihood_sql(settings_obj: Settings, pair_weight: str) -> str:
+    """The sum of the log2 likelihoods of the pairwise comparisons under the current
+    parameters, each multiplied by `pair_weight`, computed from the bayes factor
+    parts of predict.
+
+    The likelihood of a pair is lambda * prod(m) + (1 - lambda) * prod(u), where the
+    u values include any term frequency adjustments (the tf bayes factor of a level
+    is u / adjusted u).  The log2 of each of the two terms is computed separately,
+    and combined in a numerically stable way.  Where a pair falls in a level with a
+    zero probability, its likelihood is given by the other term alone.
+    """
+    lam = settings_obj._probability_two_random_records_match
+
+    m_terms = [str(math.log2(lam)) if lam > 0 else "0"]
+    u_terms = [str(math.log2(1 - lam)) if lam < 1 else "0"]
+    m_is_zero = ["1=1"] if lam <= 0 else []
+    u_is_zero = ["1=1"] if lam >= 1 else []
+
+    for cc in settings_obj.comparisons:
+        gamma_col = cc._gamma_column_name
+        m_whens = []
+        u_whens = []
+        for cl in cc._comparison_levels_excluding_null:
+            in_level = f"{gamma_col} = {cl._comparison_vector_value}"
+            m, u = cl.m_probability, cl.u_probability
+            if m:
+                m_whens.append(f"when {in_level} then {math.log2(m)}")
+            else:
+                m_is_zero.append(in_level)
+            if u:
+                u_whens.append(f"when {in_level} then {math.log2(u)}")
+            else:
+                u_is_zero.append(in_level)
+        m_terms.append(f"case {' '.join(m_whens)} else 0 end")
+        u_terms.append(f"case {' '.join(u_whens)} else 0 end")
+        if cc._has_tf_adjustments:
+            u_terms.append(f"-log2({cc._bf_tf_adj_column_name})")
+
+    def any_condition(conditions):
+        conditions = " or ".join(conditions) if conditions else "1=0"
+        return f"case when {conditions} then 1 else 0 end"
+
+    return f"""
+    select
+    sum(case
+        when m_is_zero = 1 then log2_u_term
+        when u_is_zero = 1 then log2_m_term
+        when log2_m_term >= log2_u_term
+            then log2_m_term + log2(1 + power(2, log2_u_term - log2_m_term))
+        else log2_u_term + log2(1 + power(2, log2_m_term - log2_u_term))
+    end * pair_weight) as log2_likelihood
+    from (
+        select
+        {" + ".join(m_terms)} as log2_m_term,
+        {" + ".join(u_terms)} as log2_u_term,
+        {any_condition(m_is_zero)} as m_is_zero,
+        {any_condition(u_is_zero)} as u_is_zero,
+        {pair_weight} as pair_weight
+        from __splink__df_match_weight_parts
+    ) as log2_likelihood_parts
+    """
+
+
+def compute_new_parameters_sql(
+    settings_obj: Settings, include_log_likelihood: bool = False
+):
     """compute m and u counts from the results of predict"""
     if getattr(settings_obj, "_estimate_without_term_frequencies", False):
         agreement_pattern_count = "agreement_pattern_count"
+    elif settings_obj._use_sample_weights:
+        agreement_pattern_count = "sample_weight"
     else:
         agreement_pattern_count = "1"
 
@@ -78,6 +296,18 @@ def compute_new_parameters_sql(settings_obj: Settings):
     """
     union_sqls.append(sql)
 
+    if include_log_likelihood:
+        # The log2 likelihood is carried in the m_count column
+        sql = f"""
+        select 0 as comparison_vector_value,
+            log2_likelihood as m_count,
+            0 as u_count,
+            '_log_likelihood' as output_column_name
+        from ({log2_likelihood_sql(settings_obj, agreement_pattern_count)})
+            as log2_likelihood
+        """
+        union_sqls.append(sql)
+
     sql = " union all ".join(union_sqls)
 
     return sql
@@ -155,6 +385,303 @@ def compute_proportions_for_new_parameters(m_u_df):
         return compute_proportions_for_new_parameters_pandas(m_u_df)
 
 
+def sufficient_statistics_from_m_u_counts(
+    settings_obj: Settings, m_u_counts: pd.DataFrame
+) -> dict:
+    """The expected number of matching and non-matching pairs in each comparison
+    level, and the total number of pairs and expected number of matches, from the
+    output of compute_new_parameters_sql.
+
+    These are sufficient statistics for the maximisation step, so statistics
+    computed on different sets of pairs can be added together (see
+    combine_sufficient_statistics).
+    """
+    counts = m_u_counts[
+        m_u_counts["output_column_name"] != "_probability_two_random_records_match"
+    ]
+
+    # Every pair falls into exactly one level of each comparison
+    first_cc_name = settings_obj.comparisons[0]._output_column_name
+    first_cc_counts = counts[counts["output_column_name"] == first_cc_name]
+    expected_match_count = first_cc_counts["m_count"].sum()
+    pair_count = expected_match_count + first_cc_counts["u_count"].sum()
+
+    return {
+        "pair_count": float(pair_count),
+        "expected_match_count": float(expected_match_count),
+        "m_u_counts": [
+            {
+                "output_column_name": r["output_column_name"],
+                "comparison_vector_value": int(r["comparison_vector_value"]),
+                "m_count": float(np.nan_to_num(r["m_count"])),
+                "u_count": float(np.nan_to_num(r["u_count"])),
+            }
+            for r in counts.to_dict("records")
+        ],
+    }
+
+
+def combine_sufficient_statistics(statistics_1: dict, statistics_2: dict) -> dict:
+    """Add together the sufficient statistics from two sets of pairs.  Only the
+    comparisons in `statistics_2` are retained"""
+    cc_names = {r["output_column_name"] for r in statistics_2["m_u_counts"]}
+
+    m_u_counts = {}
+    for r in statistics_1["m_u_counts"] + statistics_2["m_u_counts"]:
+        if r["output_column_name"] not in cc_names:
+            continue
+        key = (r["output_column_name"], r["comparison_vector_value"])
+        if key not in m_u_counts:
+            m_u_counts[key] = {**r, "m_count": 0.0, "u_count": 0.0}
+        m_u_counts[key]["m_count"] += r["m_count"]
+        m_u_counts[key]["u_count"] += r["u_count"]
+
+    return {
+        "pair_count": statistics_1["pair_count"] + statistics_2["pair_count"],
+        "expected_match_count": statistics_1["expected_match_count"]
+        + statistics_2["expected_match_count"],
+        "m_u_counts": list(m_u_counts.values()),
+    }
+
+
+def m_u_counts_from_sufficient_statistics(statistics: dict) -> pd.DataFrame:
+    """Recreate the output of compute_new_parameters_sql from sufficient
+    statistics"""
+    lam = statistics["expected_match_count"] / statistics["pair_count"]
+    records = [
+        {
+            "comparison_vector_value": 0,
+            "m_count": lam,
+            "u_count": 1 - lam,
+            "output_column_name": "_probability_two_random_records_match",
+        }
+    ]
+    records.extend(statistics["m_u_counts"])
+    return pd.DataFrame(records)
+
+
+def m_u_counts_from_agreement_patterns(
+    settings_obj: Settings,
+    gammas: np.ndarray,
+    counts: np.ndarray,
+    match_probabilities: np.ndarray,
+) -> pd.DataFrame:
+    """The m and u counts, computed in memory.  Equivalent to
+    compute_new_parameters_sql"""
+    m_counts = match_probabilities * counts
+    u_counts = (1 - match_probabilities) * counts
+
+    records = [
+        {
+            "comparison_vector_value": 0,
+            "m_count": float(np.nansum(m_counts) / counts.sum()),
+            "u_count": float(np.nansum(u_counts) / counts.sum()),
+            "output_column_name": "_probability_two_random_records_match",
+        }
+    ]
+    for i, cc in enumerate(settings_obj.comparisons):
+        for value in np.unique(gammas[:, i]):
+            in_level = gammas[:, i] == value
+            records.append(
+                {
+                    "comparison_vector_value": int(value),
+                    "m_count": float(np.nansum(m_counts[in_level])),
+                    "u_count": float(np.nansum(u_counts[in_level])),
+                    "output_column_name": cc._output_column_name,
+                }
+            )
+    return pd.DataFrame(records)
+
+
+def agreement_pattern_counts_to_arrays(
+    settings_obj: Settings, df_agreement_pattern_counts: SplinkDataFrame
+):
+    """Pull the agreement pattern counts into memory, so that EM iterations can
+    be run locally rather than as a query against the backend.
+
+    Returns:
+        tuple: An integer array of comparison vector values, with one row per
+            agreement pattern and one column per comparison, and an array of
+            the number of times each agreement pattern was observed
+    """
+    df = df_agreement_pattern_counts.as_pandas_dataframe()
+    df.columns = [c.lower() for c in df.columns]
+
+    gamma_cols = [cc._gamma_column_name.lower() for cc in settings_obj.comparisons]
+    gammas = df[gamma_cols].to_numpy(dtype=np.int64)
+    counts = df["agreement_pattern_count"].to_numpy(dtype=np.float64)
+    return gammas, counts
+
+
+def match_probabilities_from_agreement_patterns(
+    settings_obj: Settings, gammas: np.ndarray
+) -> np.ndarray:
+    """The expectation step, computed in memory.  Equivalent to
+    predict_from_agreement_pattern_counts_sqls"""
+    lam = settings_obj._probability_two_random_records_match
+    if lam == 1.0:
+        return np.ones(len(gammas))
+
+    bayes_factors = np.full(len(gammas), prob_to_bayes_factor(lam))
+    any_bf_inf = np.zeros(len(gammas), dtype=bool)
+    for i, cc in enumerate(settings_obj.comparisons):
+        cc_bayes_factors = np.ones(len(gammas))
+        for cl in cc._comparison_levels_excluding_null:
+            bf = cl._bayes_factor
+            bf = np.nan if bf is None else bf
+            cc_bayes_factors[gammas[:, i] == cl._comparison_vector_value] = bf
+        any_bf_inf |= np.isinf(cc_bayes_factors)
+        bayes_factors = bayes_factors * cc_bayes_factors
+
+    # As in sql, if any bayes factor is infinite, the comparison is a match
+    with np.errstate(invalid="ignore"):
+        match_probabilities = bayes_factors / (1 + bayes_factors)
+    return np.where(any_bf_inf, 1.0, match_probabilities)
+
+
+def compute_new_parameters_from_agreement_patterns(
+    settings_obj: Settings,
+    gammas: np.ndarray,
+    counts: np.ndarray,
+    match_probabilities: np.ndarray,
+) -> list[dict]:
+    """The maximisation step, computed in memory.  Equivalent to
+    compute_new_parameters_sql followed by compute_proportions_for_new_parameters
+    """
+    # As in sql, null match probabilities are ignored by the sums below
+    m_counts = match_probabilities * counts
+    u_counts = (1 - match_probabilities) * counts
+
+    param_records = [
+        {
+            "comparison_vector_value": 0,
+            "output_column_name": "_probability_two_random_records_match",
+            "m_probability": float(np.nansum(m_counts) / counts.sum()),
+            "u_probability": float(np.nansum(u_counts) / counts.sum()),
+        }
+    ]
+
+    for i, cc in enumerate(settings_obj.comparisons):
+        values = np.unique(gammas[:, i])
+        values = values[values != -1]
+        cc_m_counts = np.array([np.nansum(m_counts[gammas[:, i] == v]) for v in values])
+        cc_u_counts = np.array([np.nansum(u_counts[gammas[:, i] == v]) for v in values])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m_probabilities = cc_m_counts / cc_m_counts.sum()
+            u_probabilities = cc_u_counts / cc_u_counts.sum()
+
+        for value, m, u in zip(values, m_probabilities, u_probabilities):
+            param_records.append(
+                {
+                    "comparison_vector_value": int(value),
+                    "output_column_name": cc._output_column_name,
+                    "m_probability": float(m),
+                    "u_probability": float(u),
+                }
+            )
+
+    return param_records
+
+
+def log_likelihood_from_agreement_patterns(
+    settings_obj: Settings, gammas: np.ndarray, counts: np.ndarray
+) -> float:
+    """The log likelihood of the agreement patterns under the current parameters"""
+    lam = settings_obj._probability_two_random_records_match
+    log_m = np.full(len(gammas), np.log(lam) if lam > 0 else -np.inf)
+    log_u = np.full(len(gammas), np.log(1 - lam) if lam < 1 else -np.inf)
+
+    with np.errstate(divide="ignore"):
+        for i, cc in enumerate(settings_obj.comparisons):
+            for cl in cc._comparison_levels_excluding_null:
+                in_level = gammas[:, i] == cl._comparison_vector_value
+                log_m[in_level] += np.log(cl.m_probability)
+                log_u[in_level] += np.log(cl.u_probability)
+
+    return float(np.sum(np.logaddexp(log_m, log_u) * counts))
+
+
+def em_parameters_to_vector(settings_obj: Settings):
+    """The probability two random records match, followed by the m and u
+    probabilities of each comparison, as a single vector.  Returns None if any
+    of the probabilities are unavailable, e.g. because a level was not observed
+    """
+    params = [settings_obj._probability_two_random_records_match]
+    for cc in settings_obj.comparisons:
+        levels = cc._comparison_levels_excluding_null
+        for cl in levels:
+            if LEVEL_NOT_OBSERVED_TEXT in (cl._m_probability, cl._u_probability):
+                return None
+        params.extend(cl.m_probability for cl in levels)
+        params.extend(cl.u_probability for cl in levels)
+
+    if any(p is None for p in params):
+        return None
+    return np.array(params, dtype=np.float64)
+
+
+def set_em_parameters_from_vector(
+    em_training_session: EMTrainingSession, vector: np.ndarray, eps: float = 1e-10
+):
+    """Set the parameters of the training model from a vector created by
+    em_parameters_to_vector.
+
+    Extrapolated parameters may lie outside of the parameter space, so each
+    probability is clipped to (0,1), and the m and u probabilities of each
+    comparison renormalised to sum to one.  Fixed parameters are not modified.
+    """
+    session = em_training_session
+    settings_obj = session._settings_obj
+    vector = np.clip(vector, eps, 1 - eps)
+
+    if not session._training_fix_probability_two_random_records_match:
+        settings_obj._probability_two_random_records_match = float(vector[0])
+
+    offset = 1
+    for cc in settings_obj.comparisons:
+        levels = cc._comparison_levels_excluding_null
+        n = len(levels)
+        m_values = vector[offset : offset + n]
+        u_values = vector[offset + n : offset + 2 * n]
+        offset += 2 * n
+
+        for cl, m, u in zip(
+            levels, m_values / m_values.sum(), u_values / u_values.sum()
+        ):
+            if not session._training_fix_m_probabilities:
+                cl.m_probability = float(m)
+            if not session._training_fix_u_probabilities:
+                cl.u_probability = float(u)
+
+
+def squarem_extrapolation(
+    theta_0: np.ndarray, theta_1: np.ndarray, theta_2: np.ndarray
+) -> np.ndarray:
+    """Extrapolate from three successive EM iterates using the SQUAREM (squared
+    iterative methods) scheme S3 of Varadhan and Roland (2008).
+
+    The step length is bounded so that the extrapolation is never shorter than
+    plain EM, i.e. theta_2 is returned when the step length is -1, and is
+    shortened until all extrapolated probabilities lie within (0,1).  Returns
+    None if there is no change between iterations from which to extrapolate.
+    """
+    r = theta_1 - theta_0
+    v = (theta_2 - theta_1) - r
+    norm_v = np.linalg.norm(v)
+    if norm_v == 0:
+        return None
+    alpha = min(-np.linalg.norm(r) / norm_v, -1.0)
+
+    while True:
+        extrapolated = theta_0 - 2 * alpha * r + alpha**2 * v
+        in_bounds = np.all((extrapolated > 0) & (extrapolated < 1))
+        if in_bounds or alpha > -1.01:
+            return extrapolated
+        # Halve the distance of the step length from a plain EM step
+        alpha = (alpha - 1) / 2
+
+
 def populate_m_u_from_lookup(
     em_training_session, comparison_level: ComparisonLevel, m_u_records_lookup
 ):
@@ -224,42 +751,113 @@ def expectation_maximisation(
     logger.info("")  # newline
 
     if settings_obj._estimate_without_term_frequencies:
+        # The agreement pattern counts are small, so are pulled into memory once
+        # and all iterations are run locally, rather than each iteration being a
+        # query against the backend
         sql = count_agreement_patterns_sql(settings_obj)
         linker._enqueue_sql(sql, "__splink__agreement_pattern_counts")
         agreement_pattern_counts = linker._execute_sql_pipeline(
             [df_comparison_vector_values]
         )
+        gammas, counts = agreement_pattern_counts_to_arrays(
+            settings_obj, agreement_pattern_counts
+        )
 
-    for i in range(1, max_iterations + 1):
-        start_time = time.time()
+    prior_statistics = em_training_session._prior_sufficient_statistics
 
-        # Expectation step
+    # The log likelihood is only needed to decide whether to accept a SQUAREM
+    # extrapolation, so is only computed when the EM algorithm is accelerated
+    accelerate = settings_obj._em_acceleration == "squarem"
+
+    def em_iteration():
+        """Compute new parameters from the current parameters, returning them
+        alongside the log likelihood of the current parameters if the EM algorithm
+        is accelerated, else None"""
         if settings_obj._estimate_without_term_frequencies:
-            sqls = predict_from_agreement_pattern_counts_sqls(
-                settings_obj,
-                sql_infinity_expression=linker._infinity_expression,
+            log_likelihood = (
+                log_likelihood_from_agreement_patterns(settings_obj, gammas, counts)
+                if accelerate
+                else None
             )
-        else:
-            sqls = predict_from_comparison_vectors_sqls(
-                settings_obj,
-                sql_infinity_expression=linker._infinity_expression,
+            match_probabilities = match_probabilities_from_agreement_patterns(
+                settings_obj, gammas
+            )
+            m_u_counts = m_u_counts_from_agreement_patterns(
+                settings_obj, gammas, counts, match_probabilities
             )
+            m_u_counts = add_sufficient_statistics(m_u_counts)
+            if prior_statistics is None:
+                # Equivalent, but faster than computing proportions from the counts
+                param_records = compute_new_parameters_from_agreement_patterns(
+                    settings_obj, gammas, counts, match_probabilities
+                )
+            else:
+                param_records = compute_proportions_for_new_parameters(m_u_counts)
+            return param_records, log_likelihood
+
+        # Expectation step
+        sqls = predict_from_comparison_vectors_sqls(
+            settings_obj,
+            sql_infinity_expression=linker._infinity_expression,
+        )
 
         for sql in sqls:
             linker._enqueue_sql(sql["sql"], sql["output_table_name"])
 
-        sql = compute_new_parameters_sql(settings_obj)
+        sql = compute_new_parameters_sql(
+            settings_obj, include_log_likelihood=accelerate
+        )
         linker._enqueue_sql(sql, "__splink__m_u_counts")
-        if settings_obj._estimate_without_term_frequencies:
-            df_params = linker._execute_sql_pipeline([agreement_pattern_counts])
-        else:
-            df_params = linker._execute_sql_pipeline([df_comparison_vector_values])
+        df_params = linker._execute_sql_pipeline([df_comparison_vector_values])
         param_records = df_params.as_pandas_dataframe()
-        param_records = compute_proportions_for_new_parameters(param_records)
-
         df_params.drop_table_from_database_and_remove_from_cache()
 
+        is_ll = param_records["output_column_name"] == "_log_likelihood"
+        if accelerate:
+            log2_likelihood = float(param_records[is_ll]["m_count"].iloc[0])
+            log_likelihood = log2_likelihood * math.log(2)
+        else:
+            log_likelihood = None
+        m_u_counts = add_sufficient_statistics(param_records[~is_ll])
+        param_records = compute_proportions_for_new_parameters(m_u_counts)
+
+        return param_records, log_likelihood
+
+    def add_sufficient_statistics(m_u_counts):
+        """Add any statistics from previous training data to the m and u counts,
+        recording the combined statistics on the training session"""
+        if not settings_obj.comparisons:
+            return m_u_counts
+
+        statistics = sufficient_statistics_from_m_u_counts(settings_obj, m_u_counts)
+        if prior_statistics is not None:
+            statistics = combine_sufficient_statistics(prior_statistics, statistics)
+            m_u_counts = m_u_counts_from_sufficient_statistics(statistics)
+        em_training_session._sufficient_statistics = statistics
+        return m_u_counts
+
+    def record_log_likelihood(iteration, log_likelihood):
+        """Record the log likelihood of the parameters an iteration started from.
+        Only called for accepted iterates, so the history is non-decreasing"""
+        em_training_session._log_likelihood_history_records.append(
+            {"iteration": iteration, "log_likelihood": log_likelihood}
+        )
+        logger.log(15, f"    Log likelihood: {log_likelihood:,.6g}")
+
+    # Successive iterates used to extrapolate the parameters
+    thetas = []
+
+    i = 0
+    while i < max_iterations:
+        i += 1
+        start_time = time.time()
+
+        theta = em_parameters_to_vector(settings_obj) if accelerate else None
+        param_records, log_likelihood = em_iteration()
+        if accelerate:
+            record_log_likelihood(i, log_likelihood)
         maximisation_step(em_training_session, param_records)
+
         max_change_dict = (
             em_training_session._max_change_in_parameters_comparison_levels()
         )
@@ -269,4 +867,58 @@ def expectation_maximisation(
 
         if max_change_dict["max_abs_change_value"] < em_convergece:
             break
+
+        if theta is None:
+            thetas = []
+            continue
+        thetas.append((theta, log_likelihood))
+
+        if len(thetas) < 2 or i >= max_iterations:
+            continue
+
+        # SQUAREM: extrapolate from the last three iterates, then take an EM step
+        # from the extrapolated parameters, which also computes their likelihood
+        (theta_0, _), (theta_1, log_likelihood_1) = thetas
+        theta_2 = em_parameters_to_vector(settings_obj)
+        thetas = []
+        extrapolated = (
+            squarem_extrapolation(theta_0, theta_1, theta_2)
+            if theta_2 is not None
+            else None
+        )
+        if extrapolated is None:
+            continue
+
+        i += 1
+        start_time = time.time()
+        # The statistics from which theta_2 was computed, restored if the
+        # extrapolation is rejected so that they remain consistent with the
+        # parameters
+        statistics_2 = em_training_session._sufficient_statistics
+        set_em_parameters_from_vector(em_training_session, extrapolated)
+        param_records, log_likelihood = em_iteration()
+
+        # A monotonicity safeguard: an extrapolation with a lower likelihood than
+        # theta_1 is rejected, in favour of the plain EM step theta_2.  An accepted
+        # extrapolation need not improve on theta_2, since EM only guarantees that
+        # theta_2 does not decrease the likelihood relative to theta_1, so accepted
+        # steps may occasionally be worse than the plain EM step
+        if log_likelihood < log_likelihood_1:
+            logger.log(15, "    Extrapolation rejected, continuing from EM step")
+            set_em_parameters_from_vector(em_training_session, theta_2)
+            em_training_session._sufficient_statistics = statistics_2
+            continue
+
+        record_log_likelihood(i, log_likelihood)
+        maximisation_step(em_training_session, param_records)
+        max_change_dict = (
+            em_training_session._max_change_in_parameters_comparison_levels()
+        )
+        logger.info(f"Iteration {i} (accelerated): {max_change_dict['message']}")
+        end_time = time.time()
+        logger.log(15, f"    Iteration time: {end_time - start_time} seconds")
+
+        if max_change_dict["max_abs_change_value"] < em_convergece:
+            break
+
     logger.info(f"\nEM converged after {i} iterations")
@@ -179,6 +179,11 @@ class InputColumn:
             dialect=self._sql_dialect
         )
 
+    def token_tf_name(self):
+        return add_prefix(
+            self.input_name_as_tree, prefix=f"token_{self.tf_prefix}"
+        ).sql(dialect=self._sql_dialect)
+
     def tf_name_l(self):
         tree = add_prefix(self.input_name_as_tree, prefix=self.tf_prefix)
         return add_suffix(tree, suffix="_l").sql(dialect=self._sql_dialect)
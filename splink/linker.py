@@ -8,6 +8,7 @@ import re
 import time
 import warnings
 from copy import copy, deepcopy
+from datetime import datetime, timezone
 from pathlib import Path
 from statistics import median
 
@@ -45,17 +46,29 @@ from .charts import (
     waterfall_chart,
 )
 from .cluster_studio import render_splink_cluster_studio_html
+from .compact_predictions import comparison_vectors_from_compact_predictions_sql
 from .comparison import Comparison
 from .comparison_level import ComparisonLevel
 from .comparison_vector_distribution import (
     comparison_vector_distribution_sql,
 )
-from .comparison_vector_values import compute_comparison_vector_values_sql
+from .comparison_vector_values import (
+    comparison_vectors_from_store,
+    compute_comparison_vector_values_sql,
+)
 from .connected_components import (
     _cc_create_unique_id_cols,
     solve_connected_components,
 )
-from .em_training_session import EMTrainingSession
+from .dictionary_encoding import (
+    colname_to_dictionary_tablename,
+    compute_all_dictionary_encoding_sqls,
+)
+from .em_training_session import (
+    EMTrainingSession,
+    comparison_vectors_for_match_key,
+    shared_comparison_vectors_for_training,
+)
 from .estimate_u import estimate_u_values
 from .exceptions import SplinkException
 from .find_matches_to_new_records import add_unique_id_and_source_dataset_cols_if_needed
@@ -73,6 +86,7 @@ from .match_weights_histogram import histogram_data
 from .misc import (
     ascii_uid,
     bayes_factor_to_prob,
+    dedupe_preserving_order,
     ensure_is_list,
     ensure_is_tuple,
     find_unique_source_dataset,
@@ -80,9 +94,14 @@ from .misc import (
     prob_to_bayes_factor,
 )
 from .missingness import completeness_data, missingness_data
+from .parse_sql import get_columns_used_from_sql
 from .pipeline import SQLPipeline
 from .predict import predict_from_comparison_vectors_sqls
 from .profile_data import profile_columns
+from .retained_columns import (
+    join_retained_columns_by_id_sql,
+    retained_columns_lookup,
+)
 from .settings import Settings
 from .settings_validator import InvalidSettingsLogger
 from .splink_comparison_viewer import (
@@ -91,16 +110,31 @@ from .splink_comparison_viewer import (
 )
 from .splink_dataframe import SplinkDataFrame
 from .term_frequencies import (
+    TF_TABLES_FORMAT_VERSION,
+    TF_TABLES_MANIFEST_FILENAME,
     _join_tf_to_input_df_sql,
+    _tf_columns_to_compute,
+    approximate_term_frequencies_sqls,
     colname_to_tf_tablename,
+    colname_to_token_tf_tablename,
     compute_all_term_frequencies_sqls,
     compute_term_frequencies_from_concat_with_tf,
+    join_tf_to_comparison_vectors_sql,
+    join_token_tf_to_comparison_vectors_sql,
+    read_saved_tf_table,
+    read_tf_tables_manifest,
     term_frequencies_for_single_column_sql,
     term_frequencies_from_concat_with_tf,
+    term_frequency_counts_sql,
     tf_adjustment_chart,
+    token_frequencies_for_single_column_sql,
+    updated_term_frequencies_sqls,
+    value_counts_for_single_column_sql,
+    write_tf_tables_manifest,
 )
 from .unique_id_concat import (
     _composite_unique_id_from_edges_sql,
+    _composite_unique_id_from_nodes_sql,
 )
 from .unlinkables import unlinkables_data
 from .vertically_concatenate import vertically_concatenate_sql
@@ -234,6 +268,9 @@ class Linker:
         self._em_training_sessions = []
 
         self._intermediate_table_cache: CacheDictWithLogging = CacheDictWithLogging()
+        # Manifests of saved term frequency tables, by directory, so that each is
+        # only read from disk once
+        self._tf_tables_manifests: dict = {}
 
         self._find_new_matches_mode = False
         self._train_u_using_random_sample_mode = False
@@ -370,6 +407,38 @@ class Linker:
             f"infinity sql expression not available for {type(self)}"
         )
 
+    @property
+    def _grouping_sets_supported(self):
+        # Whether the backend supports GROUPING SETS in group by clauses
+        return True
+
+    @property
+    def _random_uniform_expression(self):
+        # A random number uniformly distributed on [0, 1), evaluated per row
+        return "random()"
+
+    @property
+    def _explode_array_function(self):
+        # A function which, used in a select clause, outputs one row per element
+        # of an array column
+        return "unnest"
+
+    def _seeded_hash_sql(self, expression, seed):
+        # A hash of the expression and seed, as an integer in [0, 2^52)
+        raise NotImplementedError("Seeded hash sql not implemented for this linker")
+
+    def _hashed_uniform_expression(self, seed, unique_id=None):
+        """A number uniformly distributed on [0, 1) for each row, determined by a
+        hash of the row's unique id and the seed.  Unlike a random number, this is
+        reproducible however the table is partitioned or ordered, so can be used
+        to take seeded samples in a single pass over the table."""
+        if unique_id is None:
+            # unique_id col, with source_dataset column if needed to disambiguate
+            unique_id_cols = self._settings_obj._unique_id_input_columns
+            unique_id = _composite_unique_id_from_nodes_sql(unique_id_cols)
+        # 2^52 values are exactly representable as a double
+        return f"({self._seeded_hash_sql(unique_id, seed)}) / {float(2**52)}"
+
     def _random_sample_sql(
         self, proportion, sample_size, seed=None, table=None, unique_id=None
     ):
@@ -509,16 +578,58 @@ class Linker:
                 # we execute the pipeline, it'll get cleared anyway
                 self._pipeline.reset()
 
+            concat_was_cached = "__splink__df_concat" in cache
             sql = vertically_concatenate_sql(self)
             self._enqueue_sql(sql, "__splink__df_concat")
 
-            sqls = compute_all_term_frequencies_sqls(self)
+            # Where several term frequency tables are needed, the value counts of
+            # all of the columns are computed in a single scan of the input data
+            # using GROUPING SETS.  The concatenated input data is materialised
+            # first, so that both the value counts and the join of the term
+            # frequencies onto the input data read it without re-scanning the input
+            input_dfs = []
+            tf_cols = _tf_columns_to_compute(self)
+            from_tf_counts = (
+                materialise and len(tf_cols) > 1 and self._grouping_sets_supported
+            )
+            if from_tf_counts:
+                df_concat = self._execute_sql_pipeline()
+                input_dfs.append(df_concat)
+                self._enqueue_sql(
+                    term_frequency_counts_sql(tf_cols), "__splink__df_tf_counts"
+                )
+                df_tf_counts = self._execute_sql_pipeline([df_concat])
+                input_dfs.append(df_tf_counts)
+
+            if self._settings_obj._columns_to_dictionary_encode:
+                # Encoding stage: integer codes are joined on after the tf columns
+                sqls = compute_all_term_frequencies_sqls(
+                    self,
+                    output_table_name="__splink__df_concat_with_tf_unencoded",
+                    tf_cols_to_compute=tf_cols,
+                    from_tf_counts=from_tf_counts,
+                )
+                sqls.extend(
+                    compute_all_dictionary_encoding_sqls(
+                        self, input_table_name="__splink__df_concat_with_tf_unencoded"
+                    )
+                )
+            else:
+                sqls = compute_all_term_frequencies_sqls(
+                    self, tf_cols_to_compute=tf_cols, from_tf_counts=from_tf_counts
+                )
+
             for sql in sqls:
                 self._enqueue_sql(sql["sql"], sql["output_table_name"])
 
             if materialise:
-                nodes_with_tf = self._execute_sql_pipeline()
+                nodes_with_tf = self._execute_sql_pipeline(input_dfs)
                 cache["__splink__df_concat_with_tf"] = nodes_with_tf
+                for df in input_dfs:
+                    # A cached __splink__df_concat is reused, and left in the cache
+                    if concat_was_cached and df.templated_name == "__splink__df_concat":
+                        continue
+                    df.drop_table_from_database_and_remove_from_cache()
 
         # verify the link job
         if self._settings_obj_ is not None:
@@ -1045,6 +1156,30 @@ class Linker:
                 "Please re-run your linkage with it set to True."
             )
 
+    def _raise_error_if_blocking_rule_columns_not_projected(
+        self, blocking_rules: list[str]
+    ):
+        settings_obj = self._settings_obj
+        if not settings_obj._project_input_columns:
+            return
+
+        used_by_model = [c.lower() for c in settings_obj._columns_used_by_model]
+        missing_cols = []
+        for br in blocking_rules:
+            for col in get_columns_used_from_sql(br, dialect=self._sql_dialect):
+                col = InputColumn(col).unquote().name()
+                if col.lower() not in used_by_model and col not in missing_cols:
+                    missing_cols.append(col)
+
+        if missing_cols:
+            raise SplinkException(
+                f"The blocking rule(s) {blocking_rules} use the column(s) "
+                f"{missing_cols}, which are not selected from the input tables "
+                "because project_input_columns is set to True in your settings "
+                "dictionary and they are not used by the model. Please add them "
+                "to additional_columns_to_retain in your settings dictionary."
+            )
+
     def load_settings(
         self,
         settings_dict: dict | str | Path,
@@ -1211,12 +1346,11 @@ class Linker:
                 Pre-computed term frequency tables
                 ```py
                 linker = DuckDBLinker(df)
-                df_first_name_tf = linker.compute_tf_table("first_name")
-                df_first_name_tf.write.parquet("folder/first_name_tf")
+                linker.save_tf_tables("tf_tables/")
                 >>>
-                # On subsequent data linking job, read this table rather than recompute
-                df_first_name_tf = pd.read_parquet("folder/first_name_tf")
-                df_first_name_tf.createOrReplaceTempView("__splink__df_tf_first_name")
+                # On subsequent data linking job, read these tables rather than
+                # recompute
+                linker.load_tf_tables("tf_tables/")
                 ```
             === ":simple-apachespark: Spark"
                 Real time linkage
@@ -1253,30 +1387,429 @@ class Linker:
         ]
 
         if tf_tablename in cache:
-            tf_df = cache.get_with_logging(tf_tablename)
-        elif "__splink__df_concat_with_tf" in cache and column_name in concat_tf_tables:
-            self._pipeline.reset()
+            return cache.get_with_logging(tf_tablename)
+
+        # Clear the pipeline if we are materialising
+        self._pipeline.reset()
+        if "__splink__df_concat_with_tf" in cache and column_name in concat_tf_tables:
             # If our df_concat_with_tf table already exists, use backwards inference to
             # find a given tf table
-            colname = InputColumn(column_name)
-            sql = term_frequencies_from_concat_with_tf(colname)
-            self._enqueue_sql(sql, colname_to_tf_tablename(colname))
-            tf_df = self._execute_sql_pipeline([cache["__splink__df_concat_with_tf"]])
-            self._intermediate_table_cache[tf_tablename] = tf_df
+            input_dfs = [cache["__splink__df_concat_with_tf"]]
+            source_table = "__splink__df_concat_with_tf"
         else:
-            # Clear the pipeline if we are materialising
-            self._pipeline.reset()
             df_concat = self._initialise_df_concat()
             input_dfs = []
             if df_concat:
                 input_dfs.append(df_concat)
+            source_table = "__splink__df_concat"
+
+        if self._settings_obj._is_approximate_tf_column(input_col):
+            sqls = approximate_term_frequencies_sqls(
+                input_col,
+                value_counts_for_single_column_sql(input_col, source_table),
+                self._settings_obj._approximate_tf_min_count,
+            )
+            for sql in sqls:
+                self._enqueue_sql(sql["sql"], sql["output_table_name"])
+        elif source_table == "__splink__df_concat_with_tf":
+            sql = term_frequencies_from_concat_with_tf(input_col)
+            self._enqueue_sql(sql, tf_tablename)
+        else:
             sql = term_frequencies_for_single_column_sql(input_col)
             self._enqueue_sql(sql, tf_tablename)
-            tf_df = self._execute_sql_pipeline(input_dfs)
-            self._intermediate_table_cache[tf_tablename] = tf_df
+        tf_df = self._execute_sql_pipeline(input_dfs)
+        self._intermediate_table_cache[tf_tablename] = tf_df
 
         return tf_df
 
+    def compute_token_tf_table(self, column_name: str) -> SplinkDataFrame:
+        """Compute a token term frequency table for an array column and persist to
+        the database.
+
+        The table contains the proportion of records which contain each token
+        in the array column.  It is used by comparison levels with token term
+        frequency adjustments (`token_tf_adjustment_column`), which adjust the
+        match weight according to how rare the tokens two records share are, e.g.
+        the words of an address or full name.
+
+        The table is computed automatically when first needed by `predict()`,
+        `find_matches_to_new_records()` or `compare_two_records()`, so this
+        method is useful to pre-compute it, e.g. so that real time linkage
+        executes faster.
+
+        Examples:
+            ```py
+            linker = DuckDBLinker(df)
+            linker.load_settings("saved_settings.json")
+            linker.compute_token_tf_table("address_tokens")
+            linker.compare_two_records(record_left, record_right)
+            ```
+
+        Args:
+            column_name (str): The name of the array column in the input table
+
+        Returns:
+            SplinkDataFrame: The resultant table as a splink data frame
+        """
+        input_col = InputColumn(column_name, settings_obj=self._settings_obj)
+        token_tf_tablename = colname_to_token_tf_tablename(input_col)
+        cache = self._intermediate_table_cache
+
+        if token_tf_tablename in cache:
+            return cache.get_with_logging(token_tf_tablename)
+
+        self._pipeline.reset()
+        df_concat = self._initialise_df_concat()
+        input_dfs = []
+        if df_concat:
+            input_dfs.append(df_concat)
+        sql = token_frequencies_for_single_column_sql(
+            self._settings_obj, input_col, self._explode_array_function
+        )
+        self._enqueue_sql(sql, token_tf_tablename)
+        token_tf_df = self._execute_sql_pipeline(input_dfs)
+        cache[token_tf_tablename] = token_tf_df
+
+        return token_tf_df
+
+    def _initialise_token_tf_tables(self) -> list[SplinkDataFrame]:
+        return [
+            self.compute_token_tf_table(col.unquote().name())
+            for col in self._settings_obj._token_frequency_columns
+        ]
+
+    def _enqueue_token_tf_join_sql(self, input_table_name):
+        sql = join_token_tf_to_comparison_vectors_sql(
+            self._settings_obj, self._explode_array_function, input_table_name
+        )
+        self._enqueue_sql(sql, "__splink__df_comparison_vectors")
+
+    def update_tf_tables(self, new_records):
+        """Update the term frequency tables to account for records which have been
+        appended to the input data, without recomputing them from scratch.
+
+        Term frequency tables store the raw count of each value alongside its
+        relative frequency. The counts of the values in `new_records` are added to
+        these, and the relative frequencies are recomputed from the new totals.
+        Only the term frequency tables and the new records are scanned, rather than
+        the full input data.
+
+        Cached tables derived from the input data, such as
+        `__splink__df_concat_with_tf`, are removed from the cache, and are rebuilt
+        using the updated term frequency tables the next time they are needed. The
+        new records should therefore also have been appended to the input tables.
+
+        Term frequency tables which are not in the cache, but which can be derived
+        from a cached `__splink__df_concat_with_tf`, are updated too. Tables
+        registered using `register_term_frequency_lookup()` which do not contain
+        the raw counts (`__splink__value_count`) cannot be updated, and are left
+        unchanged. Approximate term frequency tables (see the
+        `approximate_term_frequency_columns` setting) do not store the counts of
+        rare values, so are recomputed from the input data when next needed.
+
+        Examples:
+            ```py
+            linker = DuckDBLinker(df)
+            linker.load_settings("saved_settings.json")
+            linker.compute_tf_table("first_name")
+            linker.compute_tf_table("surname")
+            >>>
+            # Later, once df_new has been appended to the input table
+            linker.update_tf_tables(df_new)
+            ```
+
+        Args:
+            new_records: The new records, as a list of dicts, a dataframe or the name
+                of a table registered to the database.
+        """
+
+        if not isinstance(new_records, str):
+            uid = ascii_uid(8)
+            new_records_tablename = f"__splink__df_new_records_{uid}"
+            self.register_table(new_records, new_records_tablename, overwrite=True)
+        else:
+            new_records_tablename = new_records
+
+        cache = self._intermediate_table_cache
+        for tf_col in self._settings_obj._term_frequency_columns:
+            tf_tablename = colname_to_tf_tablename(tf_col)
+            self._pipeline.reset()
+            input_dfs = []
+
+            if self._settings_obj._is_approximate_tf_column(tf_col):
+                # The counts of the rare values are not stored, so approximate
+                # tables are recomputed from the input data when next needed
+                cache.pop(tf_tablename, None)
+                continue
+
+            if tf_tablename in cache:
+                tf_df = cache[tf_tablename]
+                tf_df_cols = [c.unquote().name() for c in tf_df.columns]
+                if "__splink__value_count" not in tf_df_cols:
+                    logger.warning(
+                        f"The term frequency table for {tf_col.name()} does not "
+                        "contain the raw counts of each value, so cannot be updated. "
+                        "Use compute_tf_table() to recompute it."
+                    )
+                    continue
+                counts_table_name = tf_df.physical_name
+            elif "__splink__df_concat_with_tf" in cache:
+                sql = term_frequencies_from_concat_with_tf(tf_col)
+                counts_table_name = f"{tf_tablename}_before_update"
+                self._enqueue_sql(sql, counts_table_name)
+                input_dfs.append(cache["__splink__df_concat_with_tf"])
+            else:
+                # Will be computed from the full input data when needed
+                continue
+
+            sqls = updated_term_frequencies_sqls(
+                tf_col, counts_table_name, new_records_tablename
+            )
+            for sql in sqls:
+                self._enqueue_sql(sql["sql"], sql["output_table_name"])
+
+            # Otherwise the pipeline would return the existing table from the cache
+            cache.pop(tf_tablename, None)
+            cache[tf_tablename] = self._execute_sql_pipeline(input_dfs)
+
+        self._remove_tf_derived_tables_from_cache()
+        # Token term frequency tables are recomputed when next needed
+        for col in self._settings_obj._token_frequency_columns:
+            cache.pop(colname_to_token_tf_tablename(col), None)
+
+    def _remove_tf_derived_tables_from_cache(self):
+        # Tables derived from the term frequency tables are rebuilt when next needed
+        cache = self._intermediate_table_cache
+        derived_tables = ["__splink__df_concat", "__splink__df_concat_with_tf"]
+        derived_tables.extend(
+            colname_to_dictionary_tablename(col)
+            for col in self._settings_obj._columns_to_dictionary_encode
+        )
+        for table_name in derived_tables:
+            cache.pop(table_name, None)
+
+    def _input_fingerprint(self, tf_column_names: list[str]):
+        """A hash of the input table aliases and their columns, and of aggregates
+        of the input records, used to check term frequency tables saved using
+        `save_tf_tables()` were computed from the same input data.
+
+        The aggregates are the total number of input records, and for each of the
+        term frequency columns, the number of non-null and distinct values and,
+        where the backend supports hashing, the sum of a hash of the values.  So
+        input data with the same columns and number of rows, but different values
+        in the term frequency columns, has a different fingerprint.
+
+        Returns:
+            tuple: The hash and the total number of input records
+        """
+        if not getattr(self, "_input_tables_dict", None):
+            return None, None
+
+        aggregates = ["count(*) as row_count"]
+        for i, column_name in enumerate(sorted(tf_column_names)):
+            col = InputColumn(column_name, settings_obj=self._settings_obj).name()
+            aggregates.append(f"count({col}) as count_{i}")
+            aggregates.append(f"count(distinct {col}) as distinct_count_{i}")
+            try:
+                value_hash = self._seeded_hash_sql(col, 0)
+            except NotImplementedError:
+                continue
+            # Summing a bounded hash cannot overflow
+            aggregates.append(f"sum(({value_hash}) % {2**20}) as hash_sum_{i}")
+
+        self._pipeline.reset()
+        input_dfs = []
+        df_concat = self._initialise_df_concat()
+        if df_concat:
+            input_dfs.append(df_concat)
+        sql = f"select {', '.join(aggregates)} from __splink__df_concat"
+        self._enqueue_sql(sql, "__splink__df_input_aggregates")
+        dataframe = self._execute_sql_pipeline(input_dfs, use_cache=False)
+        record = dataframe.as_record_dict()[0]
+        dataframe.drop_table_from_database_and_remove_from_cache()
+        input_aggregates = {
+            k.lower(): None if v is None else int(v) for k, v in record.items()
+        }
+
+        input_tables = {
+            alias: [c.unquote().name() for c in df.columns]
+            for alias, df in sorted(self._input_tables_dict.items())
+        }
+        fingerprint = json.dumps(
+            {"input_tables": input_tables, "input_aggregates": input_aggregates},
+            sort_keys=True,
+        )
+        row_count = input_aggregates["row_count"]
+        return hashlib.sha256(fingerprint.encode()).hexdigest(), row_count
+
+    def save_tf_tables(self, output_dir, overwrite=False):
+        """Save the term frequency tables for all columns with term frequency
+        adjustments to a directory, so they can be loaded using `load_tf_tables()`
+        rather than recomputed from the input data.
+
+        Each table is written as a Parquet file, alongside a `manifest.json`
+        recording the column each table belongs to, the number of distinct values
+        and total count of each, a fingerprint of the input data they were computed
+        from, and when they were saved.
+
+        Term frequency tables which have not yet been computed are computed from
+        the input data.
+
+        Examples:
+            ```py
+            linker = DuckDBLinker(df)
+            linker.load_settings("saved_settings.json")
+            linker.save_tf_tables("tf_tables/")
+            >>>
+            # In the real time linkage service
+            linker = DuckDBLinker(df)
+            linker.load_settings("saved_settings.json")
+            linker.load_tf_tables("tf_tables/")
+            linker.compare_two_records(record_left, record_right)
+            ```
+
+        Args:
+            output_dir (str): The directory to which to save the tables
+            overwrite (bool, optional): If True, overwrite term frequency tables
+                previously saved to `output_dir`. Defaults to False.
+
+        Returns:
+            dict: The manifest describing the saved tables
+        """
+        output_dir = Path(output_dir)
+        if (output_dir / TF_TABLES_MANIFEST_FILENAME).exists() and not overwrite:
+            raise FileExistsError(
+                f"Term frequency tables have already been saved to {output_dir}. "
+                "Use `overwrite = True` or choose a different directory."
+            )
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        tables = []
+        for tf_col in self._settings_obj._term_frequency_columns:
+            tf_df = self.compute_tf_table(tf_col.unquote().name())
+            tf_pd = tf_df.as_pandas_dataframe()
+
+            filename = f"{colname_to_tf_tablename(tf_col)}.parquet"
+            tf_pd.to_parquet(output_dir / filename, index=False)
+
+            total_count = None
+            if "__splink__value_count" in tf_pd.columns:
+                non_null = tf_pd[tf_pd[tf_col.unquote().name()].notnull()]
+                total_count = int(non_null["__splink__value_count"].sum())
+
+            tables.append(
+                {
+                    "column": tf_col.unquote().name(),
+                    "file": filename,
+                    "num_values": len(tf_pd),
+                    "total_count": total_count,
+                }
+            )
+
+        input_fingerprint, input_row_count = self._input_fingerprint(
+            [t["column"] for t in tables]
+        )
+        manifest = {
+            "format_version": TF_TABLES_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "input_fingerprint": input_fingerprint,
+            "input_row_count": input_row_count,
+            "tables": tables,
+        }
+        write_tf_tables_manifest(output_dir, manifest)
+        self._tf_tables_manifests[str(output_dir.resolve())] = manifest
+
+        return manifest
+
+    def _read_tf_tables_manifest(self, input_dir) -> dict:
+        key = str(Path(input_dir).resolve())
+        if key not in self._tf_tables_manifests:
+            self._tf_tables_manifests[key] = read_tf_tables_manifest(input_dir)
+        return self._tf_tables_manifests[key]
+
+    def load_tf_tables(
+        self, input_dir, check_input_fingerprint=False, overwrite=True
+    ) -> list[SplinkDataFrame]:
+        """Load term frequency tables saved using `save_tf_tables()`, registering
+        them for use by the linker in place of computing them from the input data.
+
+        Cached tables derived from the term frequency tables, such as
+        `__splink__df_concat_with_tf`, are removed from the cache, and are rebuilt
+        using the loaded tables the next time they are needed.
+
+        The tables are also loaded automatically by `find_matches_to_new_records()`
+        and `compare_two_records()` if the `term_frequency_tables_dir` setting is
+        set.
+
+        Examples:
+            ```py
+            linker = DuckDBLinker(df)
+            linker.load_settings("saved_settings.json")
+            linker.load_tf_tables("tf_tables/")
+            linker.find_matches_to_new_records([record])
+            ```
+
+        Args:
+            input_dir (str): The directory to which the tables were saved
+            check_input_fingerprint (bool, optional): If True, raise an error if the
+                tables were computed from input data with different columns, a
+                different number of rows, or different values in the term
+                frequency columns to the linker's input data.  The values are
+                compared using aggregates such as counts of distinct values, so
+                this is a check rather than a guarantee.  Defaults to False.
+            overwrite (bool, optional): If False, term frequency tables which have
+                already been computed or registered are kept, rather than replaced
+                by the saved tables. Defaults to True.
+
+        Returns:
+            list[SplinkDataFrame]: The term frequency tables loaded
+        """
+        manifest = self._read_tf_tables_manifest(input_dir)
+
+        if check_input_fingerprint:
+            input_fingerprint, _ = self._input_fingerprint(
+                [t["column"] for t in manifest["tables"]]
+            )
+            if input_fingerprint != manifest["input_fingerprint"]:
+                raise SplinkException(
+                    f"The term frequency tables in {input_dir} were computed from "
+                    "different input data to the linker's input data "
+                    f"({manifest['input_row_count']:,} input records).  Use "
+                    "`linker.save_tf_tables()` to save them again."
+                )
+
+        cache = self._intermediate_table_cache
+        loaded = []
+        for table in manifest["tables"]:
+            input_col = InputColumn(table["column"], settings_obj=self._settings_obj)
+            if not overwrite and colname_to_tf_tablename(input_col) in cache:
+                continue
+            tf_pd = read_saved_tf_table(input_dir, table)
+            loaded.append(
+                self.register_term_frequency_lookup(
+                    tf_pd, table["column"], overwrite=True
+                )
+            )
+
+        if loaded:
+            self._remove_tf_derived_tables_from_cache()
+
+        return loaded
+
+    def _load_missing_tf_tables_from_settings_dir(self):
+        tf_tables_dir = self._settings_obj._term_frequency_tables_dir
+        # The term frequency tables can be derived from df_concat_with_tf if it
+        # already exists
+        cache = self._intermediate_table_cache
+        if tf_tables_dir is None or "__splink__df_concat_with_tf" in cache:
+            return
+        if all(
+            colname_to_tf_tablename(tf_col) in cache
+            for tf_col in self._settings_obj._term_frequency_columns
+        ):
+            return
+        self.load_tf_tables(tf_tables_dir, overwrite=False)
+
     def deterministic_link(self) -> SplinkDataFrame:
         """Uses the blocking rules specified by
         `blocking_rules_to_generate_predictions` in the settings dictionary to
@@ -1371,7 +1904,14 @@ class Linker:
         return self._execute_sql_pipeline([concat_with_tf])
 
     def estimate_u_using_random_sampling(
-        self, max_pairs: int = None, seed: int = None, *, target_rows=None
+        self,
+        max_pairs: int = None,
+        seed: int = None,
+        *,
+        use_value_pair_frequencies: bool = False,
+        target_relative_ci_width: float = None,
+        comparisons: list[str | Comparison] = None,
+        target_rows=None,
     ):
         """Estimate the u parameters of the linkage model using random sampling.
 
@@ -1384,9 +1924,16 @@ class Linker:
         pairwise comparisons are non-matches (or at least, they are very unlikely to be
         matches). For large datasets, this is typically true.
 
+        Where a comparison's first level (after the null level) is an exact match on
+        a single column, its u probability is computed exactly from the frequencies
+        of the values in that column, rather than from the sample, and the sampled
+        u probabilities of the other levels are rescaled accordingly.  This is not
+        possible for `link_only` models.
+
         The results of estimate_u_using_random_sampling, and therefore an entire splink
-        model, can be made reproducible by setting the seed parameter. Setting the seed
-        will have performance implications as additional processing is required.
+        model, can be made reproducible by setting the seed parameter. Seeded samples
+        are taken in a single pass over the data, using a hash of the unique id of
+        each record, so are not exactly of the requested size.
 
         Args:
             max_pairs (int): The maximum number of pairwise record comparisons to
@@ -1397,12 +1944,40 @@ class Linker:
             the final model is estimated.
             seed (int): Seed for random sampling. Assign to get reproducible u
             probabilities. Note, seed for random sampling is only supported for
-            DuckDB and Spark, for Athena and SQLite set to None.
+            DuckDB, Spark, Athena and Postgres, for SQLite set to None.
+            use_value_pair_frequencies (bool): If True, comparisons which use a
+            single column are estimated by evaluating the comparison on pairs of
+            distinct values in the column, weighted by the number of records
+            having each value, rather than on pairs of sampled records.  Since
+            there are usually far fewer distinct values than records, this is
+            often exact, and is otherwise computed from a random sample of the
+            distinct values giving at most `max_pairs` pairs of values. Not
+            available for `link_only` models. Defaults to False.
+            target_relative_ci_width (float): If set, sample adaptively, in rounds
+            of increasing size, until the width of the 95% confidence interval of
+            every u probability, relative to the u probability, is below this
+            target (e.g. 0.1), or `max_pairs` pairs have been sampled.  Each round
+            reuses the comparisons from previous rounds, only comparing pairs of
+            records which were not already compared.  The achieved precision is
+            recorded alongside the estimated u probabilities. Defaults to None.
+            comparisons (list, optional): If provided, only estimate the u
+            probabilities of these comparisons, leaving the others unchanged.  The
+            sql only computes these comparisons, which is useful when retraining
+            a comparison during model development.  This list can either contain
+            the output_column_name of the Comparison as a string, or Comparison
+            objects.  Defaults to None.
 
         Examples:
             ```py
             linker.estimate_u_using_random_sampling(1e8)
             ```
+            Sample up to 1e9 pairs, stopping early once u is estimated to within
+            about +/-5%
+            ```py
+            linker.estimate_u_using_random_sampling(
+                1e9, target_relative_ci_width=0.1
+            )
+            ```
 
         Returns:
             None: Updates the estimated u parameters within the linker object
@@ -1427,7 +2002,22 @@ class Linker:
         else:
             raise TypeError("Missing argument max_pairs")
 
-        estimate_u_values(self, max_pairs, seed)
+        if comparisons is not None:
+            comparisons = [
+                self._settings_obj._get_comparison_by_output_column_name(n)
+                if isinstance(n, str)
+                else n
+                for n in comparisons
+            ]
+
+        estimate_u_values(
+            self,
+            max_pairs,
+            seed,
+            use_value_pair_frequencies,
+            target_relative_ci_width,
+            comparisons,
+        )
         self._populate_m_u_from_trained_values()
 
         self._settings_obj._columns_without_estimated_parameters_message()
@@ -1486,6 +2076,10 @@ class Linker:
         fix_m_probabilities=False,
         fix_u_probabilities=True,
         populate_probability_two_random_records_match_from_trained_values=False,
+        sample_pairs: int = None,
+        comparisons_to_train: list[str | Comparison] = None,
+        incremental: bool = False,
+        seed: int = None,
     ) -> EMTrainingSession:
         """Estimate the parameters of the linkage model using expectation maximisation.
 
@@ -1516,6 +2110,34 @@ class Linker:
         `comparison_levels_to_reverse_blocking_rule`.   This is useful, for example
         if you block on the dmetaphone of a column but match on the original column.
 
+        To retrain only some comparisons, for example after changing one comparison
+        during model development, specify `comparisons_to_train`.  The other
+        comparisons are left out of the training model entirely, so are not
+        computed, and their parameters are unchanged.  Under the assumption of
+        conditional independence between comparisons, this still gives consistent
+        estimates for the comparisons being trained, although with fewer
+        comparisons the model separates matches from non-matches less sharply.
+
+        Each training session records the expected number of matching and
+        non-matching pairs in each comparison level, which are saved with the model
+        by `save_model_to_json`.  If `incremental` is True, and the model was
+        previously trained with the same blocking rule, these are added to the
+        expected counts from the pairs in the current input data at each iteration.
+        This allows the model to be updated with a batch of newly arrived records,
+        without recomputing the pairs amongst the previous records.  Pairs between
+        new and previous records are not included.
+
+        If `sample_pairs` is provided, each agreement pattern (combination of
+        comparison levels) is sampled at the same rate, except that rare patterns
+        are sampled at a higher rate so that at least 100 of their pairs are
+        retained.  Pairs are weighted so that the weighted count of each pattern is
+        exact.  Without term frequency adjustments, the EM algorithm only depends on
+        these counts, so the sample gives the same estimates as the full set of
+        pairs.  With term frequency adjustments, the estimates are subject to
+        sampling variation in the term frequencies within each pattern, which falls
+        as `sample_pairs` increases.  The bias of the weighting is of order
+        `1 / sample_pairs`, and negligible in practice.
+
         Examples:
             Default behaviour
             ```py
@@ -1566,6 +2188,23 @@ class Linker:
             populate_probability_two_random_records_match_from_trained_values
                 (bool, optional): If True, derive this parameter from
                 the blocked value. Defaults to False.
+            sample_pairs (int, optional): If provided, and the blocking rule
+                generates more than this many record pairs, the iterations of the
+                EM algorithm run on a sample of approximately this many pairs
+                (more where there are many rare agreement patterns), stratified by
+                agreement pattern. Defaults to None.
+            comparisons_to_train (list, optional): If provided, only estimate the
+                parameters of these comparisons, excluding any used in the blocking
+                rule.  This list can either contain the output_column_name of the
+                Comparison as a string, or Comparison objects.  Defaults to None.
+            incremental (bool, optional): If True, combine the pairs in the current
+                input data with the saved statistics from previous training using
+                the same blocking rule, rather than training from the current input
+                data alone. Defaults to False.
+            seed (int, optional): Seed for the sample of pairs taken when
+                `sample_pairs` is provided.  Assign to get reproducible estimates.
+                Note, seeded sampling is only supported for DuckDB, Spark, Athena
+                and Postgres, for SQLite set to None. Defaults to None.
 
         Examples:
             ```py
@@ -1587,13 +2226,14 @@ class Linker:
                 session such as how parameters changed during the iteration history
 
         """
+        # Extract the blocking rule
+        blocking_rule = blocking_rule_to_obj(blocking_rule).blocking_rule
+        self._raise_error_if_blocking_rule_columns_not_projected([blocking_rule])
+
         # Ensure this has been run on the main linker so that it's in the cache
         # to be used by the training linkers
         self._initialise_df_concat_with_tf()
 
-        # Extract the blocking rule
-        blocking_rule = blocking_rule_to_obj(blocking_rule).blocking_rule
-
         if comparisons_to_deactivate:
             # If user provided a string, convert to Comparison object
             comparisons_to_deactivate = [
@@ -1614,6 +2254,27 @@ class Linker:
                     "as an exact match."
                 )
 
+        if comparisons_to_train is not None:
+            comparisons_to_train = [
+                self._settings_obj._get_comparison_by_output_column_name(n)
+                if isinstance(n, str)
+                else n
+                for n in comparisons_to_train
+            ]
+
+        prior_sufficient_statistics = None
+        if incremental:
+            prior_sufficient_statistics = (
+                self._settings_obj._get_em_sufficient_statistics(blocking_rule)
+            )
+            if prior_sufficient_statistics is None:
+                logger.warning(
+                    "\nWARNING: \n"
+                    "No statistics from previous training using the blocking rule "
+                    f"{blocking_rule} were found, so the model will be trained "
+                    "using the current input data only."
+                )
+
         em_training_session = EMTrainingSession(
             self,
             blocking_rule,
@@ -1623,6 +2284,10 @@ class Linker:
             comparisons_to_deactivate=comparisons_to_deactivate,
             comparison_levels_to_reverse_blocking_rule=comparison_levels_to_reverse_blocking_rule,  # noqa 501
             estimate_without_term_frequencies=estimate_without_term_frequencies,
+            sample_pairs=sample_pairs,
+            comparisons_to_train=comparisons_to_train,
+            prior_sufficient_statistics=prior_sufficient_statistics,
+            seed=seed,
         )
 
         em_training_session._train()
@@ -1636,11 +2301,117 @@ class Linker:
 
         return em_training_session
 
+    def train_em_sessions(
+        self,
+        blocking_rules: list[str | BlockingRule],
+        estimate_without_term_frequencies: bool = False,
+        fix_probability_two_random_records_match: bool = False,
+        fix_m_probabilities=False,
+        fix_u_probabilities=True,
+        populate_probability_two_random_records_match_from_trained_values=False,
+        sample_pairs: int = None,
+        seed: int = None,
+    ) -> list[EMTrainingSession]:
+        """Run an expectation maximisation training session for each of several
+        blocking rules, blocking and computing comparison vectors only once.
+
+        This gives the same results as calling
+        `estimate_parameters_using_expectation_maximisation` once for each rule,
+        in order, but the record pairs generated by all of the rules are computed
+        in a single pass, with a `match_key` column recording the rule which
+        generated each pair.  Each session then trains on the comparison vectors
+        of its own rule, starting from the parameter estimates of the
+        preceding sessions.
+
+        Examples:
+            ```py
+            linker.train_em_sessions(
+                [
+                    "l.first_name = r.first_name and l.surname = r.surname",
+                    "l.dob = r.dob",
+                ]
+            )
+            ```
+
+        Args:
+            blocking_rules (list[BlockingRule | str]): The blocking rules used to
+                generate pairwise record comparisons, one for each training
+                session.
+            estimate_without_term_frequencies (bool, optional): If True, the iterations
+                of the EM algorithm ignore any term frequency adjustments and only
+                depend on the comparison vectors. Defaults to False.
+            fix_probability_two_random_records_match (bool, optional): If True, do not
+                update the probability two random records match after each iteration.
+                Defaults to False.
+            fix_m_probabilities (bool, optional): If True, do not update the m
+                probabilities after each iteration. Defaults to False.
+            fix_u_probabilities (bool, optional): If True, do not update the u
+                probabilities after each iteration. Defaults to True.
+            populate_probability_two_random_records_match_from_trained_values
+                (bool, optional): If True, derive this parameter from
+                the blocked value. Defaults to False.
+            sample_pairs (int, optional): If provided, each session runs on a
+                sample of approximately this many record pairs. See
+                `estimate_parameters_using_expectation_maximisation`.
+                Defaults to None.
+            seed (int, optional): Seed for the samples of pairs taken when
+                `sample_pairs` is provided. Defaults to None.
+
+        Returns:
+            list[EMTrainingSession]: The training sessions, in the order of
+                `blocking_rules`
+        """
+        blocking_rules = [
+            blocking_rule_to_obj(br).blocking_rule
+            for br in ensure_is_list(blocking_rules)
+        ]
+        self._raise_error_if_blocking_rule_columns_not_projected(blocking_rules)
+
+        # Ensure this has been run on the main linker so that it's in the cache
+        # to be used by the training linkers
+        self._initialise_df_concat_with_tf()
+
+        shared_cvv = shared_comparison_vectors_for_training(self, blocking_rules)
+
+        em_training_sessions = []
+        for match_key, blocking_rule in enumerate(blocking_rules):
+            # Sessions are created in turn so that each starts from the parameter
+            # estimates of the preceding sessions, as if trained separately
+            em_training_session = EMTrainingSession(
+                self,
+                blocking_rule,
+                fix_u_probabilities=fix_u_probabilities,
+                fix_m_probabilities=fix_m_probabilities,
+                fix_probability_two_random_records_match=fix_probability_two_random_records_match,  # noqa 501
+                estimate_without_term_frequencies=estimate_without_term_frequencies,
+                sample_pairs=sample_pairs,
+                seed=seed,
+            )
+
+            if len(blocking_rules) > 1:
+                cvv = comparison_vectors_for_match_key(self, shared_cvv, match_key)
+            else:
+                cvv = shared_cvv
+            em_training_session._train(cvv)
+
+            self._populate_m_u_from_trained_values()
+
+            if populate_probability_two_random_records_match_from_trained_values:
+                self._populate_probability_two_random_records_match_from_trained_values()
+
+            em_training_sessions.append(em_training_session)
+
+        self._settings_obj._columns_without_estimated_parameters_message()
+
+        return em_training_sessions
+
     def predict(
         self,
         threshold_match_probability: float = None,
         threshold_match_weight: float = None,
         materialise_after_computing_term_frequencies=True,
+        compact_output=False,
+        join_term_frequencies_after_comparison=False,
     ) -> SplinkDataFrame:
         """Create a dataframe of scored pairwise comparisons using the parameters
         of the linkage model.
@@ -1656,12 +2427,35 @@ class Linker:
             threshold_match_weight (float, optional): If specified,
                 filter the results to include only pairwise comparisons with a
                 match_weight above this threshold. Defaults to None.
+                Where a threshold is specified, any retained input columns
+                (`retain_matching_columns` and `additional_columns_to_retain`)
+                are joined on by unique id to the pairwise comparisons which
+                pass the threshold, rather than being carried through blocking.
             materialise_after_computing_term_frequencies (bool): If true, Splink
                 will materialise the table containing the input nodes (rows)
                 joined to any term frequencies which have been asked
                 for in the settings object.  If False, this will be
                 computed as part of one possibly gigantic CTE
-                pipeline.   Defaults to True
+                pipeline.  Always True if `cache_comparison_vectors` is set in
+                the settings.  Defaults to True
+            compact_output (bool): If true, output only the unique ids, the
+                match_weight as a single precision float, and a single
+                `gamma_packed` integer into which the comparison vector values of
+                all comparisons are bit-packed (plus an integer `match_key` if
+                there are multiple blocking rules). This substantially reduces the
+                size of the output.  Use
+                `SplinkDataFrame.decode_compact_predictions()` to recover the
+                full output, e.g. for use in charts. Defaults to False
+            join_term_frequencies_after_comparison (bool): If true, term frequency
+                columns are not carried through blocking and the computation of
+                comparison vectors.  Instead, they are joined on by unique id
+                afterwards, only for pairwise comparisons which are at a comparison
+                level with term frequency adjustments.  This is faster where blocking
+                generates many comparisons, few of which are exact matches on the
+                term frequency columns.  Where intermediate calculation columns are
+                retained, the term frequency columns are null for the other
+                comparisons.  Has no effect if `cache_comparison_vectors` is set in
+                the settings.  Defaults to False
 
         Examples:
             ```py
@@ -1670,6 +2464,12 @@ class Linker:
             df = linker.predict(threshold_match_probability=0.95)
             df.as_pandas_dataframe(limit=5)
             ```
+            Compact output, decoded for a waterfall chart
+            ```py
+            df_compact = linker.predict(compact_output=True)
+            df_decoded = df_compact.decode_compact_predictions()
+            linker.waterfall_chart(df_decoded.as_record_dict(limit=5))
+            ```
         Returns:
             SplinkDataFrame: A SplinkDataFrame of the pairwise comparisons.  This
                 represents a table materialised in the database. Methods on the
@@ -1681,6 +2481,18 @@ class Linker:
         # calls predict, it runs as a single pipeline with no materialisation
         # of anything.
 
+        settings_obj = self._settings_obj
+
+        # Comparison vectors are materialised if they're to be cached, so there
+        # is no benefit to computing term frequencies in the same pipeline
+        materialise_after_computing_term_frequencies = (
+            materialise_after_computing_term_frequencies
+            or settings_obj._cache_comparison_vectors
+        )
+
+        # Token term frequency tables are small, so are always materialised
+        token_tf_tables = self._initialise_token_tf_tables()
+
         # _initialise_df_concat_with_tf returns None if the table doesn't exist
         # and only SQL is queued in this step.
         nodes_with_tf = self._initialise_df_concat_with_tf(
@@ -1690,22 +2502,228 @@ class Linker:
         input_dataframes = []
         if nodes_with_tf:
             input_dataframes.append(nodes_with_tf)
+        input_dataframes.extend(token_tf_tables)
+
+        settings_obj._apply_token_tf_adjustments = bool(token_tf_tables)
+        output_columns = [
+            "match_weight",
+            "match_probability",
+        ] + settings_obj._columns_to_select_for_predict
+
+        # Projection pushdown: where only a subset of pairs survives the threshold
+        # (or no input columns are output at all), retained input columns need
+        # not be carried through blocking and comparison.  Instead, they are
+        # joined back on by unique id to the surviving pairs
+        thresholded = bool(threshold_match_probability or threshold_match_weight)
+        join_retained_columns_by_id = (compact_output or thresholded) and bool(
+            retained_columns_lookup(settings_obj)
+        )
+        settings_obj._join_retained_columns_by_id = join_retained_columns_by_id
 
-        sql = block_using_rules_sql(self)
-        self._enqueue_sql(sql, "__splink__df_blocked")
+        try:
+            if settings_obj._cache_comparison_vectors:
+                df_comparison_vectors = comparison_vectors_from_store(
+                    self, input_dataframes
+                )
+                if token_tf_tables:
+                    # The stored comparison vectors may be shared with other calls
+                    df_comparison_vectors = copy(df_comparison_vectors)
+                    table_name = "__splink__df_comparison_vectors_without_token_tf"
+                    df_comparison_vectors.templated_name = table_name
+                    self._enqueue_token_tf_join_sql(table_name)
+                input_dataframes.append(df_comparison_vectors)
+            else:
+                join_tf_columns_by_id = join_term_frequencies_after_comparison and bool(
+                    settings_obj._term_frequency_columns
+                )
+                settings_obj._join_tf_columns_by_id = join_tf_columns_by_id
 
-        repartition_after_blocking = getattr(self, "repartition_after_blocking", False)
+                sql = block_using_rules_sql(self)
+                self._enqueue_sql(sql, "__splink__df_blocked")
 
-        # repartition after blocking only exists on the SparkLinker
-        if repartition_after_blocking:
-            df_blocked = self._execute_sql_pipeline(input_dataframes)
-            input_dataframes.append(df_blocked)
+                repartition_after_blocking = getattr(
+                    self, "repartition_after_blocking", False
+                )
 
-        sql = compute_comparison_vector_values_sql(self._settings_obj)
+                # repartition after blocking only exists on the SparkLinker
+                if repartition_after_blocking:
+                    df_blocked = self._execute_sql_pipeline(input_dataframes)
+                    input_dataframes.append(df_blocked)
+
+                sql = compute_comparison_vector_values_sql(settings_obj)
+                if join_tf_columns_by_id:
+                    table_name = "__splink__df_comparison_vectors_without_tf"
+                    self._enqueue_sql(sql, table_name)
+                    sql = join_tf_to_comparison_vectors_sql(settings_obj, table_name)
+                if token_tf_tables:
+                    table_name = "__splink__df_comparison_vectors_without_token_tf"
+                    self._enqueue_sql(sql, table_name)
+                    self._enqueue_token_tf_join_sql(table_name)
+                else:
+                    self._enqueue_sql(sql, "__splink__df_comparison_vectors")
+
+            sqls = predict_from_comparison_vectors_sqls(
+                settings_obj,
+                threshold_match_probability,
+                threshold_match_weight,
+                sql_infinity_expression=self._infinity_expression,
+                compact_output=compact_output,
+            )
+        finally:
+            settings_obj._join_retained_columns_by_id = False
+            settings_obj._join_tf_columns_by_id = False
+            settings_obj._apply_token_tf_adjustments = False
+
+        if join_retained_columns_by_id and not compact_output:
+            predict_table_name = "__splink__df_predict_without_retained_columns"
+            sqls[-1]["output_table_name"] = predict_table_name
+            sql = join_retained_columns_by_id_sql(
+                settings_obj, output_columns, predict_table_name
+            )
+            sqls.append({"sql": sql, "output_table_name": "__splink__df_predict"})
+
+        for sql in sqls:
+            self._enqueue_sql(sql["sql"], sql["output_table_name"])
+
+        predictions = self._execute_sql_pipeline(input_dataframes)
+        self._predict_warning()
+        return predictions
+
+    def _decode_compact_predictions(
+        self, df_compact: SplinkDataFrame
+    ) -> SplinkDataFrame:
+        """Expand the output of `predict(compact_output=True)` into the full
+        predictions format, with all comparison columns, intermediate
+        calculation columns and gamma values.
+
+        Match weights are recomputed from the unpacked comparison vectors, so are
+        not subject to the loss of precision of the compact format.
+        """
+        # Decode with full detail so the output works with all charts
+        settings_obj = deepcopy(self._settings_obj)
+        settings_obj._retain_matching_columns = True
+        settings_obj._retain_intermediate_calculation_columns = True
+
+        token_tf_tables = self._initialise_token_tf_tables()
+        settings_obj._apply_token_tf_adjustments = bool(token_tf_tables)
+
+        nodes_with_tf = self._initialise_df_concat_with_tf()
+
+        sql = comparison_vectors_from_compact_predictions_sql(
+            settings_obj, df_compact.physical_name
+        )
+        if token_tf_tables:
+            table_name = "__splink__df_comparison_vectors_without_token_tf"
+            self._enqueue_sql(sql, table_name)
+            sql = join_token_tf_to_comparison_vectors_sql(
+                settings_obj, self._explode_array_function, table_name
+            )
         self._enqueue_sql(sql, "__splink__df_comparison_vectors")
 
         sqls = predict_from_comparison_vectors_sqls(
-            self._settings_obj,
+            settings_obj,
+            sql_infinity_expression=self._infinity_expression,
+        )
+        for sql in sqls:
+            self._enqueue_sql(sql["sql"], sql["output_table_name"])
+
+        # use_cache=False because a __splink__df_predict registered with the linker
+        # must not be returned in place of the decoded predictions
+        return self._execute_sql_pipeline(
+            [nodes_with_tf] + token_tf_tables, use_cache=False
+        )
+
+    def rescore(
+        self,
+        df_predict: SplinkDataFrame,
+        threshold_match_probability: float = None,
+        threshold_match_weight: float = None,
+    ) -> SplinkDataFrame:
+        """Re-score an existing table of pairwise comparisons using the current
+        parameters of the linkage model, without recomputing blocking or the
+        comparison vectors.
+
+        This is useful to update the match weights of a previous set of
+        predictions after the model has been retrained.  The predictions must
+        contain the comparison vector (gamma) columns, and the term frequency
+        columns of any comparisons with term frequency adjustments, which is the
+        case if they were created with both `retain_matching_columns` and
+        `retain_intermediate_calculation_columns` set to true.  Any retained input
+        columns present in `df_predict` are carried through to the output.
+
+        Args:
+            df_predict (SplinkDataFrame): The pairwise comparisons to re-score,
+                e.g. the output of a previous call to `linker.predict()`.
+            threshold_match_probability (float, optional): If specified,
+                filter the results to include only pairwise comparisons with a
+                match_probability above this threshold. Defaults to None.
+            threshold_match_weight (float, optional): If specified,
+                filter the results to include only pairwise comparisons with a
+                match_weight above this threshold. Defaults to None.
+
+        Examples:
+            ```py
+            df_predict = linker.predict()
+            linker.estimate_parameters_using_expectation_maximisation(
+                "l.dob = r.dob"
+            )
+            df_rescored = linker.rescore(df_predict)
+            ```
+
+        Returns:
+            SplinkDataFrame: A SplinkDataFrame of the re-scored pairwise comparisons.
+        """
+        settings_obj = deepcopy(self._settings_obj)
+        # The token term frequencies of each pair are retained in the predictions
+        settings_obj._apply_token_tf_adjustments = True
+        available_cols = {c.unquote().name().lower() for c in df_predict.columns}
+
+        required_cols = [cc._gamma_column_name for cc in settings_obj.comparisons]
+        for cc in settings_obj.comparisons:
+            for cl in cc._comparison_levels_excluding_null:
+                if cl._has_tf_adjustments:
+                    tf_col = cl._tf_adjustment_input_column.unquote()
+                    required_cols.extend([tf_col.tf_name_l(), tf_col.tf_name_r()])
+                if cl._has_token_tf_adjustments:
+                    token_tf_col = cl._token_tf_adjustment_input_column.unquote()
+                    required_cols.append(token_tf_col.token_tf_name())
+        if settings_obj._needs_matchkey_column:
+            required_cols.append("match_key")
+
+        missing_cols = [c for c in required_cols if c.lower() not in available_cols]
+        if missing_cols:
+            missing_cols = ", ".join(dedupe_preserving_order(missing_cols))
+            raise SplinkException(
+                "Unable to re-score the pairwise comparisons because the following "
+                f"columns are missing: {missing_cols}.  Predictions must be created "
+                "with `retain_matching_columns` and "
+                "`retain_intermediate_calculation_columns` set to true to be "
+                "re-scored."
+            )
+
+        # Only carry through the retained input columns which are present
+        def _is_available(col: InputColumn):
+            return all(c.lower() in available_cols for c in col.unquote().names_l_r())
+
+        matching_cols_available = all(
+            _is_available(col)
+            for cc in settings_obj.comparisons
+            for col in cc._input_columns_used_by_case_statement
+        )
+        settings_obj._retain_matching_columns = (
+            settings_obj._retain_matching_columns and matching_cols_available
+        )
+        settings_obj._additional_columns_to_retain_list = [
+            c
+            for c in settings_obj._additional_columns_to_retain_list
+            if _is_available(InputColumn(c, settings_obj=settings_obj))
+        ]
+
+        df_comparison_vectors = copy(df_predict)
+        df_comparison_vectors.templated_name = "__splink__df_comparison_vectors"
+
+        sqls = predict_from_comparison_vectors_sqls(
+            settings_obj,
             threshold_match_probability,
             threshold_match_weight,
             sql_infinity_expression=self._infinity_expression,
@@ -1713,9 +2731,9 @@ class Linker:
         for sql in sqls:
             self._enqueue_sql(sql["sql"], sql["output_table_name"])
 
-        predictions = self._execute_sql_pipeline(input_dataframes)
-        self._predict_warning()
-        return predictions
+        # use_cache=False because a __splink__df_predict registered with the linker
+        # must not be returned in place of the re-scored predictions
+        return self._execute_sql_pipeline([df_comparison_vectors], use_cache=False)
 
     def find_matches_to_new_records(
         self,
@@ -1764,6 +2782,14 @@ class Linker:
             self._settings_obj._blocking_rules_to_generate_predictions
         )
         original_link_type = self._settings_obj._link_type
+        original_dictionary_encode = self._settings_obj._dictionary_encode_columns
+
+        self._load_missing_tf_tables_from_settings_dir()
+        token_tf_tables = self._initialise_token_tf_tables()
+        self._settings_obj._apply_token_tf_adjustments = bool(token_tf_tables)
+
+        # New records have not been dictionary encoded, so compare raw values
+        self._settings_obj._dictionary_encode_columns = False
 
         blocking_rules = ensure_is_list(blocking_rules)
 
@@ -1801,6 +2827,7 @@ class Linker:
 
         if concat_with_tf:
             input_dfs.append(concat_with_tf)
+        input_dfs.extend(token_tf_tables)
 
         blocking_rules = [blocking_rule_to_obj(br) for br in blocking_rules]
         for n, br in enumerate(blocking_rules):
@@ -1820,7 +2847,12 @@ class Linker:
         self._enqueue_sql(sql, "__splink__df_blocked")
 
         sql = compute_comparison_vector_values_sql(self._settings_obj)
-        self._enqueue_sql(sql, "__splink__df_comparison_vectors")
+        if token_tf_tables:
+            table_name = "__splink__df_comparison_vectors_without_token_tf"
+            self._enqueue_sql(sql, table_name)
+            self._enqueue_token_tf_join_sql(table_name)
+        else:
+            self._enqueue_sql(sql, "__splink__df_comparison_vectors")
 
         sqls = predict_from_comparison_vectors_sqls(
             self._settings_obj,
@@ -1844,6 +2876,8 @@ class Linker:
             original_blocking_rules
         )
         self._settings_obj._link_type = original_link_type
+        self._settings_obj._dictionary_encode_columns = original_dictionary_encode
+        self._settings_obj._apply_token_tf_adjustments = False
         self._find_new_matches_mode = False
 
         return predictions
@@ -1872,8 +2906,15 @@ class Linker:
             self._settings_obj._blocking_rules_to_generate_predictions
         )
         original_link_type = self._settings_obj._link_type
+        original_dictionary_encode = self._settings_obj._dictionary_encode_columns
+
+        self._load_missing_tf_tables_from_settings_dir()
+        token_tf_tables = self._initialise_token_tf_tables()
+        self._settings_obj._apply_token_tf_adjustments = bool(token_tf_tables)
 
         self._compare_two_records_mode = True
+        # The two records have not been dictionary encoded, so compare raw values
+        self._settings_obj._dictionary_encode_columns = False
         self._settings_obj._blocking_rules_to_generate_predictions = []
 
         uid = ascii_uid(8)
@@ -1904,7 +2945,12 @@ class Linker:
         self._enqueue_sql(sql, "__splink__df_blocked")
 
         sql = compute_comparison_vector_values_sql(self._settings_obj)
-        self._enqueue_sql(sql, "__splink__df_comparison_vectors")
+        if token_tf_tables:
+            table_name = "__splink__df_comparison_vectors_without_token_tf"
+            self._enqueue_sql(sql, table_name)
+            self._enqueue_token_tf_join_sql(table_name)
+        else:
+            self._enqueue_sql(sql, "__splink__df_comparison_vectors")
 
         sqls = predict_from_comparison_vectors_sqls(
             self._settings_obj,
@@ -1914,13 +2960,15 @@ class Linker:
             self._enqueue_sql(sql["sql"], sql["output_table_name"])
 
         predictions = self._execute_sql_pipeline(
-            [df_records_left, df_records_right], use_cache=False
+            [df_records_left, df_records_right] + token_tf_tables, use_cache=False
         )
 
         self._settings_obj._blocking_rules_to_generate_predictions = (
             original_blocking_rules
         )
         self._settings_obj._link_type = original_link_type
+        self._settings_obj._dictionary_encode_columns = original_dictionary_encode
+        self._settings_obj._apply_token_tf_adjustments = False
         self._compare_two_records_mode = False
 
         return predictions
@@ -2654,7 +3702,18 @@ class Linker:
             altair.Chart: An altair chart
 
         """
-        self._raise_error_if_necessary_waterfall_columns_not_computed()
+        if records and "gamma_packed" in records[0]:
+            raise ValueError(
+                "The records provided are compact predictions. Use "
+                "`df.decode_compact_predictions().as_record_dict(limit=n)` to obtain "
+                "records suitable for the waterfall chart."
+            )
+
+        # Records decoded from compact predictions contain all necessary columns
+        # irrespective of the retain_... settings
+        bf_cols = [cc._bf_column_name for cc in self._settings_obj.comparisons]
+        if not (records and all(c in records[0] for c in bf_cols)):
+            self._raise_error_if_necessary_waterfall_columns_not_computed()
 
         return waterfall_chart(records, self._settings_obj, filter_nulls)
 
@@ -2712,7 +3771,8 @@ class Linker:
 
 
         Args:
-            df_predict (SplinkDataFrame): The outputs of `linker.predict()`
+            df_predict (SplinkDataFrame): The outputs of `linker.predict()`.  Compact
+                predictions are decoded automatically.
             out_path (str): The path (including filename) to save the html file to.
             overwrite (bool, optional): Overwrite the html file if it already exists?
                 Defaults to False.
@@ -2734,7 +3794,11 @@ class Linker:
             ```
 
         """
-        self._raise_error_if_necessary_waterfall_columns_not_computed()
+        df_predict_cols = [c.unquote().name() for c in df_predict.columns]
+        if "gamma_packed" in df_predict_cols:
+            df_predict = df_predict.decode_compact_predictions()
+        else:
+            self._raise_error_if_necessary_waterfall_columns_not_computed()
 
         sql = comparison_vector_distribution_sql(self)
         self._enqueue_sql(sql, "__splink__df_comparison_vector_distribution")
@@ -46,17 +46,22 @@ def append_u_probability_to_comparison_level_trained_probabilities(
     c = cl.comparison
 
     try:
-        u_probability = m_u_records_lookup[c._output_column_name][
+        level_lookup = m_u_records_lookup[c._output_column_name][
             cl._comparison_vector_value
-        ]["u_probability"]
+        ]
+        u_probability = level_lookup["u_probability"]
 
     except KeyError:
+        level_lookup = {}
         u_probability = LEVEL_NOT_OBSERVED_TEXT
 
         logger.info(f"u probability {not_trained_message(cl)}")
     cl._add_trained_u_probability(
         u_probability,
         training_description,
+        confidence_interval=level_lookup.get("u_probability_confidence_interval"),
+        relative_ci_width=level_lookup.get("u_probability_relative_ci_width"),
+        sampled_pairs=level_lookup.get("u_probability_sampled_pairs"),
     )
 
 
@@ -226,3 +226,27 @@ def read_resource(path: str) -> str:
     # Also, if you use importlib.resources, then you have to add an
     # __init__.py file to every subdirectory, which is annoying.
     return pkgutil.get_data("splink", path).decode("utf-8")
+
+
+def records_to_arrow_table(input):
+    """Convert a dict of columns or a list of dicts (records) directly to a
+    pyarrow Table, without an intermediate pandas dataframe.
+
+    Returns None if pyarrow is not installed, or if pyarrow cannot infer a
+    single type for each column (e.g. a mix of strings and integers), in which
+    case the caller should fall back to pandas.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+
+    if isinstance(input, list):
+        # Unlike pa.Table.from_pylist, take the union of the keys of all records
+        colnames = dedupe_preserving_order([k for r in input for k in r.keys()])
+        input = {c: [r.get(c) for r in input] for c in colnames}
+
+    try:
+        return pa.Table.from_pydict(input)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
@@ -23,12 +23,12 @@ class PostgresDataFrame(SplinkDataFrame):
         self._db_schema = linker._db_schema
         self.physical_name = f"{self.physical_name}"
 
-    @property
-    def columns(self) -> list[InputColumn]:
+    def _get_columns(self) -> list[InputColumn]:
         sql = f"""
         SELECT column_name
         FROM information_schema.columns
-        WHERE table_name = '{self.physical_name}';
+        WHERE table_name = '{self.physical_name}'
+        ORDER BY ordinal_position;
         """
         res = self.linker._run_sql_execution(sql).fetchall()
         cols = [r["column_name"] for r in res]
@@ -74,6 +74,85 @@ class PostgresDataFrame(SplinkDataFrame):
         res = self.linker._run_sql_execution(sql).mappings().all()
         return [dict(r) for r in res]
 
+    def _arrow_schema(self):
+        """A single Arrow schema for all batches, derived from the column types.
+
+        Also returns the functions used to convert the values of columns with no
+        direct Arrow equivalent: numeric columns are fetched as floats, and
+        columns of other unmapped types as strings"""
+        import pyarrow as pa
+
+        arrow_types = {
+            "int2": pa.int16(),
+            "int4": pa.int32(),
+            "int8": pa.int64(),
+            "float4": pa.float32(),
+            "float8": pa.float64(),
+            "numeric": pa.float64(),
+            "bool": pa.bool_(),
+            "text": pa.string(),
+            "varchar": pa.string(),
+            "bpchar": pa.string(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("us"),
+            "timestamptz": pa.timestamp("us", tz="UTC"),
+        }
+
+        sql = f"""
+        SELECT column_name, udt_name
+        FROM information_schema.columns
+        WHERE table_name = '{self.physical_name}'
+        ORDER BY ordinal_position;
+        """
+        res = self.linker._run_sql_execution(sql).mappings().all()
+
+        fields = []
+        converters = {}
+        for r in res:
+            col, udt_name = r["column_name"], r["udt_name"]
+            # Array types are named after their element type, prefixed with _
+            element_udt_name = udt_name.lstrip("_")
+            arrow_type = arrow_types.get(element_udt_name)
+            if arrow_type is None:
+                arrow_type = pa.string()
+                converters[col] = str
+            elif element_udt_name == "numeric":
+                converters[col] = float
+            if udt_name.startswith("_"):
+                arrow_type = pa.list_(arrow_type)
+            fields.append((col, arrow_type))
+
+        return pa.schema(fields), converters
+
+    def iter_batches(self, batch_size=100_000):
+        import pyarrow as pa
+
+        schema, converters = self._arrow_schema()
+
+        sql = f"""
+        SELECT *
+        FROM {self.physical_name};
+        """
+        # A server side cursor, so that only one batch is held in memory at a time
+        with self.linker._engine.connect() as con:
+            res = con.execution_options(
+                stream_results=True, max_row_buffer=batch_size
+            ).execute(text(sql))
+            for rows in res.mappings().partitions(batch_size):
+                rows = [dict(r) for r in rows]
+                for row in rows:
+                    for col, converter in converters.items():
+                        row[col] = _convert_value(row[col], converter)
+                yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def _convert_value(value, converter):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [_convert_value(v, converter) for v in value]
+    return converter(value)
+
 
 class PostgresLinker(Linker):
     def __init__(
@@ -177,12 +256,8 @@ class PostgresLinker(Linker):
         if proportion == 1.0:
             return ""
         if seed:
-            # TODO: we could maybe do seeds by handling it in calling function
-            # need to execute setseed() in surrounding session
-            raise NotImplementedError(
-                "Postgres does not support seeds in random "
-                "samples. Please remove the `seed` parameter."
-            )
+            uniform = self._hashed_uniform_expression(seed, unique_id)
+            return f"WHERE {uniform} < {proportion}"
 
         sample_size = int(sample_size)
 
@@ -199,6 +274,9 @@ class PostgresLinker(Linker):
             f")"
         )
 
+    def _seeded_hash_sql(self, expression, seed):
+        return f"hashtextextended(cast({expression} as text), {seed}) & {2**52 - 1}"
+
     @property
     def _infinity_expression(self):
         return "'infinity'"
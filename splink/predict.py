@@ -3,6 +3,7 @@ from __future__ import annotations
 # This is otherwise known as the expectation step of the EM algorithm.
 import logging
 
+from .compact_predictions import columns_to_select_for_compact_predict
 from .misc import prob_to_bayes_factor, prob_to_match_weight
 from .settings import Settings
 
@@ -15,6 +16,7 @@ def predict_from_comparison_vectors_sqls(
     threshold_match_weight=None,
     include_clerical_match_score=False,
     sql_infinity_expression="'infinity'",
+    compact_output=False,
 ) -> list[dict]:
     sqls = []
 
@@ -85,6 +87,25 @@ def predict_from_comparison_vectors_sqls(
     else:
         threshold_expr = ""
 
+    if compact_output:
+        # Only the ids, a single precision match weight and the bit-packed gamma
+        # values. See compact_predictions.py
+        select_cols = columns_to_select_for_compact_predict(
+            settings_obj, f"log2({bayes_factor_expr})"
+        )
+        select_cols_expr = ",".join(select_cols)
+        sql = f"""
+        select {select_cols_expr}
+        from __splink__df_match_weight_parts
+        {threshold_expr}
+        """
+        sql = {
+            "sql": sql,
+            "output_table_name": "__splink__df_predict_compact",
+        }
+        sqls.append(sql)
+        return sqls
+
     sql = f"""
     select
     log2({bayes_factor_expr}) as match_weight,
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+# Input columns which are retained in the predictions, but not needed to compute
+# the match weights, can be joined on by unique id once the pairwise comparisons
+# have been scored, rather than being carried through blocking and the
+# computation of comparison vectors
+from typing import TYPE_CHECKING
+
+from .misc import dedupe_preserving_order
+
+# https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
+if TYPE_CHECKING:
+    from .settings import Settings
+
+
+def join_on_unique_ids_sql(settings_obj: Settings, table_alias: str, side: str):
+    # e.g. l.source_dataset = p.source_dataset_l and l.unique_id = p.unique_id_l
+    conditions = []
+    for uid_col in settings_obj._unique_id_input_columns:
+        uid_side = uid_col.name_l() if side == "l" else uid_col.name_r()
+        conditions.append(f"{side}.{uid_col.name()} = {table_alias}.{uid_side}")
+    return " and ".join(conditions)
+
+
+def columns_to_rejoin_by_id(settings_obj: Settings) -> list[str]:
+    """The input columns needed to reconstruct the full predictions from
+    comparison vectors i.e. the columns used by each comparison, the term
+    frequency columns needed for tf adjustments and any additional columns to
+    retain
+
+    e.g. l.first_name as first_name_l, r.first_name as first_name_r
+    """
+    cols = []
+    for cc in settings_obj.comparisons:
+        for col in cc._input_columns_used_by_case_statement:
+            cols.extend(col.l_r_names_as_l_r())
+        for cl in cc.comparison_levels:
+            if cl._has_tf_adjustments:
+                cols.extend(cl._tf_adjustment_input_column.l_r_tf_names_as_l_r())
+
+    for add_col in settings_obj._additional_columns_to_retain:
+        cols.extend(add_col.l_r_names_as_l_r())
+
+    return dedupe_preserving_order(cols)
+
+
+def retained_columns_lookup(settings_obj: Settings) -> dict[str, str]:
+    """A lookup from the name of each retained input column in the predictions
+    to the sql that selects it from the input table
+
+    e.g. {"first_name_l": "l.first_name as first_name_l", ...}
+    """
+    input_cols = []
+    if settings_obj._retain_matching_columns:
+        for cc in settings_obj.comparisons:
+            input_cols.extend(cc._input_columns_used_by_case_statement)
+    input_cols.extend(settings_obj._additional_columns_to_retain)
+
+    lookup = {}
+    for col in input_cols:
+        lookup[col.name_l()] = col.l_name_as_l()
+        lookup[col.name_r()] = col.r_name_as_r()
+    return lookup
+
+
+def join_retained_columns_by_id_sql(
+    settings_obj: Settings, output_columns: list[str], input_table_name: str
+) -> str:
+    """Select `output_columns` from `input_table_name`, taking any retained input
+    columns from __splink__df_concat_with_tf, joined on by unique id
+
+    Args:
+        settings_obj (Settings): The settings object
+        output_columns (list[str]): The columns of the output table, in order
+        input_table_name (str): Table of scored comparisons which does not contain
+            the retained input columns
+    """
+    lookup = retained_columns_lookup(settings_obj)
+    select_cols = [lookup.get(c, f"p.{c}") for c in output_columns]
+    select_cols_expr = ", ".join(select_cols)
+
+    sql = f"""
+    select {select_cols_expr}
+    from {input_table_name} as p
+    left join __splink__df_concat_with_tf as l
+    on {join_on_unique_ids_sql(settings_obj, "p", "l")}
+    left join __splink__df_concat_with_tf as r
+    on {join_on_unique_ids_sql(settings_obj, "p", "r")}
+    """
+
+    return sql
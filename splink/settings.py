@@ -8,6 +8,7 @@ from .charts import m_u_parameters_chart, match_weights_chart
 from .comparison import Comparison
 from .comparison_level import ComparisonLevel
 from .default_from_jsonschema import default_value_from_schema
+from .dictionary_encoding import columns_used_in_exact_match_equalities
 from .input_column import InputColumn
 from .misc import dedupe_preserving_order, prob_to_bayes_factor, prob_to_match_weight
 from .parse_sql import get_columns_used_from_sql
@@ -57,6 +58,7 @@ class Settings:
         )
         self._em_convergence = s_else_d("em_convergence")
         self._max_iterations = s_else_d("max_iterations")
+        self._em_acceleration = s_else_d("em_acceleration")
         self._unique_id_column_name = s_else_d("unique_id_column_name")
 
         self._retain_matching_columns = s_else_d("retain_matching_columns")
@@ -73,6 +75,43 @@ class Settings:
         self._tf_prefix = s_else_d("term_frequency_adjustment_column_prefix")
         self._blocking_rule_for_training = None
         self._training_mode = False
+        # If True, the comparison vectors are a weighted sample of the record
+        # pairs, with weights in the sample_weight column.  See
+        # sample_comparison_vectors in expectation_maximisation.py
+        self._use_sample_weights = False
+
+        self._dictionary_encode_columns = s_else_d("dictionary_encode_columns")
+        self._dictionary_encoded_column_names = (
+            self._get_dictionary_encoded_column_names()
+        )
+
+        self._cache_comparison_vectors = s_else_d("cache_comparison_vectors")
+
+        self._project_input_columns = s_else_d("project_input_columns")
+
+        self._approximate_tf_column_names = s_else_d(
+            "approximate_term_frequency_columns"
+        )
+        self._approximate_tf_min_count = s_else_d(
+            "approximate_term_frequency_min_count"
+        )
+
+        self._term_frequency_tables_dir = s_else_d("term_frequency_tables_dir")
+
+        self._em_sufficient_statistics = s_else_d("em_sufficient_statistics")
+
+        # If True, retained input columns are joined on by unique id after
+        # prediction rather than carried through blocking and comparison
+        self._join_retained_columns_by_id = False
+
+        # If True, term frequency columns are joined on by unique id to the
+        # comparison vectors which need them, rather than carried through blocking
+        self._join_tf_columns_by_id = False
+
+        # If True, the frequencies of the tokens shared by each pair are joined on
+        # to the comparison vectors, and used by levels with token term frequency
+        # adjustments.  Only set while scoring predictions
+        self._apply_token_tf_adjustments = False
 
         self._warn_if_no_null_level_in_comparisons()
 
@@ -86,6 +125,7 @@ class Settings:
         of the original e.g. modifying the copy will not affect the original.
         This method implements ensures the Settings can be deepcopied."""
         cc = Settings(self.as_dict())
+        cc._dictionary_encoded_column_names = self._dictionary_encoded_column_names
         return cc
 
     def _from_settings_dict_else_default(self, key):
@@ -156,6 +196,38 @@ class Settings:
         cols = self._additional_columns_to_retain_list
         return [InputColumn(c, settings_obj=self) for c in cols]
 
+    @property
+    def _additional_columns_to_carry(self):
+        # The additional columns to retain which need to be selected at each
+        # stage of the blocking and comparison pipeline
+        if self._join_retained_columns_by_id:
+            return []
+        return self._additional_columns_to_retain
+
+    @property
+    def _carry_matching_columns(self):
+        # Whether the columns used by comparisons need to be selected at each
+        # stage of the blocking and comparison pipeline, so they're retained
+        if self._join_retained_columns_by_id:
+            return False
+        return self._retain_matching_columns
+
+    @property
+    def _token_frequency_columns(self) -> list[InputColumn]:
+        cols = []
+        for cc in self.comparisons:
+            for cl in cc.comparison_levels:
+                if cl._token_tf_adjustment_input_column is not None:
+                    cols.append(cl._level_dict["token_tf_adjustment_column"])
+        cols = dedupe_preserving_order(cols)
+        return [InputColumn(c, settings_obj=self) for c in cols]
+
+    @property
+    def _carry_tf_columns(self):
+        # Whether the term frequency columns need to be selected at blocking and
+        # in the computation of comparison vectors
+        return not self._join_tf_columns_by_id
+
     @property
     def _source_dataset_column_name_is_required(self):
         return self._link_type not in ["dedupe_only"]
@@ -196,6 +268,55 @@ class Settings:
             cols.update(cc._tf_adjustment_input_col_names)
         return [InputColumn(c, settings_obj=self) for c in list(cols)]
 
+    def _is_approximate_tf_column(self, input_column: InputColumn) -> bool:
+        """Whether only the frequent values of the column are stored exactly in its
+        term frequency table.  See approximate_term_frequency_columns"""
+        approximate_names = {
+            InputColumn(c, settings_obj=self).unquote().name().lower()
+            for c in self._approximate_tf_column_names
+        }
+        return input_column.unquote().name().lower() in approximate_names
+
+    @property
+    def _columns_to_dictionary_encode(self) -> list[InputColumn]:
+        """Columns which are compared for equality in the blocking rules used to
+        generate predictions or in any comparison level.
+
+        The column names are computed when the Settings are created, and carried
+        over to any copy, so that they remain consistent with the codes
+        materialised in __splink__df_concat_with_tf even where a copy's blocking
+        rules are swapped out (e.g. for training)
+        """
+        if not self._dictionary_encode_columns:
+            return []
+
+        return [
+            InputColumn(c, settings_obj=self)
+            for c in self._dictionary_encoded_column_names
+        ]
+
+    def _get_dictionary_encoded_column_names(self) -> list[str]:
+        if not self._dictionary_encode_columns:
+            return []
+
+        sqls = [br.blocking_rule for br in self._blocking_rules_to_generate_predictions]
+        for cc in self.comparisons:
+            for cl in cc.comparison_levels:
+                if not cl._is_else_level:
+                    sqls.append(cl.sql_condition)
+
+        colnames = []
+        for sql in sqls:
+            colnames.extend(
+                columns_used_in_exact_match_equalities(sql, self._sql_dialect)
+            )
+
+        # Dedupe case insensitively, retaining the first observed spelling
+        observed = {}
+        for c in colnames:
+            observed.setdefault(c.lower(), c)
+        return list(observed.values())
+
     @property
     def _needs_matchkey_column(self) -> bool:
         """Where multiple `blocking_rules_to_generate_predictions` are specified,
@@ -220,6 +341,22 @@ class Settings:
             cols_used.extend(cols)
         return dedupe_preserving_order(cols_used)
 
+    @property
+    def _columns_used_by_model(self) -> list[str]:
+        """The unquoted names of the input columns needed to train the model and
+        make predictions: the unique id, the columns used by comparisons, term
+        frequency adjustments and blocking rules to generate predictions, and any
+        additional columns to retain"""
+        cols = [
+            InputColumn(c).unquote().name() for c in self._columns_used_by_comparisons
+        ]
+        for col in self._term_frequency_columns + self._token_frequency_columns:
+            cols.append(col.unquote().name())
+        for br in self._blocking_rules_to_generate_predictions:
+            cols.extend(get_columns_used_from_sql(br.blocking_rule, br.sql_dialect))
+        cols.extend(self._additional_columns_to_retain_list)
+        return dedupe_preserving_order(cols)
+
     @property
     def _columns_to_select_for_blocking(self):
         cols = []
@@ -231,7 +368,7 @@ class Settings:
         for cc in self.comparisons:
             cols.extend(cc._columns_to_select_for_blocking)
 
-        for add_col in self._additional_columns_to_retain:
+        for add_col in self._additional_columns_to_carry:
             cols.extend(add_col.l_r_names_as_l_r())
 
         return dedupe_preserving_order(cols)
@@ -247,7 +384,7 @@ class Settings:
         for cc in self.comparisons:
             cols.extend(cc._columns_to_select_for_comparison_vector_values)
 
-        for add_col in self._additional_columns_to_retain:
+        for add_col in self._additional_columns_to_carry:
             cols.extend(add_col.names_l_r())
 
         if self._needs_matchkey_column:
@@ -267,12 +404,15 @@ class Settings:
         for cc in self.comparisons:
             cols.extend(cc._columns_to_select_for_bayes_factor_parts)
 
-        for add_col in self._additional_columns_to_retain:
+        for add_col in self._additional_columns_to_carry:
             cols.extend(add_col.names_l_r())
 
         if self._needs_matchkey_column:
             cols.append("match_key")
 
+        if self._use_sample_weights:
+            cols.append("sample_weight")
+
         cols = dedupe_preserving_order(cols)
         return cols
 
@@ -287,12 +427,15 @@ class Settings:
         for cc in self.comparisons:
             cols.extend(cc._columns_to_select_for_predict)
 
-        for add_col in self._additional_columns_to_retain:
+        for add_col in self._additional_columns_to_carry:
             cols.extend(add_col.names_l_r())
 
         if self._needs_matchkey_column:
             cols.append("match_key")
 
+        if self._use_sample_weights:
+            cols.append("sample_weight")
+
         cols = dedupe_preserving_order(cols)
         return cols
 
@@ -428,8 +571,28 @@ class Settings:
             "comparisons": [cc.as_dict() for cc in self.comparisons],
             "probability_two_random_records_match": rr_match,
         }
+        if self._em_sufficient_statistics:
+            current_settings[
+                "em_sufficient_statistics"
+            ] = self._em_sufficient_statistics
         return {**self._settings_dict, **current_settings}
 
+    def _get_em_sufficient_statistics(self, blocking_rule: str) -> dict:
+        for statistics in self._em_sufficient_statistics:
+            if statistics["blocking_rule"] == blocking_rule:
+                return statistics
+        return None
+
+    def _set_em_sufficient_statistics(self, blocking_rule: str, statistics: dict):
+        self._em_sufficient_statistics = [
+            s
+            for s in self._em_sufficient_statistics
+            if s["blocking_rule"] != blocking_rule
+        ]
+        self._em_sufficient_statistics.append(
+            {"blocking_rule": blocking_rule, **statistics}
+        )
+
     def _as_completed_dict(self):
         rr_match = self._probability_two_random_records_match
         current_settings = {
@@ -10,13 +10,18 @@ import pandas as pd
 import sqlglot
 from numpy import nan
 from pyspark.sql.dataframe import DataFrame as spark_df
+from pyspark.sql.pandas.types import from_arrow_schema, to_arrow_schema
 from pyspark.sql.types import DoubleType, StringType
 from pyspark.sql.utils import AnalysisException
 
 from ..databricks.enable_splink import enable_splink
 from ..input_column import InputColumn
 from ..linker import Linker
-from ..misc import ensure_is_list, major_minor_version_greater_equal_than
+from ..misc import (
+    ensure_is_list,
+    major_minor_version_greater_equal_than,
+    records_to_arrow_table,
+)
 from ..splink_dataframe import SplinkDataFrame
 from ..term_frequencies import colname_to_tf_tablename
 from .spark_helpers.custom_spark_dialect import Dialect
@@ -29,12 +34,11 @@ Dialect["customspark"]
 class SparkDataFrame(SplinkDataFrame):
     linker: SparkLinker
 
-    @property
-    def columns(self) -> list[InputColumn]:
-        sql = f"select * from {self.physical_name} limit 1"
-        spark_df = self.linker.spark.sql(sql)
+    def _get_columns(self) -> list[InputColumn]:
+        # Reading the schema only requires the table to be analysed, not planned
+        schema = self.as_spark_dataframe().schema
 
-        col_strings = list(spark_df.columns)
+        col_strings = schema.fieldNames()
         return [InputColumn(c, sql_dialect="spark") for c in col_strings]
 
     def validate(self):
@@ -45,7 +49,41 @@ class SparkDataFrame(SplinkDataFrame):
         if limit:
             sql += f" limit {limit}"
 
-        return self.linker.spark.sql(sql).toPandas().to_dict(orient="records")
+        rows = self.linker.spark.sql(sql).collect()
+        return [r.asDict(recursive=True) for r in rows]
+
+    def as_arrow(self, limit=None):
+        import pyarrow as pa
+
+        sql = f"select * from {self.physical_name}"
+        if limit:
+            sql += f" limit {limit}"
+
+        spark_df = self.linker.spark.sql(sql)
+        if hasattr(spark_df, "toArrow"):
+            return spark_df.toArrow()
+
+        # Before Spark 4.0 there is no public method to collect as arrow
+        batches = spark_df._collect_as_arrow()
+        if len(batches) > 0:
+            return pa.Table.from_batches(batches)
+        return to_arrow_schema(spark_df.schema).empty_table()
+
+    def iter_batches(self, batch_size=100_000):
+        import pyarrow as pa
+
+        spark_df = self.as_spark_dataframe()
+        schema = to_arrow_schema(spark_df.schema)
+
+        # toLocalIterator collects a single partition at a time
+        rows = []
+        for row in spark_df.toLocalIterator():
+            rows.append(row.asDict(recursive=True))
+            if len(rows) == batch_size:
+                yield pa.RecordBatch.from_pylist(rows, schema=schema)
+                rows = []
+        if rows:
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
 
     def _drop_table_from_database(self, force_non_splink_table=False):
         # Spark, in general, does not persist its results to disk
@@ -325,6 +363,7 @@ class SparkLinker(Linker):
             r"__splink__df_representatives",
             r"__splink__df_concat_with_tf_sample",
             r"__splink__df_concat_with_tf",
+            r"__splink__df_concat_with_tf_sample_random",
             r"__splink__df_predict",
         ]
 
@@ -368,6 +407,7 @@ class SparkLinker(Linker):
             r"__splink__df_concat_with_tf",
             r"__splink__df_predict",
             r"__splink__df_tf_.+",
+            r"__splink__df_token_tf_.+",
             r"__splink__df_representatives.*",
             r"__splink__df_neighbours",
             r"__splink__df_connected_components_df",
@@ -427,6 +467,10 @@ class SparkLinker(Linker):
     def _infinity_expression(self):
         return "'infinity'"
 
+    @property
+    def _explode_array_function(self):
+        return "explode"
+
     def register_table(self, input, table_name, overwrite=False):
         """
         Register a table to your backend database, to be used in one of the
@@ -469,17 +513,54 @@ class SparkLinker(Linker):
         return self._table_to_splink_dataframe(table_name, table_name)
 
     def _table_registration(self, input, table_name):
-        if isinstance(input, dict):
-            input = pd.DataFrame(input)
-        elif isinstance(input, list):
-            input = pd.DataFrame.from_records(input)
+        if isinstance(input, (dict, list)):
+            arrow_table = records_to_arrow_table(input)
+            if arrow_table is not None:
+                input = arrow_table
+            elif isinstance(input, dict):
+                input = pd.DataFrame(input)
+            else:
+                input = pd.DataFrame.from_records(input)
 
         if isinstance(input, pd.DataFrame):
             input = self._clean_pandas_df(input)
-            input = self.spark.createDataFrame(input)
+            input = self._create_spark_dataframe_using_arrow(input)
+        elif not isinstance(input, spark_df):
+            # A pyarrow table.  Nulls are preserved by the arrow conversion, so
+            # there is no need to clean the pandas dataframe
+            input = self._cast_null_columns_to_string(input)
+            schema = from_arrow_schema(input.schema)
+            input = input.to_pandas(integer_object_nulls=True)
+            input = self._create_spark_dataframe_using_arrow(input, schema)
 
         input.createOrReplaceTempView(table_name)
 
+    def _cast_null_columns_to_string(self, arrow_table):
+        # Columns which are entirely null (e.g. a missing value in a single
+        # record) would otherwise be given Spark's void type, which cannot be
+        # written to parquet
+        import pyarrow as pa
+
+        schema = pa.schema(
+            [
+                f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                for f in arrow_table.schema
+            ]
+        )
+        return arrow_table.cast(schema)
+
+    def _create_spark_dataframe_using_arrow(self, df, schema=None):
+        # Arrow transfers the data to the JVM in columnar batches, rather than
+        # serialising it row by row.  Spark falls back to the row by row
+        # conversion if any column cannot be converted
+        conf_key = "spark.sql.execution.arrow.pyspark.enabled"
+        arrow_enabled = self.spark.conf.get(conf_key, "false")
+        self.spark.conf.set(conf_key, "true")
+        try:
+            return self.spark.createDataFrame(df, schema)
+        finally:
+            self.spark.conf.set(conf_key, arrow_enabled)
+
     def _clean_pandas_df(self, df):
         return df.fillna(nan).replace([nan, pd.NA], [None, None])
 
@@ -490,10 +571,16 @@ class SparkLinker(Linker):
             return ""
         percent = proportion * 100
         if seed:
-            return f" ORDER BY rand({seed}) LIMIT {round(sample_size)}"
+            # A bernoulli sample using a hash of the unique id, which unlike
+            # ordering by rand(seed) does not require a global sort
+            uniform = self._hashed_uniform_expression(seed, unique_id)
+            return f" WHERE {uniform} < {proportion} "
         else:
             return f" TABLESAMPLE ({percent} PERCENT) "
 
+    def _seeded_hash_sql(self, expression, seed):
+        return f"pmod(xxhash64({expression}, {seed}), {2**52})"
+
     def _table_exists_in_database(self, table_name):
         query_result = self.spark.sql(
             f"show tables from {self.splink_data_store} like '{table_name}'"
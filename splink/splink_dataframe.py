@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 if TYPE_CHECKING:
+    from .input_column import InputColumn
     from .linker import Linker
 
 
@@ -25,10 +26,17 @@ class SplinkDataFrame:
         self._target_schema = "splink"
         self.created_by_splink = False
         self.sql_used_to_create = None
+        self._columns = None
 
     @property
-    def columns(self):
-        pass
+    def columns(self) -> list[InputColumn]:
+        # The schema is read from the database metadata once, and then cached
+        if self._columns is None:
+            self._columns = self._get_columns()
+        return list(self._columns)
+
+    def _get_columns(self) -> list[InputColumn]:
+        raise NotImplementedError("_get_columns not implemented for this linker")
 
     @property
     def columns_escaped(self):
@@ -85,6 +93,28 @@ class SplinkDataFrame:
         self._drop_table_from_database(force_non_splink_table=force_non_splink_table)
         self.linker._remove_splinkdataframe_from_cache(self)
 
+    def decode_compact_predictions(self) -> SplinkDataFrame:
+        """Expand compact predictions, as output by
+        `linker.predict(compact_output=True)`, into the full predictions format.
+
+        The packed comparison vector is unpacked into one `gamma_` column per
+        comparison, the input columns are re-joined by unique id, and the match
+        weights and intermediate calculation columns are recomputed. The result
+        can be used with charts such as `linker.waterfall_chart()` and
+        `linker.comparison_viewer_dashboard()`.
+
+        Examples:
+            ```py
+            df_compact = linker.predict(compact_output=True)
+            df_predict = df_compact.decode_compact_predictions()
+            linker.waterfall_chart(df_predict.as_record_dict(limit=10))
+            ```
+
+        Returns:
+            SplinkDataFrame: The decoded predictions
+        """
+        return self.linker._decode_compact_predictions(self)
+
     def as_record_dict(self, limit=None):
         """Return the dataframe as a list of record dictionaries.
 
@@ -104,6 +134,53 @@ class SplinkDataFrame:
         """
         raise NotImplementedError("as_record_dict not implemented for this linker")
 
+    def as_arrow(self, limit=None):
+        """Return the dataframe as a pyarrow Table.
+
+        This can be computationally expensive if the dataframe is large.
+        Requires pyarrow to be installed.
+
+        Examples:
+            ```py
+            df_predict = linker.predict()
+            arrow_table = df_predict.as_arrow()
+            ```
+        Args:
+            limit (int, optional): If provided, return this number of rows (equivalent
+            to a limit statement in SQL). Defaults to None, meaning return all rows
+
+        Returns:
+            pyarrow.Table: pyarrow Table
+        """
+        import pyarrow as pa
+
+        return pa.Table.from_pylist(self.as_record_dict(limit=limit))
+
+    def iter_batches(self, batch_size=100_000):
+        """Iterate over the dataframe in batches of at most `batch_size` rows,
+        each returned as a pyarrow RecordBatch.
+
+        Where the backend supports it, rows are streamed from the database, so
+        that large tables such as predictions can be passed to downstream
+        systems without holding the whole table in memory.  With some backends,
+        such as DuckDB, other queries should not be run against the linker
+        until iteration is complete.  Requires pyarrow to be installed.
+
+        Examples:
+            ```py
+            df_predict = linker.predict()
+            for batch in df_predict.iter_batches(batch_size=10_000):
+                write_to_downstream_system(batch.to_pylist())
+            ```
+        Args:
+            batch_size (int, optional): The maximum number of rows in each batch.
+                Defaults to 100,000.
+
+        Yields:
+            pyarrow.RecordBatch: The next batch of rows
+        """
+        yield from self.as_arrow().to_batches(max_chunksize=batch_size)
+
     def as_pandas_dataframe(self, limit=None):
         """Return the dataframe as a pandas dataframe.
 
@@ -129,8 +206,8 @@ class SplinkDataFrame:
         msg = (
             f"Table name in database: `{self.physical_name}`\n"
             "\nTo retrieve records, you can call the following methods on this object:"
-            "\n`.as_record_dict(limit=5)` or "
-            "`.as_pandas_dataframe(limit=5)`.\n"
+            "\n`.as_record_dict(limit=5)`, `.as_pandas_dataframe(limit=5)` or "
+            "`.as_arrow(limit=5)`.\n"
             "\nYou may omit the `limit` argument to return all records."
             "\n\nThis table represents the following splink entity: "
             f"{self.templated_name}"
@@ -26,8 +26,7 @@ def dict_factory(cursor, row):
 class SQLiteDataFrame(SplinkDataFrame):
     linker: SQLiteLinker
 
-    @property
-    def columns(self) -> list[InputColumn]:
+    def _get_columns(self) -> list[InputColumn]:
         sql = f"""
         PRAGMA table_info({self.physical_name});
         """
@@ -80,6 +79,50 @@ class SQLiteDataFrame(SplinkDataFrame):
         cur = self.linker.con.cursor()
         return cur.execute(sql).fetchall()
 
+    def _arrow_schema(self):
+        """A single Arrow schema for all batches.  SQLite values are dynamically
+        typed, so each column takes the widest type of its values, and a column
+        with no non-null values has the null type"""
+        import pyarrow as pa
+
+        arrow_types = {1: pa.int64(), 2: pa.float64(), 3: pa.string(), 4: pa.binary()}
+        cols = self.columns
+        type_ranks = [
+            f"""max(case typeof({c.name()})
+                when 'integer' then 1 when 'real' then 2
+                when 'text' then 3 when 'blob' then 4 end) as col_{i}"""
+            for i, c in enumerate(cols)
+        ]
+        sql = f"""
+        select {", ".join(type_ranks)}
+        from {self.physical_name};
+        """
+        cur = self.linker.con.cursor()
+        ranks = cur.execute(sql).fetchone()
+        return pa.schema(
+            [
+                (c.unquote().name(), arrow_types.get(ranks[f"col_{i}"], pa.null()))
+                for i, c in enumerate(cols)
+            ]
+        )
+
+    def iter_batches(self, batch_size=100_000):
+        import pyarrow as pa
+
+        schema = self._arrow_schema()
+
+        sql = f"""
+        select *
+        from {self.physical_name};
+        """
+        cur = self.linker.con.cursor()
+        cur.execute(sql)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
 
 class SQLiteLinker(Linker):
     def __init__(
@@ -206,6 +249,15 @@ class SQLiteLinker(Linker):
     def _infinity_expression(self):
         return "'infinity'"
 
+    @property
+    def _grouping_sets_supported(self):
+        return False
+
+    @property
+    def _random_uniform_expression(self):
+        # SQLite's random() returns a signed 64 bit integer
+        return "(random() / 18446744073709551616.0 + 0.5)"
+
     def _table_exists_in_database(self, table_name):
         sql = f"PRAGMA table_info('{table_name}');"
 
@@ -2,22 +2,31 @@ from __future__ import annotations
 
 # For more information on where formulas came from, see
 # https://github.com/moj-analytical-services/splink/pull/107
+import json
 import logging
 import warnings
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 from numpy import arange, ceil, floor, log2
-from pandas import concat, cut
+from pandas import concat, cut, read_parquet
 
 from .charts import altair_or_json, load_chart_definition
+from .exceptions import SplinkException
 from .input_column import InputColumn, remove_quotes_from_identifiers
 
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 if TYPE_CHECKING:
     from .linker import Linker
+    from .settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# Term frequency tables saved by linker.save_tf_tables() are described by a
+# manifest in the same directory
+TF_TABLES_MANIFEST_FILENAME = "manifest.json"
+TF_TABLES_FORMAT_VERSION = 1
+
 
 def colname_to_tf_tablename(input_column: InputColumn):
     input_col_no_quotes = remove_quotes_from_identifiers(
@@ -28,6 +37,15 @@ def colname_to_tf_tablename(input_column: InputColumn):
     return f"__splink__df_tf_{input_column}"
 
 
+def colname_to_token_tf_tablename(input_column: InputColumn):
+    input_col_no_quotes = remove_quotes_from_identifiers(
+        input_column.input_name_as_tree
+    )
+
+    input_column = input_col_no_quotes.sql().replace(" ", "_")
+    return f"__splink__df_token_tf_{input_column}"
+
+
 def term_frequencies_for_single_column_sql(
     input_column: InputColumn, table_name="__splink__df_concat"
 ):
@@ -37,7 +55,8 @@ def term_frequencies_for_single_column_sql(
     select
     {col_name}, cast(count(*) as float8) / (select
         count({col_name}) as total from {table_name})
-            as {input_column.tf_name()}
+            as {input_column.tf_name()},
+    count(*) as __splink__value_count
     from {table_name}
     where {col_name} is not null
     group by {col_name}
@@ -46,6 +65,159 @@ def term_frequencies_for_single_column_sql(
     return sql
 
 
+def token_frequencies_for_single_column_sql(
+    settings_obj: Settings,
+    input_column: InputColumn,
+    explode_function: str,
+    table_name="__splink__df_concat",
+):
+    """The term frequencies of the tokens in an array column, i.e. the proportion of
+    records which contain each token, computed in a single scan of the exploded
+    tokens.  A token repeated within a record is only counted once"""
+    col_name = input_column.name()
+    uid_cols = ", ".join(c.name() for c in settings_obj._unique_id_input_columns)
+
+    sql = f"""
+    select
+    {col_name}, cast(count(*) as float8) / (select
+        count({col_name}) as total from {table_name})
+            as {input_column.token_tf_name()},
+    count(*) as __splink__value_count
+    from (
+        select distinct {uid_cols}, {col_name}
+        from (
+            select {uid_cols}, {explode_function}({col_name}) as {col_name}
+            from {table_name}
+        ) as __splink__exploded_tokens
+    ) as __splink__record_tokens
+    where {col_name} is not null
+    group by {col_name}
+    """
+
+    return sql
+
+
+def value_counts_for_single_column_sql(
+    input_column: InputColumn, table_name="__splink__df_concat"
+):
+    col_name = input_column.name()
+
+    sql = f"""
+    select
+    {col_name}, count(*) as __splink__value_count
+    from {table_name}
+    where {col_name} is not null
+    group by {col_name}
+    """
+
+    return sql
+
+
+def approximate_term_frequencies_sqls(
+    input_column: InputColumn, value_counts_sql: str, min_count: int
+) -> list[dict]:
+    """The sqls to compute an approximate term frequency table for a high
+    cardinality column, from the value counts of the column.
+
+    Only values occurring at least `min_count` times are stored exactly.  The
+    remaining rare values are represented by a single row with a null value, whose
+    term frequency is the average term frequency of the rare values.  This is
+    used in place of the exact term frequency for any value which is not in the
+    table - see _join_tf_to_input_df_sql.
+    """
+    col_name = input_column.name()
+    tf_tablename = colname_to_tf_tablename(input_column)
+    value_counts_tablename = f"{tf_tablename}_value_counts"
+
+    sqls = [{"sql": value_counts_sql, "output_table_name": value_counts_tablename}]
+
+    total_expr = f"""(select
+        sum(__splink__value_count) as total from {value_counts_tablename})"""
+
+    sql = f"""
+    select
+    {col_name},
+    cast(__splink__value_count as float8) / {total_expr}
+        as {input_column.tf_name()},
+    __splink__value_count
+    from {value_counts_tablename}
+    where __splink__value_count >= {min_count}
+
+    union all
+
+    select
+    null as {col_name},
+    cast(sum(__splink__value_count) as float8) / count(*) / {total_expr}
+        as {input_column.tf_name()},
+    sum(__splink__value_count) as __splink__value_count
+    from {value_counts_tablename}
+    where __splink__value_count < {min_count}
+    """
+    sqls.append({"sql": sql, "output_table_name": tf_tablename})
+
+    return sqls
+
+
+def _tf_columns_to_compute(linker: Linker) -> list[InputColumn]:
+    settings_obj = linker._settings_obj
+    return [
+        tf_col
+        for tf_col in settings_obj._term_frequency_columns
+        if colname_to_tf_tablename(tf_col) not in linker._intermediate_table_cache
+    ]
+
+
+def term_frequency_counts_sql(
+    tf_cols: list[InputColumn], table_name="__splink__df_concat"
+):
+    """Count the occurrences of each value of each of `tf_cols`, in a single scan
+    of the input data using GROUPING SETS.
+
+    The output has a row per value of each column, with the other columns null,
+    and a flag per column, `__splink__grouping_{i}`, which is 0 for the rows
+    counting the values of the i-th column.
+    """
+    col_names = [tf_col.name() for tf_col in tf_cols]
+    grouping_flags = [
+        f"grouping({col_name}) as __splink__grouping_{i}"
+        for i, col_name in enumerate(col_names)
+    ]
+    grouping_sets = ", ".join(f"({col_name})" for col_name in col_names)
+
+    sql = f"""
+    select
+    {", ".join(col_names)},
+    count(*) as __splink__value_count,
+    {", ".join(grouping_flags)}
+    from {table_name}
+    group by grouping sets ({grouping_sets})
+    """
+
+    return sql
+
+
+def term_frequencies_from_counts_sql(
+    input_column: InputColumn, grouping_index: int, table_name="__splink__df_tf_counts"
+):
+    """The term frequency table of a column, from the value counts computed by
+    term_frequency_counts_sql"""
+    col_name = input_column.name()
+    where_expr = f"__splink__grouping_{grouping_index} = 0 and {col_name} is not null"
+
+    sql = f"""
+    select
+    {col_name},
+    cast(__splink__value_count as float8) / (select
+        sum(__splink__value_count) as total from {table_name} where {where_expr})
+            as {input_column.tf_name()},
+    __splink__value_count
+    from {table_name}
+    where {where_expr}
+    """
+
+    return sql
+
+
 def _join_tf_to_input_df_sql(linker: Linker):
     settings_obj = linker._settings_obj
     tf_cols = settings_obj._term_frequency_columns
@@ -57,7 +229,17 @@ def _join_tf_to_input_df_sql(linker: Linker):
         if tbl in linker._intermediate_table_cache:
             tbl = linker._intermediate_table_cache[tbl].physical_name
         tf_col = col.tf_name()
-        select_cols.append(f"{tbl}.{tf_col}")
+        if settings_obj._is_approximate_tf_column(col):
+            # Values not stored in the table take the term frequency of the
+            # row with a null value.  See approximate_term_frequencies_sqls
+            select_cols.append(
+                f"""case when __splink__df_concat.{col.name()} is null then null
+                else coalesce({tbl}.{tf_col}, (select max({tf_col})
+                    from {tbl} where {col.name()} is null))
+                end as {tf_col}"""
+            )
+        else:
+            select_cols.append(f"{tbl}.{tf_col}")
 
     select_cols.insert(0, "__splink__df_concat.*")
     select_cols = ", ".join(select_cols)
@@ -87,48 +269,311 @@ def _join_tf_to_input_df_sql(linker: Linker):
     return sql
 
 
+def join_tf_to_comparison_vectors_sql(
+    settings_obj: Settings, input_table_name: str
+) -> str:
+    """Join the term frequency columns onto comparison vectors which were computed
+    without them, looking them up in __splink__df_concat_with_tf by unique id.
+
+    Term frequencies are only looked up for pairs in which a comparison is at a
+    level with term frequency adjustments (e.g. an exact match), since they are
+    not used to score the other pairs.  For those pairs they are null.
+    """
+    # e.g. {"tf_first_name": ["p.gamma_first_name = 3", ...]}
+    conditions_by_tf_name = {}
+    tf_cols_by_name = {}
+    for cc in settings_obj.comparisons:
+        for cl in cc.comparison_levels:
+            if cl._has_tf_adjustments:
+                col = cl._tf_adjustment_input_column
+                condition = f"p.{cc._gamma_column_name} = {cl._comparison_vector_value}"
+                conditions_by_tf_name.setdefault(col.tf_name(), []).append(condition)
+                tf_cols_by_name[col.tf_name()] = col
+
+    select_cols = ["p.*"]
+    for tf_name, col in tf_cols_by_name.items():
+        needs_tf = " or ".join(conditions_by_tf_name[tf_name])
+        select_cols.append(
+            f"case when {needs_tf} then l.{tf_name} end as {col.tf_name_l()}"
+        )
+        select_cols.append(
+            f"case when {needs_tf} then r.{tf_name} end as {col.tf_name_r()}"
+        )
+    select_cols_expr = ", ".join(select_cols)
+
+    needs_any_tf = " or ".join(
+        condition
+        for conditions in conditions_by_tf_name.values()
+        for condition in conditions
+    )
+
+    # Null join keys for the pairs which don't need term frequencies, so they
+    # find no match.  This keeps the join an equi-join
+    def join_condition(side):
+        conditions = []
+        for uid_col in settings_obj._unique_id_input_columns:
+            uid_side = uid_col.name_l() if side == "l" else uid_col.name_r()
+            conditions.append(
+                f"{side}.{uid_col.name()} = "
+                f"case when {needs_any_tf} then p.{uid_side} end"
+            )
+        return " and ".join(conditions)
+
+    sql = f"""
+    select {select_cols_expr}
+    from {input_table_name} as p
+    left join __splink__df_concat_with_tf as l
+    on {join_condition("l")}
+    left join __splink__df_concat_with_tf as r
+    on {join_condition("r")}
+    """
+
+    return sql
+
+
+def _pair_tokens_sql(
+    pair_cols: list[str],
+    array_col_name: str,
+    explode_function: str,
+    input_table_name: str,
+    where_condition: str,
+):
+    # The distinct tokens in one side of each pair e.g. address_tokens_l
+    pair_cols_expr = ", ".join(pair_cols)
+    return f"""
+    select distinct {pair_cols_expr}, token
+    from (
+        select {pair_cols_expr}, {explode_function}({array_col_name}) as token
+        from {input_table_name}
+        where {where_condition}
+    ) as __splink__exploded_tokens
+    """
+
+
+def join_token_tf_to_comparison_vectors_sql(
+    settings_obj: Settings, explode_function: str, input_table_name: str
+) -> str:
+    """Join the token term frequency of each pair onto the comparison vectors, for
+    the columns used by levels with token term frequency adjustments.
+
+    The token term frequency of a pair is the product of the term frequencies of
+    the tokens the two records share.  The shared tokens are found by exploding
+    the tokens of each side of the pairs and joining them, so this is computed
+    as a set based join rather than by comparing the arrays pair by pair.  Only
+    pairs at a level with token term frequency adjustments are exploded.  For the
+    other pairs, and pairs which share no tokens, the token term frequency is null.
+    """
+    uid_l = [c.name_l() for c in settings_obj._unique_id_input_columns]
+    uid_r = [c.name_r() for c in settings_obj._unique_id_input_columns]
+    pair_cols = uid_l + uid_r
+
+    # e.g. {"address_tokens": ["gamma_address_tokens = 2", ...]}
+    conditions_by_col_name = {}
+    for cc in settings_obj.comparisons:
+        for cl in cc.comparison_levels:
+            if cl._has_token_tf_adjustments:
+                col = cl._token_tf_adjustment_input_column
+                condition = f"{cc._gamma_column_name} = {cl._comparison_vector_value}"
+                conditions_by_col_name.setdefault(col.name(), []).append(condition)
+
+    select_cols = ["p.*"]
+    left_joins = []
+    for n, col in enumerate(settings_obj._token_frequency_columns):
+        needs_token_tf = " or ".join(conditions_by_col_name[col.name()])
+        token_tf = col.token_tf_name()
+        token_tf_table = colname_to_token_tf_tablename(col)
+        tokens_l_sql, tokens_r_sql = (
+            _pair_tokens_sql(
+                pair_cols, side_name, explode_function, input_table_name, needs_token_tf
+            )
+            for side_name in col.names_l_r()
+        )
+
+        shared_tokens_on = " and ".join(
+            [f"tl.{c} = tr.{c}" for c in pair_cols] + ["tl.token = tr.token"]
+        )
+        group_by = ", ".join(f"tl.{c}" for c in pair_cols)
+
+        shared_token_tf_sql = f"""
+        select {group_by}, exp(sum(ln(t.{token_tf}))) as {token_tf}
+        from ({tokens_l_sql}) as tl
+        inner join ({tokens_r_sql}) as tr
+        on {shared_tokens_on}
+        inner join {token_tf_table} as t
+        on tl.token = t.{col.name()}
+        group by {group_by}
+        """
+
+        alias = f"__splink__shared_token_tf_{n}"
+        select_cols.append(f"{alias}.{token_tf}")
+        join_on = " and ".join(f"p.{c} = {alias}.{c}" for c in pair_cols)
+        left_joins.append(f"left join ({shared_token_tf_sql}) as {alias} on {join_on}")
+
+    select_cols_expr = ", ".join(select_cols)
+    left_joins_expr = " ".join(left_joins)
+
+    sql = f"""
+    select {select_cols_expr}
+    from {input_table_name} as p
+    {left_joins_expr}
+    """
+
+    return sql
+
+
 def term_frequencies_from_concat_with_tf(input_column):
     sql = f"""
         select
-        distinct {input_column.name()},
-        {input_column.tf_name()}
+        {input_column.name()},
+        max({input_column.tf_name()}) as {input_column.tf_name()},
+        count(*) as __splink__value_count
         from __splink__df_concat_with_tf
+        where {input_column.name()} is not null
+        group by {input_column.name()}
     """
 
     return sql
 
 
-def compute_all_term_frequencies_sqls(linker: Linker) -> list[dict]:
+def updated_term_frequencies_sqls(
+    input_column: InputColumn, tf_table_name: str, new_records_table_name: str
+) -> list[dict]:
+    """The sqls to add the value counts of a column in `new_records_table_name` to
+    the raw counts (`__splink__value_count`) stored in the term frequency table
+    `tf_table_name`, and recompute the relative frequencies from the new totals.
+
+    Only the distinct values of the column and the new records are scanned, rather
+    than the full input data.
+    """
+    col_name = input_column.name()
+    tf_tablename = colname_to_tf_tablename(input_column)
+
+    sql = f"""
+    select
+    {col_name},
+    cast(sum(__splink__value_count) as bigint) as __splink__value_count
+    from (
+        select {col_name}, __splink__value_count
+        from {tf_table_name}
+        where {col_name} is not null
+        union all
+        select {col_name}, count(*) as __splink__value_count
+        from {new_records_table_name}
+        where {col_name} is not null
+        group by {col_name}
+    ) as __splink__tf_counts_union
+    group by {col_name}
+    """
+    sqls = [{"sql": sql, "output_table_name": f"{tf_tablename}_updated_counts"}]
+
+    sql = f"""
+    select
+    {col_name},
+    cast(__splink__value_count as float8) / (select
+        sum(__splink__value_count) as total from {tf_tablename}_updated_counts)
+            as {input_column.tf_name()},
+    __splink__value_count
+    from {tf_tablename}_updated_counts
+    """
+    sqls.append({"sql": sql, "output_table_name": tf_tablename})
+
+    return sqls
+
+
+def compute_all_term_frequencies_sqls(
+    linker: Linker,
+    output_table_name="__splink__df_concat_with_tf",
+    tf_cols_to_compute: list[InputColumn] = None,
+    from_tf_counts=False,
+) -> list[dict]:
+    """The sqls to compute the term frequency tables which are not already cached,
+    and join them onto the input data.
+
+    If `from_tf_counts` is True, the term frequency tables are computed from
+    `__splink__df_tf_counts`, the output of term_frequency_counts_sql, rather than
+    each from a separate scan of the input data.  `tf_cols_to_compute` must then be
+    the columns passed to term_frequency_counts_sql, in the same order.
+    """
     settings_obj = linker._settings_obj
     tf_cols = settings_obj._term_frequency_columns
 
+    if tf_cols_to_compute is None:
+        tf_cols_to_compute = _tf_columns_to_compute(linker)
+
     if not tf_cols:
         return [
             {
                 "sql": "select * from __splink__df_concat",
-                "output_table_name": "__splink__df_concat_with_tf",
+                "output_table_name": output_table_name,
             }
         ]
 
     sqls = []
-    for tf_col in tf_cols:
-        tf_table_name = colname_to_tf_tablename(tf_col)
-
-        if tf_table_name not in linker._intermediate_table_cache:
+    for i, tf_col in enumerate(tf_cols_to_compute):
+        if settings_obj._is_approximate_tf_column(tf_col):
+            if from_tf_counts:
+                sql = f"""
+                select {tf_col.name()}, __splink__value_count
+                from __splink__df_tf_counts
+                where __splink__grouping_{i} = 0 and {tf_col.name()} is not null
+                """
+            else:
+                sql = value_counts_for_single_column_sql(tf_col)
+            sqls.extend(
+                approximate_term_frequencies_sqls(
+                    tf_col, sql, settings_obj._approximate_tf_min_count
+                )
+            )
+            continue
+
+        if from_tf_counts:
+            sql = term_frequencies_from_counts_sql(tf_col, i)
+        else:
             sql = term_frequencies_for_single_column_sql(tf_col)
-            sql = {"sql": sql, "output_table_name": tf_table_name}
-            sqls.append(sql)
+        sql = {"sql": sql, "output_table_name": colname_to_tf_tablename(tf_col)}
+        sqls.append(sql)
 
     sql = _join_tf_to_input_df_sql(linker)
     sql = {
         "sql": sql,
-        "output_table_name": "__splink__df_concat_with_tf",
+        "output_table_name": output_table_name,
     }
     sqls.append(sql)
 
     return sqls
 
 
+def write_tf_tables_manifest(output_dir, manifest: dict):
+    with open(Path(output_dir) / TF_TABLES_MANIFEST_FILENAME, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def read_tf_tables_manifest(input_dir) -> dict:
+    path = Path(input_dir) / TF_TABLES_MANIFEST_FILENAME
+    if not path.exists():
+        raise SplinkException(
+            f"No term frequency tables found in {input_dir}: {path} does not "
+            "exist.  Term frequency tables can be saved using "
+            "`linker.save_tf_tables()`"
+        )
+    with open(path) as f:
+        manifest = json.load(f)
+
+    format_version = manifest.get("format_version")
+    if format_version != TF_TABLES_FORMAT_VERSION:
+        raise SplinkException(
+            f"The term frequency tables in {input_dir} were saved in format version "
+            f"{format_version}, but this version of Splink reads version "
+            f"{TF_TABLES_FORMAT_VERSION}.  Please save them again."
+        )
+    return manifest
+
+
+def read_saved_tf_table(input_dir, table: dict):
+    # `table` is an entry in the `tables` list of the manifest
+    return read_parquet(Path(input_dir) / table["file"])
+
+
 def compute_term_frequencies_from_concat_with_tf(linker: "Linker"):
     """If __splink__df_concat_with_tf already exists in your database,
     reverse engineer the underlying tf tables.
@@ -220,16 +665,15 @@ def tf_adjustment_chart(
         if cl["has_tf_adjustments"]
     ]
 
+    def tf_values_and_frequencies(tf_col):
+        # Term frequency tables may contain other columns, such as the value counts
+        col = InputColumn(tf_col, settings_obj=linker._settings_obj).unquote()
+        df_tf = linker.compute_tf_table(tf_col).as_pandas_dataframe()
+        return df_tf[[col.name(), col.tf_name()]]
+
     # Add data ("df_tf") to each level
     c = [
-        dict(
-            cl,
-            **{
-                "df_tf": linker.compute_tf_table(
-                    cl["tf_adjustment_column"]
-                ).as_pandas_dataframe()
-            },
-        )
+        dict(cl, **{"df_tf": tf_values_and_frequencies(cl["tf_adjustment_column"])})
         for cl in c
     ]
 
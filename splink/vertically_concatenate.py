@@ -27,9 +27,17 @@ def vertically_concatenate_sql(linker: Linker) -> str:
 
     # Use column order from first table in dict
     df_obj = next(iter(linker._input_tables_dict.values()))
-    columns = df_obj.columns_escaped
+    columns = df_obj.columns
 
-    select_columns_sql = ", ".join(columns)
+    settings_obj = linker._settings_obj_
+    if settings_obj is not None and settings_obj._project_input_columns:
+        # Only select the columns used by the model.  Where the inputs are lazy
+        # scans of files, e.g. read_parquet() in DuckDB, this means the other
+        # columns are never read
+        used_by_model = [c.lower() for c in settings_obj._columns_used_by_model]
+        columns = [c for c in columns if c.unquote().name().lower() in used_by_model]
+
+    select_columns_sql = ", ".join([c.name() for c in columns])
 
     salting_reqiured = False
 
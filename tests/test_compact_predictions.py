@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from splink.compact_predictions import unpack_gamma
+
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
+
+
+@mark_with_dialects_excluding()
+def test_compact_predictions_round_trip(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = get_settings_dict()
+    settings["comparisons"] = [
+        helper.cl.exact_match("first_name", term_frequency_adjustments=True),
+        helper.cl.levenshtein_at_thresholds("surname", [1, 2]),
+        helper.cl.exact_match("dob"),
+        helper.cl.exact_match("city"),
+    ]
+    settings["blocking_rules_to_generate_predictions"] = [
+        "l.surname = r.surname",
+        "l.dob = r.dob",
+    ]
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+
+    sort_cols = ["unique_id_l", "unique_id_r"]
+    df_full = linker.predict().as_pandas_dataframe()
+    df_full = df_full.sort_values(sort_cols).reset_index(drop=True)
+
+    df_compact = linker.predict(compact_output=True)
+    df_compact_pd = df_compact.as_pandas_dataframe()
+    assert list(df_compact_pd.columns) == [
+        "unique_id_l",
+        "unique_id_r",
+        "match_weight",
+        "gamma_packed",
+        "match_key",
+    ]
+    df_compact_pd = df_compact_pd.sort_values(sort_cols).reset_index(drop=True)
+    assert df_compact_pd["match_weight"].to_numpy() == pytest.approx(
+        df_full["match_weight"].to_numpy(), abs=1e-4
+    )
+
+    for packed, (_, row) in zip(df_compact_pd["gamma_packed"], df_full.iterrows()):
+        for gamma_col, value in unpack_gamma(packed, linker._settings_obj).items():
+            assert row[gamma_col] == value
+
+    df_decoded = df_compact.decode_compact_predictions().as_pandas_dataframe()
+    df_decoded = df_decoded.sort_values(sort_cols).reset_index(drop=True)
+
+    assert set(df_decoded.columns) == set(df_full.columns)
+    pd.testing.assert_series_equal(df_full["match_weight"], df_decoded["match_weight"])
+    for cc in linker._settings_obj.comparisons:
+        col = cc._gamma_column_name
+        pd.testing.assert_series_equal(df_full[col], df_decoded[col], check_dtype=False)
+
+
+def test_compact_predictions_charts(tmp_path):
+    from splink.duckdb.linker import DuckDBLinker
+
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = get_settings_dict()
+    settings["retain_matching_columns"] = False
+    settings["retain_intermediate_calculation_columns"] = False
+
+    linker = DuckDBLinker(df, settings)
+    linker.compute_tf_table("first_name")
+    df_compact = linker.predict(compact_output=True)
+
+    with pytest.raises(ValueError):
+        linker.waterfall_chart(df_compact.as_record_dict(limit=2))
+
+    records = df_compact.decode_compact_predictions().as_record_dict(limit=2)
+    linker.waterfall_chart(records)
+
+    linker.comparison_viewer_dashboard(df_compact, tmp_path / "scv.html")
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from splink.duckdb.linker import DuckDBLinker
+
+from .basic_settings import get_settings_dict
+
+df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+sort_cols = ["unique_id_l", "unique_id_r"]
+
+
+def _executed_templated_names(linker):
+    cache = linker._intermediate_table_cache
+    return [df.templated_name for df in cache.executed_queries]
+
+
+def test_predict_reuses_stored_comparison_vectors():
+    settings = get_settings_dict()
+    settings["cache_comparison_vectors"] = True
+    linker = DuckDBLinker(df, settings)
+
+    df_first = linker.predict().as_pandas_dataframe()
+    assert "__splink__df_comparison_vectors" in _executed_templated_names(linker)
+
+    # A parameter change only requires the comparison vectors to be re-scored
+    linker._settings_obj._probability_two_random_records_match = 0.001
+    linker._intermediate_table_cache.reset_executed_queries_tracker()
+    df_rescored = linker.predict().as_pandas_dataframe()
+    assert _executed_templated_names(linker) == ["__splink__df_predict"]
+
+    assert len(df_first) == len(df_rescored)
+    assert (df_rescored["match_weight"] < df_first["match_weight"]).all()
+
+    # Threshold sweeps share comparison vectors with one another
+    linker.predict(threshold_match_probability=0.5)
+    linker._intermediate_table_cache.reset_executed_queries_tracker()
+    df_thresholded = linker.predict(threshold_match_probability=0.9)
+    assert "__splink__df_comparison_vectors" not in _executed_templated_names(linker)
+    assert (df_thresholded.as_pandas_dataframe()["match_probability"] >= 0.9).all()
+
+
+def test_stored_comparison_vectors_give_same_predictions():
+    settings = get_settings_dict()
+    linker = DuckDBLinker(df, settings)
+    df_expected = linker.predict().as_pandas_dataframe()
+    df_expected = df_expected.sort_values(sort_cols).reset_index(drop=True)
+
+    settings["cache_comparison_vectors"] = True
+    linker = DuckDBLinker(df, settings)
+    linker.predict()
+    df_actual = linker.predict().as_pandas_dataframe()
+    df_actual = df_actual.sort_values(sort_cols).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(df_expected, df_actual)
+
+
+def test_em_sessions_share_comparison_vectors():
+    linker = DuckDBLinker(df, get_settings_dict())
+    linker._initialise_df_concat_with_tf()
+
+    # Sessions for different blocking rules read their comparison vectors from
+    # a single stored table, so blocking is only run once
+    linker._intermediate_table_cache.reset_executed_queries_tracker()
+    sessions = linker.train_em_sessions(["l.dob = r.dob", "l.surname = r.surname"])
+    executed = _executed_templated_names(linker)
+    assert executed.count("__splink__df_comparison_vectors") == 1
+    assert "__splink__df_blocked" not in executed
+    assert len(sessions) == 2
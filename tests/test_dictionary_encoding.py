@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from splink.dictionary_encoding import dictionary_encode_sql_condition
+from splink.duckdb.linker import DuckDBLinker
+from splink.input_column import InputColumn
+
+from .basic_settings import get_settings_dict
+
+df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+
+def _predict(settings, retain_matching_columns):
+    settings = {
+        **settings,
+        "retain_matching_columns": retain_matching_columns,
+        "blocking_rules_to_generate_predictions": [
+            "l.surname = r.surname",
+            "l.dob = r.dob and substr(l.first_name, 1, 1) = substr(r.first_name, 1, 1)",
+        ],
+    }
+    linker = DuckDBLinker(df, settings)
+    df_predict = linker.predict().as_pandas_dataframe()
+    return linker, df_predict.sort_values(["unique_id_l", "unique_id_r"])
+
+
+@pytest.mark.parametrize("retain_matching_columns", [True, False])
+def test_dictionary_encoding_gives_same_predictions(retain_matching_columns):
+    settings = get_settings_dict()
+    _, df_plain = _predict(settings, retain_matching_columns)
+
+    settings["dictionary_encode_columns"] = True
+    linker, df_encoded = _predict(settings, retain_matching_columns)
+
+    encoded_names = [
+        c.unquote().name() for c in linker._settings_obj._columns_to_dictionary_encode
+    ]
+    assert set(encoded_names) == {
+        "first_name",
+        "surname",
+        "dob",
+        "email",
+        "city",
+    }
+
+    concat_with_tf = linker._initialise_df_concat_with_tf()
+    concat_cols = [c.unquote().name() for c in concat_with_tf.columns]
+    assert "__splink_code_surname" in concat_cols
+
+    # Raw values are not carried through blocking unless they're retained
+    if not retain_matching_columns:
+        assert "surname_l" not in df_encoded.columns
+
+    pd.testing.assert_series_equal(
+        df_plain["match_weight"].reset_index(drop=True),
+        df_encoded["match_weight"].reset_index(drop=True),
+    )
+    assert list(df_plain["match_key"]) == list(df_encoded["match_key"])
+
+
+def test_dictionary_encoding_new_records():
+    settings = get_settings_dict()
+    settings["dictionary_encode_columns"] = True
+    linker = DuckDBLinker(df, settings)
+    linker.compute_tf_table("first_name")
+    linker.predict()
+
+    record = df.iloc[1].to_dict()
+    matches = linker.find_matches_to_new_records(
+        [record], blocking_rules=["l.surname = r.surname"]
+    ).as_pandas_dataframe()
+    assert (matches["unique_id_l"] == record["unique_id"]).any()
+
+    comparison = linker.compare_two_records(record, record).as_pandas_dataframe()
+    assert comparison["gamma_surname"][0] == 1
+
+
+def test_dictionary_encoding_with_partial_tf_table():
+    settings = get_settings_dict()
+    settings["dictionary_encode_columns"] = True
+    linker = DuckDBLinker(df, settings)
+
+    # A user supplied lookup need not contain every value of the column
+    tf_lookup = pd.DataFrame({"first_name": ["Robert"], "tf_first_name": [0.01]})
+    linker.register_term_frequency_lookup(tf_lookup, "first_name")
+
+    concat_with_tf = linker._initialise_df_concat_with_tf().as_pandas_dataframe()
+    first_names = concat_with_tf[concat_with_tf["first_name"].notnull()]
+    assert first_names["__splink_code_first_name"].notnull().all()
+    assert (
+        first_names.groupby("first_name")["__splink_code_first_name"].nunique() == 1
+    ).all()
+    assert (
+        first_names["__splink_code_first_name"].nunique()
+        == first_names["first_name"].nunique()
+    )
+
+
+def _fresh_encoded_linker():
+    settings = get_settings_dict()
+    settings["dictionary_encode_columns"] = True
+    settings["blocking_rules_to_generate_predictions"] = ["l.surname = r.surname"]
+    return DuckDBLinker(df, settings)
+
+
+def test_dictionary_encoding_train_em_sessions():
+    # Training rules use columns which are not encoded, and the training copies
+    # must use the same codes as the main linker's __splink__df_concat_with_tf
+    linker = _fresh_encoded_linker()
+    linker.train_em_sessions(['l."group" = r."group"', "l.dob = r.dob"])
+
+    encoded_names = [
+        c.unquote().name() for c in linker._settings_obj._columns_to_dictionary_encode
+    ]
+    assert "group" not in encoded_names
+
+
+def test_dictionary_encoding_estimate_m_from_label_column():
+    linker = _fresh_encoded_linker()
+    linker.estimate_m_from_label_column("group")
+    linker.predict()
+
+
+def test_dictionary_encode_sql_condition():
+    cols = [InputColumn("surname"), InputColumn("first_name")]
+
+    sql = "l.surname = r.surname and levenshtein(l.dob, r.dob) < 2"
+    assert dictionary_encode_sql_condition(sql, cols, "duckdb") == (
+        "l.__splink_code_surname = r.__splink_code_surname "
+        "AND LEVENSHTEIN(l.dob, r.dob) < 2"
+    )
+
+    sql = "first_name_l = first_name_r and surname_r = surname_l"
+    assert dictionary_encode_sql_condition(sql, cols, "duckdb") == (
+        "__splink_code_first_name_l = __splink_code_first_name_r "
+        "AND __splink_code_surname_r = __splink_code_surname_l"
+    )
+
+    # Equalities on expressions or unencoded columns are left untouched
+    sql = "substr(l.surname, 1, 2) = substr(r.surname, 1, 2) and l.dob = r.dob"
+    assert dictionary_encode_sql_condition(sql, cols, "duckdb") == sql
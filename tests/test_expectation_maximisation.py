@@ -1,10 +1,16 @@
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
 
 import splink.duckdb.comparison_library as cl
 from splink.duckdb.linker import DuckDBLinker
+from splink.em_training_session import EMTrainingSession
 from splink.exceptions import EMTrainingException
 
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
+
 
 def test_clear_error_when_empty_block():
     data = [
@@ -96,3 +102,308 @@ def test_estimate_without_term_frequencies():
 
     for r in compare.to_dict(orient="records"):
         assert r["m_probability_e"] == pytest.approx(r["m_probability_a"])
+
+
+def test_estimate_without_term_frequencies_runs_in_memory():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            cl.exact_match("first_name"),
+            cl.levenshtein_at_thresholds("surname", 2),
+            cl.exact_match("email"),
+        ],
+    }
+
+    linker = DuckDBLinker(df, settings)
+    linker._intermediate_table_cache.reset_executed_queries_tracker()
+    session = linker.estimate_parameters_using_expectation_maximisation(
+        blocking_rule="l.dob = r.dob",
+        estimate_without_term_frequencies=True,
+    )
+
+    # The agreement pattern counts are queried once, and EM iterations then run
+    # in memory rather than against the backend
+    executed = [
+        df.templated_name for df in linker._intermediate_table_cache.executed_queries
+    ]
+    assert executed.count("__splink__agreement_pattern_counts") == 1
+    assert "__splink__m_u_counts" not in executed
+    assert len(session._lambda_history_records) > 2
+
+
+@mark_with_dialects_excluding()
+def test_em_acceleration(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    sessions = {}
+    params = {}
+    for em_acceleration in [None, "squarem"]:
+        settings = get_settings_dict()
+        settings["max_iterations"] = 100
+        settings["em_convergence"] = 1e-6
+        if em_acceleration:
+            settings["em_acceleration"] = em_acceleration
+
+        linker = helper.Linker(df, settings, **helper.extra_linker_args())
+        sessions[
+            em_acceleration
+        ] = linker.estimate_parameters_using_expectation_maximisation("l.dob = r.dob")
+        params[em_acceleration] = pd.DataFrame(
+            linker._settings_obj._parameters_as_detailed_records
+        )
+
+    # The log likelihood is only computed to accept or reject extrapolations
+    assert sessions[None]._log_likelihood_history_records == []
+    accelerated_ll = [
+        r["log_likelihood"] for r in sessions["squarem"]._log_likelihood_history_records
+    ]
+
+    # Neither EM steps nor accepted extrapolations decrease the likelihood
+    assert all(b >= a - 1e-6 for a, b in zip(accelerated_ll, accelerated_ll[1:]))
+
+    assert len(accelerated_ll) < len(sessions[None]._settings_obj_history)
+    assert params["squarem"]["m_probability"].to_numpy() == pytest.approx(
+        params[None]["m_probability"].to_numpy(), abs=1e-3, nan_ok=True
+    )
+
+
+def test_em_acceleration_log_likelihood_with_zero_m_probability():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            cl.exact_match("first_name"),
+            cl.levenshtein_at_thresholds("surname", 2),
+            cl.exact_match("email"),
+        ],
+        "em_acceleration": "squarem",
+        "max_iterations": 6,
+    }
+    linker = DuckDBLinker(df, settings)
+
+    def log_likelihoods(estimate_without_term_frequencies):
+        session = EMTrainingSession(
+            linker,
+            "l.dob = r.dob",
+            estimate_without_term_frequencies=estimate_without_term_frequencies,
+        )
+        # Pairs with an exact match on email have a zero m term, so their
+        # likelihood is given by the u term alone
+        email_cc = session._settings_obj._get_comparison_by_output_column_name("email")
+        email_cc.comparison_levels[1].m_probability = 0.0
+        session._train()
+        return [r["log_likelihood"] for r in session._log_likelihood_history_records]
+
+    # Without term frequency adjustments, the log likelihood computed in sql
+    # matches that computed in memory from the agreement pattern counts
+    assert log_likelihoods(False) == pytest.approx(log_likelihoods(True))
+
+
+@pytest.mark.parametrize("dictionary_encode_columns", [False, True])
+def test_train_em_sessions_matches_separate_sessions(dictionary_encode_columns):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    blocking_rules = [
+        "l.first_name = r.first_name and l.surname = r.surname",
+        "l.dob = r.dob",
+        "l.email = r.email",
+    ]
+
+    linker_separate = DuckDBLinker(df, get_settings_dict())
+    for br in blocking_rules:
+        linker_separate.estimate_parameters_using_expectation_maximisation(br)
+
+    settings = get_settings_dict()
+    settings["dictionary_encode_columns"] = dictionary_encode_columns
+    linker_shared = DuckDBLinker(df, settings)
+    cache = linker_shared._intermediate_table_cache
+    cache.reset_executed_queries_tracker()
+    sessions = linker_shared.train_em_sessions(blocking_rules)
+
+    # Record pairs are blocked and compared in a single pass
+    executed = [t.templated_name for t in cache.executed_queries]
+    assert executed.count("__splink__df_comparison_vectors") == 1
+
+    assert len(sessions) == len(blocking_rules)
+    assert linker_shared._em_training_sessions == sessions
+
+    settings_separate = linker_separate._settings_obj.as_dict()
+    settings_shared = linker_shared._settings_obj.as_dict()
+    for cc_separate, cc_shared in zip(
+        settings_separate["comparisons"], settings_shared["comparisons"]
+    ):
+        for cl_separate, cl_shared in zip(
+            cc_separate["comparison_levels"], cc_shared["comparison_levels"]
+        ):
+            assert cl_shared.get("m_probability") == pytest.approx(
+                cl_separate.get("m_probability")
+            )
+
+
+@mark_with_dialects_excluding()
+def test_em_sample_pairs(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    blocking_rule = "l.city = r.city"
+
+    def train(sample_pairs):
+        linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+        linker.estimate_parameters_using_expectation_maximisation(
+            blocking_rule, sample_pairs=sample_pairs
+        )
+        return linker._settings_obj
+
+    settings_full = train(None)
+    settings_sampled = train(3_000)
+
+    # The weighted sample matches the agreement pattern counts of the full set of
+    # pairs, so only the term frequency adjustments to first_name are sampled
+    for cc_full, cc_sampled in zip(
+        settings_full.comparisons, settings_sampled.comparisons
+    ):
+        for cl_full, cl_sampled in zip(
+            cc_full._comparison_levels_excluding_null,
+            cc_sampled._comparison_levels_excluding_null,
+        ):
+            assert cl_sampled.m_probability == pytest.approx(
+                cl_full.m_probability, abs=0.01
+            )
+    assert settings_sampled._probability_two_random_records_match == pytest.approx(
+        settings_full._probability_two_random_records_match, rel=0.05
+    )
+
+
+@mark_with_dialects_excluding("sqlite")
+def test_em_sample_pairs_seeded(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    def train(seed):
+        linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+        linker.estimate_parameters_using_expectation_maximisation(
+            "l.city = r.city", sample_pairs=3_000, seed=seed
+        )
+        return [
+            cl.m_probability
+            for cc in linker._settings_obj.comparisons
+            for cl in cc._comparison_levels_excluding_null
+        ]
+
+    assert train(1) == pytest.approx(train(1), abs=1e-12)
+
+
+def test_em_comparisons_to_train():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    linker = DuckDBLinker(df, get_settings_dict())
+    cache = linker._intermediate_table_cache
+    cache.reset_executed_queries_tracker()
+    session = linker.estimate_parameters_using_expectation_maximisation(
+        "l.dob = r.dob", comparisons_to_train=["first_name", "email"]
+    )
+
+    trained = [cc._output_column_name for cc in session._settings_obj.comparisons]
+    assert trained == ["first_name", "email"]
+
+    # The other comparisons are not computed
+    sqls = [
+        t.sql_used_to_create
+        for t in cache.executed_queries
+        if t.templated_name == "__splink__df_comparison_vectors"
+    ]
+    assert len(sqls) == 1
+    assert "gamma_first_name" in sqls[0]
+    assert "gamma_surname" not in sqls[0]
+
+    for cc in linker._settings_obj.comparisons:
+        for level in cc._comparison_levels_excluding_null:
+            if cc._output_column_name in trained:
+                assert len(level._trained_m_probabilities) == 1
+            else:
+                assert len(level._trained_m_probabilities) == 0
+
+
+@pytest.mark.parametrize("estimate_without_term_frequencies", [False, True])
+def test_em_incremental(tmp_path, estimate_without_term_frequencies):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    blocking_rule = "l.dob = r.dob"
+
+    linker = DuckDBLinker(df, get_settings_dict())
+    linker.estimate_parameters_using_expectation_maximisation(
+        blocking_rule,
+        estimate_without_term_frequencies=estimate_without_term_frequencies,
+    )
+    statistics = linker._settings_obj._get_em_sufficient_statistics(blocking_rule)
+    assert statistics["pair_count"] > 0
+
+    # The statistics are saved with the model
+    path = tmp_path / "model.json"
+    linker.save_model_to_json(path)
+    linker_incremental = DuckDBLinker(df, str(path))
+
+    # Training again on the same data, starting from the converged parameters,
+    # leaves the parameters unchanged, and the statistics are combined
+    linker_incremental.estimate_parameters_using_expectation_maximisation(
+        blocking_rule,
+        estimate_without_term_frequencies=estimate_without_term_frequencies,
+        incremental=True,
+    )
+    combined = linker_incremental._settings_obj._get_em_sufficient_statistics(
+        blocking_rule
+    )
+    assert combined["pair_count"] == pytest.approx(2 * statistics["pair_count"])
+
+    settings = linker._settings_obj.as_dict()
+    settings_incremental = linker_incremental._settings_obj.as_dict()
+    for cc, cc_incremental in zip(
+        settings["comparisons"], settings_incremental["comparisons"]
+    ):
+        for level, level_incremental in zip(
+            cc["comparison_levels"], cc_incremental["comparison_levels"]
+        ):
+            assert level_incremental.get("m_probability") == pytest.approx(
+                level.get("m_probability"), abs=1e-3
+            )
+
+
+def test_em_incremental_statistics_after_rejected_extrapolation(tmp_path):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    blocking_rule = "l.dob = r.dob"
+
+    settings = get_settings_dict()
+    settings["em_acceleration"] = "squarem"
+    settings["max_iterations"] = 3
+    linker = DuckDBLinker(df, settings)
+    linker.estimate_parameters_using_expectation_maximisation(blocking_rule)
+    path = tmp_path / "model.json"
+    linker.save_model_to_json(path)
+
+    # Extrapolating to the first iterate always decreases the likelihood, so the
+    # extrapolation in the final iteration is rejected
+    linker_incremental = DuckDBLinker(df, str(path))
+    with patch(
+        "splink.expectation_maximisation.squarem_extrapolation",
+        side_effect=lambda theta_0, theta_1, theta_2: theta_0,
+    ) as extrapolation:
+        linker_incremental.estimate_parameters_using_expectation_maximisation(
+            blocking_rule, incremental=True
+        )
+    extrapolation.assert_called_once()
+
+    # The statistics saved with the model are those of the saved parameters
+    settings_obj = linker_incremental._settings_obj
+    statistics = settings_obj._get_em_sufficient_statistics(blocking_rule)
+    m_counts = pd.DataFrame(statistics["m_u_counts"])
+    for cc in settings_obj.comparisons:
+        cc_counts = m_counts[m_counts["output_column_name"] == cc._output_column_name]
+        if cc_counts.empty:
+            continue
+        m_counts_by_level = cc_counts.set_index("comparison_vector_value")["m_count"]
+        levels = cc._comparison_levels_excluding_null
+        level_m_counts = [
+            m_counts_by_level[cl._comparison_vector_value] for cl in levels
+        ]
+        for level, m_count in zip(levels, level_m_counts):
+            assert level.m_probability == pytest.approx(m_count / sum(level_m_counts))
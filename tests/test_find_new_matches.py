@@ -3,7 +3,7 @@ from copy import deepcopy
 import pandas as pd
 
 from .basic_settings import get_settings_dict
-from .decorator import mark_with_dialects_excluding
+from .decorator import mark_with_dialects_excluding, mark_with_dialects_including
 
 df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
 
@@ -109,3 +109,36 @@ def test_matches_work(test_helpers, dialect):
 
     matches = matches.as_pandas_dataframe()
     assert len(matches) == 2
+
+
+@mark_with_dialects_including("duckdb", "spark", pass_dialect=True)
+def test_register_records(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+
+    # Records may have missing keys, and columns which are entirely null
+    records = [
+        {"unique_id": 1, "first_name": "Eliza", "surname": None, "tokens": ["a"]},
+        {"unique_id": 2, "first_name": None, "surname": None},
+    ]
+    registered = linker.register_table(records, "__splink__test_records")
+    actual = registered.as_pandas_dataframe().sort_values("unique_id")
+    assert list(actual.columns) == ["unique_id", "first_name", "surname", "tokens"]
+    assert list(actual["unique_id"]) == [1, 2]
+    assert actual["first_name"][0] == "Eliza"
+    assert pd.isnull(actual["first_name"][1])
+    assert actual["surname"].isnull().all()
+    assert list(actual["tokens"][0]) == ["a"]
+
+    columns = linker.register_table(
+        {"unique_id": [1, 2], "first_name": ["Eliza", None]},
+        "__splink__test_records",
+        overwrite=True,
+    ).columns
+    assert [c.unquote().name() for c in columns] == ["unique_id", "first_name"]
+
+    linker.compute_tf_table("first_name")
+    record_2 = dict(record, first_name=None)
+    comparison = linker.compare_two_records(record, record_2).as_pandas_dataframe()
+    assert comparison["gamma_first_name"][0] == -1
+    assert comparison["gamma_surname"][0] == 1
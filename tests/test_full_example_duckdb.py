@@ -9,6 +9,7 @@ import pytest
 import splink.duckdb.comparison_level_library as cll
 import splink.duckdb.comparison_library as cl
 from splink.duckdb.linker import DuckDBLinker
+from splink.exceptions import SplinkException
 
 from .basic_settings import get_settings_dict, name_comparison
 from .decorator import mark_with_dialects_including
@@ -227,6 +228,53 @@ def test_duckdb_load_from_file(df):
     assert len(linker.predict().as_pandas_dataframe()) == 7257
 
 
+@mark_with_dialects_including("duckdb")
+def test_duckdb_project_input_columns(tmp_path):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    path = os.path.join(tmp_path, "fake_1000.parquet")
+    df.to_parquet(path)
+
+    settings = get_settings_dict()
+    settings["comparisons"] = settings["comparisons"][:3]
+    settings["additional_columns_to_retain"] = []
+    settings["blocking_rules_to_generate_predictions"] = [
+        "l.surname = r.surname",
+        "l.email = r.email",
+    ]
+
+    sort_cols = ["unique_id_l", "unique_id_r"]
+    linker = DuckDBLinker(path, settings)
+    expected = linker.predict().as_pandas_dataframe().sort_values(sort_cols)
+
+    settings["project_input_columns"] = True
+    linker = DuckDBLinker(path, settings)
+    actual = linker.predict().as_pandas_dataframe().sort_values(sort_cols)
+
+    # Only the columns used by comparisons and blocking rules are read
+    concat_with_tf = linker._initialise_df_concat_with_tf()
+    assert {c.unquote().name() for c in concat_with_tf.columns} == {
+        "unique_id",
+        "first_name",
+        "surname",
+        "dob",
+        "email",
+        "tf_first_name",
+    }
+    pd.testing.assert_frame_equal(
+        expected.reset_index(drop=True), actual.reset_index(drop=True)
+    )
+
+    # Training on a column not used by the model needs it to be retained
+    with pytest.raises(SplinkException, match="additional_columns_to_retain"):
+        linker.estimate_parameters_using_expectation_maximisation("l.city = r.city")
+    with pytest.raises(SplinkException, match="additional_columns_to_retain"):
+        linker.train_em_sessions(["l.surname = r.surname", "l.city = r.city"])
+
+    settings["additional_columns_to_retain"] = ["city"]
+    linker = DuckDBLinker(path, settings)
+    linker.estimate_parameters_using_expectation_maximisation("l.city = r.city")
+
+
 @mark_with_dialects_including("duckdb")
 def test_duckdb_arrow_array():
     # Checking array fixes problem identified here:
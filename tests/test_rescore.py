@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from splink.exceptions import SplinkException
+
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
+
+sort_cols = ["unique_id_l", "unique_id_r"]
+
+
+@mark_with_dialects_excluding()
+def test_rescore_matches_predict(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = get_settings_dict()
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    df_predict = linker.predict()
+
+    # Change the parameters of the model
+    linker._settings_obj._probability_two_random_records_match = 0.01
+    for cc in linker._settings_obj.comparisons:
+        for cl in cc._comparison_levels_excluding_null:
+            cl.m_probability = cl.m_probability * 0.9
+
+    df_expected = linker.predict(threshold_match_weight=-2).as_pandas_dataframe()
+    df_expected = df_expected.sort_values(sort_cols).reset_index(drop=True)
+
+    df_rescored = linker.rescore(df_predict, threshold_match_weight=-2)
+    df_rescored = df_rescored.as_pandas_dataframe()
+    df_rescored = df_rescored.sort_values(sort_cols).reset_index(drop=True)
+
+    assert list(df_rescored.columns) == list(df_expected.columns)
+    pd.testing.assert_frame_equal(df_expected, df_rescored, check_dtype=False)
+
+
+def test_rescore_requires_comparison_vectors():
+    from splink.duckdb.linker import DuckDBLinker
+
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = get_settings_dict()
+    settings["retain_intermediate_calculation_columns"] = False
+    linker = DuckDBLinker(df, settings)
+    df_predict = linker.predict()
+
+    with pytest.raises(SplinkException, match="tf_first_name_l"):
+        linker.rescore(df_predict)
+
+    # Retained input columns are only output where present in the input
+    settings["retain_intermediate_calculation_columns"] = True
+    settings["additional_columns_to_retain"] = []
+    linker = DuckDBLinker(df, settings)
+    df_predict = linker.predict()
+
+    linker._settings_obj._additional_columns_to_retain_list = ["group"]
+    df_rescored = linker.rescore(df_predict).as_pandas_dataframe()
+    assert "group_l" not in df_rescored.columns
+    assert "first_name_l" in df_rescored.columns
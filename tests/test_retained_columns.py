@@ -0,0 +1,49 @@
+import pandas as pd
+
+from splink.duckdb.linker import DuckDBLinker
+
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
+
+sort_cols = ["unique_id_l", "unique_id_r"]
+
+
+@mark_with_dialects_excluding()
+def test_thresholded_predict_joins_retained_columns(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = get_settings_dict()
+    settings["additional_columns_to_retain"] = ["group", "email"]
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+
+    df_full = linker.predict().as_pandas_dataframe()
+    df_full = df_full[df_full["match_weight"] >= 2]
+    df_full = df_full.sort_values(sort_cols).reset_index(drop=True)
+
+    df_thresholded = linker.predict(threshold_match_weight=2).as_pandas_dataframe()
+    df_thresholded = df_thresholded.sort_values(sort_cols).reset_index(drop=True)
+
+    assert list(df_thresholded.columns) == list(df_full.columns)
+    pd.testing.assert_frame_equal(df_full, df_thresholded, check_dtype=False)
+
+
+def test_retained_columns_not_carried_through_blocking():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = get_settings_dict()
+    settings["additional_columns_to_retain"] = ["group"]
+    linker = DuckDBLinker(df, settings)
+    linker.debug_mode = True
+
+    df_predict = linker.predict(threshold_match_probability=0.5)
+    assert "group_l" in [c.unquote().name() for c in df_predict.columns]
+
+    blocked = linker._intermediate_table_cache["__splink__df_blocked"]
+    blocked_cols = [c.unquote().name() for c in blocked.columns]
+    assert "group_l" not in blocked_cols
+    assert "first_name_l" in blocked_cols
+
+    # Without a threshold, retained columns are carried as before
+    linker.predict()
+    blocked = linker._intermediate_table_cache["__splink__df_blocked"]
+    assert "group_l" in [c.unquote().name() for c in blocked.columns]
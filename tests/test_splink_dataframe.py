@@ -0,0 +1,112 @@
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from splink.duckdb.linker import DuckDBLinker
+
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
+
+
+@mark_with_dialects_excluding()
+def test_arrow_retrieval(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+    df_concat = linker._initialise_df_concat(materialise=True)
+    colnames = [c.unquote().name() for c in df_concat.columns]
+
+    records = df_concat.as_record_dict()
+    assert len(records) == 1000
+    assert list(records[0].keys()) == colnames
+    records = sorted(records, key=lambda r: r["unique_id"])
+    assert df_concat.as_record_dict(limit=3)[0].keys() == records[0].keys()
+
+    arrow_table = df_concat.as_arrow()
+    assert isinstance(arrow_table, pa.Table)
+    assert arrow_table.column_names == colnames
+    assert arrow_table.num_rows == 1000
+    assert df_concat.as_arrow(limit=5).num_rows == 5
+
+    batches = list(df_concat.iter_batches(batch_size=300))
+    assert all(isinstance(b, pa.RecordBatch) for b in batches)
+    assert [b.num_rows for b in batches] == [300, 300, 300, 100]
+
+    batched_records = [r for b in batches for r in b.to_pylist()]
+    batched_records = sorted(batched_records, key=lambda r: r["unique_id"])
+    assert batched_records == records
+
+
+@mark_with_dialects_excluding()
+def test_iter_batches_with_leading_nulls(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+    df_concat = linker._initialise_df_concat(materialise=True)
+
+    # Columns which are null throughout the leading batches
+    sql = """
+    select
+        unique_id,
+        case when unique_id >= 500 then surname end as late_surname,
+        case when unique_id >= 500 then cast(unique_id as double) end as late_number
+    from __splink__df_concat
+    order by unique_id
+    """
+    linker._enqueue_sql(sql, "__splink__df_late_values")
+    df_late = linker._execute_sql_pipeline([df_concat])
+
+    batches = list(df_late.iter_batches(batch_size=100))
+    assert len({b.schema for b in batches}) == 1
+
+    table = pa.Table.from_batches(batches)
+    assert table.num_rows == 1000
+    assert pa.types.is_string(table.schema.field("late_surname").type)
+    assert pa.types.is_floating(table.schema.field("late_number").type)
+
+
+@mark_with_dialects_excluding()
+def test_columns_of_empty_table(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    linker = helper.Linker(df, get_settings_dict(), **helper.extra_linker_args())
+    df_concat = linker._initialise_df_concat(materialise=True)
+
+    sql = "select unique_id, first_name from __splink__df_concat where 1 = 0"
+    linker._enqueue_sql(sql, "__splink__df_empty")
+    df_empty = linker._execute_sql_pipeline([df_concat])
+
+    assert df_empty.as_record_dict() == []
+    assert [c.unquote().name() for c in df_empty.columns] == [
+        "unique_id",
+        "first_name",
+    ]
+
+    # The schema is cached, so is not looked up again
+    df_empty._get_columns = None
+    assert len(df_empty.columns) == 2
+
+
+def test_duckdb_record_dict_is_json_serialisable():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    linker = DuckDBLinker(df, get_settings_dict())
+    df_concat = linker._initialise_df_concat(materialise=True)
+
+    # In DuckDB, 0.001 is a DECIMAL literal, so the proportion is a DECIMAL
+    sql = """
+    select "group", count(*) * 0.001 as proportion
+    from __splink__df_concat
+    group by "group"
+    """
+    linker._enqueue_sql(sql, "__splink__df_group_proportions")
+    df_proportions = linker._execute_sql_pipeline([df_concat])
+
+    records = df_proportions.as_record_dict()
+    assert all(isinstance(r["proportion"], float) for r in records)
+    assert sum(r["proportion"] for r in records) == pytest.approx(1.0)
+    json.dumps(records)
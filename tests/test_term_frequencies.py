@@ -1,7 +1,15 @@
+import math
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
 
 from splink.duckdb.linker import DuckDBLinker
+from splink.exceptions import SplinkException
+from splink.term_frequencies import read_tf_tables_manifest
+
+from .basic_settings import get_settings_dict
+from .decorator import mark_with_dialects_excluding
 
 
 def get_data():
@@ -216,3 +224,415 @@ def test_weightand_clamp():
     # Adjustment would be 10/5.0 = 2 if no weighting was applied
 
     assert pytest.approx(bf) == bf_no_adj * 2**0.5
+
+
+@mark_with_dialects_excluding()
+def test_tf_tables_computed_in_single_scan(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    df_pd = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.exact_match(col, term_frequency_adjustments=True)
+            for col in ["first_name", "surname", "city"]
+        ],
+        "blocking_rules_to_generate_predictions": ["l.surname = r.surname"],
+    }
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    df_concat_with_tf = linker._initialise_df_concat_with_tf().as_pandas_dataframe()
+
+    executed_queries = linker._intermediate_table_cache.executed_queries
+    grouping_sets_queries = [
+        df for df in executed_queries if "grouping sets" in df.sql_used_to_create
+    ]
+    input_tablenames = [t.physical_name for t in linker._input_tables_dict.values()]
+    input_scans = [
+        df
+        for df in executed_queries
+        if any(name in df.sql_used_to_create for name in input_tablenames)
+    ]
+    if linker._grouping_sets_supported:
+        assert len(grouping_sets_queries) == 1
+    else:
+        assert len(grouping_sets_queries) == 0
+    assert len(input_scans) == 1
+
+    for col in ["first_name", "surname", "city"]:
+        df_tf = df_concat_with_tf[[col, f"tf_{col}"]].dropna().drop_duplicates()
+        actual = df_tf.set_index(col)[f"tf_{col}"].sort_index()
+        expected = df_pd[col].value_counts(normalize=True).sort_index()
+        assert list(actual.index) == list(expected.index)
+        assert actual.to_numpy() == pytest.approx(expected.to_numpy())
+
+
+@mark_with_dialects_excluding()
+def test_update_tf_tables(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df_pd = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    # Ensure missing values are nulls, rather than NaN, in Spark
+    df_pd = df_pd.astype(object).where(df_pd.notnull(), None)
+    df_existing = helper.convert_frame(df_pd.iloc[:800])
+    df_new = df_pd.iloc[800:]
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.exact_match(col, term_frequency_adjustments=True)
+            for col in ["first_name", "surname"]
+        ],
+        "blocking_rules_to_generate_predictions": ["l.surname = r.surname"],
+    }
+    linker = helper.Linker(df_existing, settings, **helper.extra_linker_args())
+
+    # first_name from a cached tf table, surname derived from df_concat_with_tf
+    linker.compute_tf_table("first_name")
+    linker._initialise_df_concat_with_tf()
+
+    linker.update_tf_tables(df_new)
+    assert "__splink__df_concat_with_tf" not in linker._intermediate_table_cache
+
+    for col in ["first_name", "surname"]:
+        df_tf = linker.compute_tf_table(col).as_pandas_dataframe()
+        actual = df_tf.set_index(col).sort_index()
+        expected = df_pd[col].value_counts().sort_index()
+        assert list(actual.index) == list(expected.index)
+        assert list(actual["__splink__value_count"]) == list(expected)
+        assert actual[f"tf_{col}"].to_numpy() == pytest.approx(
+            (expected / expected.sum()).to_numpy()
+        )
+
+
+@mark_with_dialects_excluding()
+def test_tf_adjustment_chart(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.exact_match("first_name", term_frequency_adjustments=True),
+            helper.cl.exact_match("surname"),
+        ],
+        "blocking_rules_to_generate_predictions": ["l.surname = r.surname"],
+    }
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker.estimate_u_using_random_sampling(max_pairs=1e4)
+
+    # The term frequency table also contains the value counts
+    df_tf = linker.compute_tf_table("first_name").as_pandas_dataframe()
+    assert "__splink__value_count" in df_tf.columns
+
+    chart = linker.tf_adjustment_chart("first_name", as_dict=True)
+    values = {r["value"] for r in chart["datasets"]["data"]}
+    assert values <= set(df_tf["first_name"]) | {None}
+
+
+def test_update_tf_tables_leaves_lookup_without_counts(caplog):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [get_city_comparison()],
+    }
+    linker = DuckDBLinker(df, settings, connection=":memory:")
+
+    lookup = pd.DataFrame({"city": ["London", "Truro"], "tf_city": [0.9, 0.1]})
+    linker.register_term_frequency_lookup(lookup, "city")
+
+    linker.update_tf_tables(df.head(10))
+    assert "cannot be updated" in caplog.text
+
+    df_tf = linker.compute_tf_table("city").as_pandas_dataframe()
+    pd.testing.assert_frame_equal(df_tf, lookup)
+
+
+@mark_with_dialects_excluding()
+def test_approximate_term_frequencies(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    df_pd = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.exact_match(col, term_frequency_adjustments=True)
+            for col in ["first_name", "surname", "city"]
+        ],
+        "blocking_rules_to_generate_predictions": ["l.surname = r.surname"],
+        "approximate_term_frequency_columns": ["first_name", "surname"],
+        "approximate_term_frequency_min_count": 3,
+    }
+
+    def expected_tf(col):
+        counts = df_pd[col].value_counts()
+        tf = counts / counts.sum()
+        rare = counts < 3
+        tf[rare] = tf[rare].mean()
+        return tf.sort_index()
+
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    df_tf = linker.compute_tf_table("surname").as_pandas_dataframe()
+    # Frequent values, plus a single row for the rare values
+    assert len(df_tf) == (df_pd["surname"].value_counts() >= 3).sum() + 1
+
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    df_concat_with_tf = linker._initialise_df_concat_with_tf().as_pandas_dataframe()
+    assert len(df_concat_with_tf) == 1000
+
+    for col in ["first_name", "surname", "city"]:
+        df_col = df_concat_with_tf[[col, f"tf_{col}"]].drop_duplicates()
+        assert df_col[df_col[col].isnull()][f"tf_{col}"].isnull().all()
+        actual = df_col.dropna().set_index(col)[f"tf_{col}"].sort_index()
+        if col == "city":
+            expected = df_pd[col].value_counts(normalize=True).sort_index()
+        else:
+            expected = expected_tf(col)
+        assert list(actual.index) == list(expected.index)
+        assert actual.to_numpy() == pytest.approx(expected.to_numpy())
+
+    # Tables computed once __splink__df_concat_with_tf exists are still approximate
+    for col in ["first_name", "surname"]:
+        linker._intermediate_table_cache.pop(f"__splink__df_tf_{col}", None)
+        df_tf = linker.compute_tf_table(col).as_pandas_dataframe()
+        assert len(df_tf) == (df_pd[col].value_counts() >= 3).sum() + 1
+        assert df_tf[col].isnull().sum() == 1
+
+    linker.predict()
+
+
+@mark_with_dialects_excluding()
+def test_join_term_frequencies_after_comparison(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = get_settings_dict()
+    settings["comparisons"][4] = helper.cl.exact_match(
+        "city", term_frequency_adjustments=True
+    )
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+
+    sort_cols = ["unique_id_l", "unique_id_r"]
+    df_eager = linker.predict().as_pandas_dataframe()
+    df_eager = df_eager.sort_values(sort_cols).reset_index(drop=True)
+    df_lazy = linker.predict(
+        join_term_frequencies_after_comparison=True
+    ).as_pandas_dataframe()
+    df_lazy = df_lazy.sort_values(sort_cols).reset_index(drop=True)
+
+    assert list(df_lazy.columns) == list(df_eager.columns)
+    assert df_lazy["match_weight"].to_numpy() == pytest.approx(
+        df_eager["match_weight"].to_numpy()
+    )
+
+
+def test_term_frequencies_not_carried_through_blocking():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = get_settings_dict()
+    settings["retain_intermediate_calculation_columns"] = True
+    linker = DuckDBLinker(df, settings)
+    linker.debug_mode = True
+
+    df_predict = linker.predict(join_term_frequencies_after_comparison=True)
+    df_predict = df_predict.as_pandas_dataframe()
+
+    blocked = linker._intermediate_table_cache["__splink__df_blocked"]
+    blocked_cols = [c.unquote().name() for c in blocked.columns]
+    assert "first_name_l" in blocked_cols
+    assert "tf_first_name_l" not in blocked_cols
+
+    # Term frequencies are only looked up for exact matches on first_name
+    exact_match = df_predict["gamma_first_name"] == 2
+    assert df_predict.loc[exact_match, "tf_first_name_l"].notnull().all()
+    assert df_predict.loc[~exact_match, "tf_first_name_l"].isnull().all()
+
+    # Without the option, term frequencies are carried as before
+    linker.predict()
+    blocked = linker._intermediate_table_cache["__splink__df_blocked"]
+    assert "tf_first_name_l" in [c.unquote().name() for c in blocked.columns]
+
+
+@mark_with_dialects_excluding()
+def test_save_and_load_tf_tables(test_helpers, dialect, tmp_path):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = get_settings_dict()
+    settings["comparisons"][1] = helper.cl.exact_match(
+        "surname", term_frequency_adjustments=True
+    )
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    manifest = linker.save_tf_tables(tmp_path)
+
+    assert manifest["input_row_count"] == 1000
+    assert {t["column"] for t in manifest["tables"]} == {"first_name", "surname"}
+    assert all(t["total_count"] > 0 for t in manifest["tables"])
+    with pytest.raises(FileExistsError):
+        linker.save_tf_tables(tmp_path)
+    saved = {
+        col: linker.compute_tf_table(col).as_pandas_dataframe()
+        for col in ["first_name", "surname"]
+    }
+
+    linker_2 = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker_2.load_tf_tables(tmp_path, check_input_fingerprint=True)
+
+    for col in ["first_name", "surname"]:
+        tf_tablename = f"__splink__df_tf_{col}"
+        registered = linker_2._intermediate_table_cache[tf_tablename]
+        tf_df = linker_2.compute_tf_table(col)
+        assert tf_df.physical_name == registered.physical_name
+
+        loaded = registered.as_pandas_dataframe()
+        pd.testing.assert_frame_equal(
+            saved[col].sort_values(col).reset_index(drop=True),
+            loaded.sort_values(col).reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+def test_tf_tables_loaded_from_settings_dir(tmp_path):
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    settings = get_settings_dict()
+    DuckDBLinker(df, settings).save_tf_tables(tmp_path)
+
+    record_1 = {
+        "unique_id": 1,
+        "first_name": "Julia",
+        "surname": "Taylor",
+        "dob": "2015-10-29",
+        "city": "London",
+        "email": "hannah88@powers.com",
+        "group": 0,
+    }
+    record_2 = {**record_1, "unique_id": 2, "email": "julia@taylor.com"}
+
+    linker = DuckDBLinker(df, settings)
+    linker.compute_tf_table("first_name")
+    expected = linker.compare_two_records(record_1, record_2)
+
+    settings["term_frequency_tables_dir"] = str(tmp_path)
+    linker = DuckDBLinker(df, settings)
+    with patch(
+        "splink.linker.read_tf_tables_manifest", wraps=read_tf_tables_manifest
+    ) as mock_read_manifest:
+        actual = linker.compare_two_records(record_1, record_2)
+        linker.compare_two_records(record_1, record_2)
+        linker.load_tf_tables(tmp_path)
+        # The manifest is only read from disk once
+        mock_read_manifest.assert_called_once()
+
+    cache = linker._intermediate_table_cache
+    assert "__splink__df_concat" not in cache
+    assert "__splink__df_tf_first_name" in cache
+    assert actual.as_record_dict()[0]["match_weight"] == pytest.approx(
+        expected.as_record_dict()[0]["match_weight"]
+    )
+
+    # The saved tables were computed from different input data
+    linker = DuckDBLinker(df.head(500), settings)
+    with pytest.raises(SplinkException):
+        linker.load_tf_tables(tmp_path, check_input_fingerprint=True)
+
+    # Including input data with the same columns and number of rows
+    df_refreshed = df.copy()
+    df_refreshed.loc[0, "first_name"] = "Julia"
+    linker = DuckDBLinker(df_refreshed, settings)
+    with pytest.raises(SplinkException):
+        linker.load_tf_tables(tmp_path, check_input_fingerprint=True)
+
+
+def get_name_tokens_data():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    df = df.astype(object).where(df.notnull(), None)
+    df["name_tokens"] = [
+        [t for t in (f, s) if t is not None] or None
+        for f, s in zip(df["first_name"], df["surname"])
+    ]
+    return df[["unique_id", "name_tokens", "dob"]]
+
+
+@mark_with_dialects_excluding("sqlite")
+def test_token_frequency_adjustments(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df_pd = get_name_tokens_data()
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.array_intersect_at_sizes(
+                "name_tokens", [2, 1], token_frequency_adjustments=True
+            ),
+            helper.cl.exact_match("dob"),
+        ],
+        "blocking_rules_to_generate_predictions": ["l.dob = r.dob"],
+        "retain_intermediate_calculation_columns": True,
+    }
+    linker = helper.Linker(
+        helper.convert_frame(df_pd), settings, **helper.extra_linker_args()
+    )
+
+    # The proportion of records containing each token
+    token_counts = df_pd["name_tokens"].dropna().map(set).explode().value_counts()
+    expected_tf = token_counts / df_pd["name_tokens"].notnull().sum()
+
+    df_tf = linker.compute_token_tf_table("name_tokens").as_pandas_dataframe()
+    actual_tf = df_tf.set_index("name_tokens")["token_tf_name_tokens"].sort_index()
+    assert list(actual_tf.index) == list(expected_tf.sort_index().index)
+    assert actual_tf.to_numpy() == pytest.approx(expected_tf.sort_index().to_numpy())
+
+    levels = {
+        cl._comparison_vector_value: cl
+        for cl in linker._settings_obj.comparisons[0].comparison_levels
+    }
+    df_predict = linker.predict().as_pandas_dataframe()
+    assert (df_predict["gamma_name_tokens"] > 0).any()
+    for _, row in df_predict.iterrows():
+        gamma = row["gamma_name_tokens"]
+        if gamma > 0:
+            shared = set(row["name_tokens_l"]) & set(row["name_tokens_r"])
+            token_tf = math.prod(expected_tf[t] for t in shared)
+            assert row["token_tf_name_tokens"] == pytest.approx(token_tf)
+            assert row["bf_tf_adj_name_tokens"] == pytest.approx(
+                levels[gamma].u_probability / token_tf
+            )
+        else:
+            assert row["bf_tf_adj_name_tokens"] == 1.0
+
+
+def test_token_frequency_adjustments_real_time_and_training():
+    import splink.duckdb.comparison_library as cl
+
+    df = get_name_tokens_data()
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            cl.array_intersect_at_sizes(
+                "name_tokens", 1, token_frequency_adjustments=True
+            ),
+            cl.exact_match("dob"),
+        ],
+        "blocking_rules_to_generate_predictions": ["l.dob = r.dob"],
+    }
+    linker = DuckDBLinker(df, settings)
+    linker.estimate_u_using_random_sampling(max_pairs=1e4)
+    linker.estimate_parameters_using_expectation_maximisation("l.dob = r.dob")
+
+    df_predict = linker.predict().as_pandas_dataframe()
+    sort_cols = ["unique_id_l", "unique_id_r"]
+    df_predict = df_predict.sort_values(sort_cols).reset_index(drop=True)
+
+    df_decoded = linker.predict(compact_output=True).decode_compact_predictions()
+    df_decoded = df_decoded.as_pandas_dataframe().sort_values(sort_cols)
+    assert df_decoded["match_weight"].to_numpy() == pytest.approx(
+        df_predict["match_weight"].to_numpy()
+    )
+
+    pair = df_predict[df_predict["gamma_name_tokens"] == 1].iloc[0]
+    record_l = df[df["unique_id"] == pair["unique_id_l"]].iloc[0].to_dict()
+    record_r = df[df["unique_id"] == pair["unique_id_r"]].iloc[0].to_dict()
+
+    # A new linker with the trained model computes the token frequencies
+    linker = DuckDBLinker(df, linker._settings_obj.as_dict())
+    df_compare = linker.compare_two_records(record_l, record_r).as_pandas_dataframe()
+    assert df_compare["match_weight"][0] == pytest.approx(pair["match_weight"])
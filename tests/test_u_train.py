@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 import pytest
 
+from splink.duckdb.linker import DuckDBLinker
+from tests.basic_settings import get_settings_dict
 from tests.decorator import mark_with_dialects_excluding
 
 
@@ -259,7 +261,7 @@ def test_u_train_multilink(test_helpers, dialect):
 
 
 # No SQLite or Postgres - don't support random seed
-@mark_with_dialects_excluding("sqlite", "postgres")
+@mark_with_dialects_excluding("sqlite")
 def test_seed_u_outputs(test_helpers, dialect):
     helper = test_helpers[dialect]
     df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
@@ -285,3 +287,218 @@ def test_seed_u_outputs(test_helpers, dialect):
         linker_1._settings_obj._parameter_estimates_as_records
         != linker_3._settings_obj._parameter_estimates_as_records
     )
+
+
+# No SQLite - doesn't support random seed
+@mark_with_dialects_excluding("sqlite")
+def test_u_train_exact_match_levels_from_term_frequencies(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    path = "./tests/datasets/fake_1000_from_splink_demos.csv"
+    df_pd = pd.read_csv(path)
+    df = helper.load_frame_from_csv(path)
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.levenshtein_at_thresholds("first_name", 2),
+            helper.cl.exact_match("city"),
+        ],
+    }
+
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    # Seeded, so that every level is observed in the sample
+    linker.estimate_u_using_random_sampling(max_pairs=1e4, seed=1)
+
+    for cc in linker._settings_obj.comparisons:
+        col = cc._output_column_name
+        value_counts = df_pd[col].dropna().value_counts()
+        n = value_counts.sum()
+        expected_u = (value_counts * (value_counts - 1)).sum() / (n * (n - 1))
+
+        levels = cc._comparison_levels_excluding_null
+        # The exact match level is not subject to sampling error
+        assert levels[0].u_probability == pytest.approx(expected_u)
+        assert sum(cl.u_probability for cl in levels) == pytest.approx(1.0)
+
+
+@mark_with_dialects_excluding()
+def test_u_train_value_pair_frequencies(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.levenshtein_at_thresholds("first_name", 2),
+            helper.cl.exact_match("surname"),
+            helper.cl.exact_match("city"),
+        ],
+    }
+
+    # All pairs of records, so the u probabilities are exact
+    linker_records = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker_records.estimate_u_using_random_sampling(max_pairs=1e6)
+
+    # All pairs of distinct values, without sampling any records
+    linker_values = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker_values.estimate_u_using_random_sampling(
+        max_pairs=1e6, use_value_pair_frequencies=True
+    )
+
+    for cc_records, cc_values in zip(
+        linker_records._settings_obj.comparisons,
+        linker_values._settings_obj.comparisons,
+    ):
+        for cl_records, cl_values in zip(
+            cc_records._comparison_levels_excluding_null,
+            cc_values._comparison_levels_excluding_null,
+        ):
+            assert cl_values.u_probability == pytest.approx(cl_records.u_probability)
+            description = cl_values._trained_u_probabilities[-1]["description"]
+            assert description == "estimate u from value pair frequencies"
+
+
+def test_u_train_sampled_value_pair_frequencies_unbiased():
+    import splink.duckdb.comparison_level_library as cll
+
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+    # A level which includes exact matches, so is not corrected using the exact
+    # term frequencies
+    comparison = {
+        "output_column_name": "first_name",
+        "comparison_levels": [
+            cll.null_level("first_name"),
+            cll.levenshtein_level("first_name", 1),
+            cll.else_level(),
+        ],
+    }
+    settings = {"link_type": "dedupe_only", "comparisons": [comparison]}
+
+    def levenshtein_u(max_pairs, seed=None):
+        linker = DuckDBLinker(df, settings)
+        linker.estimate_u_using_random_sampling(
+            max_pairs=max_pairs, use_value_pair_frequencies=True, seed=seed
+        )
+        levels = linker._settings_obj.comparisons[0]._comparison_levels_excluding_null
+        return levels[0].u_probability
+
+    expected = levenshtein_u(max_pairs=1e6)
+
+    # Only a small proportion of the distinct values are sampled.  Pairs of a
+    # value with itself are more likely to be sampled than pairs of different
+    # values, which must be accounted for, or near matches are over-weighted
+    sampled = [levenshtein_u(max_pairs=2e3, seed=seed) for seed in range(1, 11)]
+    assert np.mean(sampled) == pytest.approx(expected, rel=0.3)
+
+
+@mark_with_dialects_excluding()
+def test_u_train_adaptive_sampling(test_helpers, dialect, monkeypatch):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [
+            helper.cl.levenshtein_at_thresholds("first_name", 2),
+            helper.cl.exact_match("surname"),
+            helper.cl.exact_match("city"),
+        ],
+    }
+
+    # All pairs of records, so the u probabilities are exact
+    linker_all = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker_all.estimate_u_using_random_sampling(max_pairs=1e6)
+
+    # Start with a small sample, so that several rounds are needed before the
+    # target is reached.  The target cannot be reached, so rounds continue until
+    # all pairs have been compared, exactly once
+    monkeypatch.setattr("splink.estimate_u.ADAPTIVE_U_INITIAL_PAIRS", 1e3)
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker.estimate_u_using_random_sampling(
+        max_pairs=1e7, target_relative_ci_width=1e-6
+    )
+
+    for cc_all, cc in zip(
+        linker_all._settings_obj.comparisons, linker._settings_obj.comparisons
+    ):
+        for cl_all, cl in zip(
+            cc_all._comparison_levels_excluding_null,
+            cc._comparison_levels_excluding_null,
+        ):
+            assert cl.u_probability == pytest.approx(cl_all.u_probability)
+
+    # Stop sampling once the target is reached
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker.estimate_u_using_random_sampling(max_pairs=1e7, target_relative_ci_width=5)
+
+    for cc in linker._settings_obj.comparisons:
+        for i, cl in enumerate(cc._comparison_levels_excluding_null):
+            record = cl._trained_u_probabilities[-1]
+            if i == 0:
+                # The u probabilities of exact match levels are computed exactly
+                assert "confidence_interval" not in record
+                continue
+            lower, upper = record["confidence_interval"]
+            assert lower < record["probability"] < upper
+            assert record["relative_ci_width"] <= 5
+            assert 0 < record["sampled_pairs"] < 1000 * 999 / 2
+
+
+@mark_with_dialects_excluding("sqlite")
+def test_seeded_random_sample_is_reproducible(test_helpers, dialect):
+    helper = test_helpers[dialect]
+    df = helper.load_frame_from_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    settings = {"link_type": "dedupe_only", "comparisons": []}
+    linker = helper.Linker(df, settings, **helper.extra_linker_args())
+    df_concat = linker._initialise_df_concat_with_tf()
+
+    def sampled_ids(seed):
+        # The sample is taken in a single pass, without sorting the table
+        sample_sql = linker._random_sample_sql(0.5, 500, seed)
+        assert "order by" not in sample_sql.lower()
+        sql = f"select unique_id from {df_concat.physical_name} {sample_sql}"
+        return set(linker.query_sql(sql)["unique_id"])
+
+    ids_1 = sampled_ids(1)
+    assert 350 < len(ids_1) < 650
+    assert sampled_ids(1) == ids_1
+    assert sampled_ids(2) != ids_1
+
+    # Adaptive sampling is also reproducible
+    settings = {
+        "link_type": "dedupe_only",
+        "comparisons": [helper.cl.levenshtein_at_thresholds("first_name", 2)],
+    }
+    linker_1 = helper.Linker(df, settings, **helper.extra_linker_args())
+    linker_2 = helper.Linker(df, settings, **helper.extra_linker_args())
+    for linker in [linker_1, linker_2]:
+        linker.estimate_u_using_random_sampling(
+            max_pairs=1e4, seed=1, target_relative_ci_width=0.5
+        )
+    assert (
+        linker_1._settings_obj._parameter_estimates_as_records
+        == linker_2._settings_obj._parameter_estimates_as_records
+    )
+
+
+def test_u_train_selected_comparisons():
+    df = pd.read_csv("./tests/datasets/fake_1000_from_splink_demos.csv")
+
+    linker_all = DuckDBLinker(df, get_settings_dict())
+    linker_all.estimate_u_using_random_sampling(max_pairs=1e6)
+
+    linker = DuckDBLinker(df, get_settings_dict())
+    linker.estimate_u_using_random_sampling(max_pairs=1e6, comparisons=["surname"])
+
+    for cc_all, cc in zip(
+        linker_all._settings_obj.comparisons, linker._settings_obj.comparisons
+    ):
+        for cl_all, cl in zip(
+            cc_all._comparison_levels_excluding_null,
+            cc._comparison_levels_excluding_null,
+        ):
+            if cc._output_column_name == "surname":
+                assert cl.u_probability == pytest.approx(cl_all.u_probability)
+            else:
+                assert cl._trained_u_probabilities == []